@@ -0,0 +1,100 @@
+import time
+import asyncio
+from relayx_py.queue import Queue
+from relayx_py.kv_storage import KVStore
+from relayx_py.memory_jetstream import MemoryJetStream, MemoryNatsClient, NAMESPACE, TOPIC_HASH
+from benchmarks.harness import benchmark
+
+QUEUE_OPS = 2000
+KV_OPS = 5000
+
+
+class _ConnectedRealtime:
+    def status(self):
+        return "CONNECTED"
+
+
+@benchmark("queue.fetch_loop")
+async def queue_fetch_loop(timer):
+    """Fetch, decode, handler call and ack of the Queue consumer loop."""
+    jetstream = MemoryJetStream()
+
+    queue = Queue({
+        "jetstream": jetstream,
+        "nats_client": MemoryNatsClient(jetstream),
+        "api_key": "benchmark-api-key",
+        "debug": False,
+        "realtime": _ConnectedRealtime()
+    })
+
+    queue.namespace = NAMESPACE
+    queue.topic_hash = TOPIC_HASH
+
+    done = asyncio.Event()
+    handled = 0
+
+    async def handler(message):
+        nonlocal handled
+
+        await message.ack()
+        handled += 1
+
+        if handled == QUEUE_OPS:
+            done.set()
+
+    timer.start()
+
+    await queue.consume({"name": "bench_worker", "group": "bench_workers", "topic": "bench.jobs"}, handler)
+
+    # The consumer starts at new messages, publish the backlog once it is listening
+    for n in range(QUEUE_OPS):
+        await queue.publish("bench.jobs", {"n": n})
+
+    await asyncio.wait_for(done.wait(), 60)
+
+    timer.stop(QUEUE_OPS)
+
+    await queue.detach_consumer("bench.jobs")
+
+
+async def _kv_store():
+    store = KVStore({
+        "namespace": "bench",
+        "jetstream": MemoryJetStream(),
+        "debug": False
+    })
+
+    await store.init()
+
+    return store
+
+
+@benchmark("kv.put")
+async def kv_put(timer):
+    store = await _kv_store()
+
+    timer.start()
+
+    for n in range(KV_OPS):
+        start = time.perf_counter_ns()
+        await store.put(f"bench.key{n % 100}", {"n": n})
+        timer.record(time.perf_counter_ns() - start)
+
+    timer.stop(KV_OPS)
+
+
+@benchmark("kv.get")
+async def kv_get(timer):
+    store = await _kv_store()
+
+    for n in range(100):
+        await store.put(f"bench.key{n}", {"n": n})
+
+    timer.start()
+
+    for n in range(KV_OPS):
+        start = time.perf_counter_ns()
+        await store.get(f"bench.key{n % 100}")
+        timer.record(time.perf_counter_ns() - start)
+
+    timer.stop(KV_OPS)
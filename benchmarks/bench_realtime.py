@@ -0,0 +1,196 @@
+import time
+import asyncio
+import msgpack
+from relayx_py import Realtime
+from relayx_py.memory_jetstream import attach_realtime, MemoryMsg, TOPIC_HASH
+from benchmarks.harness import benchmark, measure_memory
+
+PUBLISH_OPS = 5000
+RECEIVE_OPS = 5000
+
+
+def create_realtime(opts=None):
+    realtime = Realtime({
+        "api_key": "benchmark-api-key",
+        "secret": "benchmark-secret"
+    })
+
+    realtime.init({
+        "staging": True,
+        "opts": {"debug": False, **(opts or {})}
+    })
+
+    jetstream = attach_realtime(realtime)
+
+    return realtime, jetstream
+
+
+@benchmark("realtime.publish")
+async def publish(timer):
+    realtime, _ = create_realtime()
+
+    timer.start()
+
+    for n in range(PUBLISH_OPS):
+        start = time.perf_counter_ns()
+        await realtime.publish("bench.publish", {"n": n})
+        timer.record(time.perf_counter_ns() - start)
+
+    timer.stop(PUBLISH_OPS)
+
+
+@benchmark("realtime.topic.publish")
+async def topic_publish(timer):
+    """Publish through a TopicHandle, validated once up front."""
+    realtime, _ = create_realtime()
+    topic = realtime.topic("bench.publish")
+
+    timer.start()
+
+    for n in range(PUBLISH_OPS):
+        start = time.perf_counter_ns()
+        await topic.publish({"n": n})
+        timer.record(time.perf_counter_ns() - start)
+
+    timer.stop(PUBLISH_OPS)
+
+
+@benchmark("realtime.publish_many")
+async def publish_many(timer):
+    realtime, _ = create_realtime()
+    items = [{"topic": "bench.publish", "message": {"n": n}} for n in range(PUBLISH_OPS)]
+
+    timer.start()
+    await realtime.publish_many(items)
+    timer.stop(PUBLISH_OPS)
+
+
+@benchmark("realtime.publish_async")
+async def publish_async(timer):
+    realtime, _ = create_realtime()
+
+    timer.start()
+
+    futures = [await realtime.publish_async("bench.publish", {"n": n}) for n in range(PUBLISH_OPS)]
+    await asyncio.gather(*futures)
+
+    timer.stop(PUBLISH_OPS)
+
+
+@benchmark("realtime.on_message")
+async def on_message(timer):
+    """Decode, pattern lookup and dispatch of a received message."""
+    await _on_message(timer, {"dispatch": "inline"})
+
+
+@benchmark("realtime.on_message.lazy")
+async def on_message_lazy(timer):
+    """Same with lazy messages, the handler never reads the payload."""
+    await _on_message(timer, {"dispatch": "inline", "lazy_messages": True})
+
+
+async def _on_message(timer, opts):
+    realtime, jetstream = create_realtime(opts)
+
+    received = []
+    await realtime.on("bench.receive", received.append)
+
+    data = msgpack.packb({"id": "bench", "room": "bench.receive", "message": {"n": 1}, "start": 0, "client_id": 0})
+    handle = realtime._Realtime__on_message
+
+    # Stream sequences start at 1, a message at or below the last one is skipped
+    msgs = [MemoryMsg(jetstream, n, f"{TOPIC_HASH}.bench.receive", data, None, None) for n in range(1, RECEIVE_OPS + 1)]
+
+    timer.start()
+
+    for msg in msgs:
+        start = time.perf_counter_ns()
+        await handle(msg)
+        timer.record(time.perf_counter_ns() - start)
+
+    timer.stop(RECEIVE_OPS)
+
+    await realtime.off("bench.receive")
+
+
+async def _callback_topics(timer, count):
+    realtime, _ = create_realtime()
+
+    for n in range(count):
+        # Mix of literal, single and full wildcard patterns
+        if n % 10 == 0:
+            pattern = f"room{n}.*.events"
+        elif n % 10 == 1:
+            pattern = f"room{n}.>"
+        else:
+            pattern = f"room{n}.user.events"
+
+        realtime._Realtime__topic_map[pattern] = None
+        realtime._Realtime__topic_index.add(pattern)
+
+    subjects = [f"room{n}.user.events" for n in range(0, count, max(1, count // 1000))]
+
+    timer.start()
+
+    for subject in subjects:
+        start = time.perf_counter_ns()
+        realtime.get_callback_topics(subject)
+        timer.record(time.perf_counter_ns() - start)
+
+    timer.stop(len(subjects))
+
+    realtime._Realtime__topic_map.clear()
+
+
+@benchmark("realtime.get_callback_topics.10")
+async def callback_topics_10(timer):
+    await _callback_topics(timer, 10)
+
+
+@benchmark("realtime.get_callback_topics.1k")
+async def callback_topics_1k(timer):
+    await _callback_topics(timer, 1_000)
+
+
+@benchmark("realtime.get_callback_topics.100k")
+async def callback_topics_100k(timer):
+    await _callback_topics(timer, 100_000)
+
+
+@benchmark("realtime.topic_pattern_matcher")
+async def topic_pattern_matcher(timer):
+    realtime, _ = create_realtime()
+    pairs = [("orders.*.created", "orders.eu.created"), ("orders.>", "orders.eu.created.v2"), ("orders.us.created", "orders.eu.created")] * 1000
+
+    timer.start()
+
+    for pattern, topic in pairs:
+        realtime.topic_pattern_matcher(pattern, topic)
+
+    timer.stop(len(pairs))
+
+
+@benchmark("realtime.memory_per_subscription")
+async def memory_per_subscription(timer):
+    realtime, _ = create_realtime()
+    count = 10_000
+
+    async def handler(data):
+        pass
+
+    # The consumer is created with the first subscription, keep it out of the measurement
+    await realtime.on("memory.first", handler)
+
+    async def subscribe():
+        for n in range(count):
+            await realtime.on(f"memory{n}.events", handler)
+
+    _, allocated = await measure_memory(subscribe)
+
+    timer.metric("subscription_bytes", round(allocated / count, 1))
+
+    # Drop the subscriptions without paying for off() one by one
+    realtime._Realtime__topic_map.clear()
+    realtime._Realtime__event_func.clear()
+
+    await realtime.close()
@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import platform
+import tracemalloc
+from relayx_py.metrics import LatencyHistogram
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Metrics where a lower value is better, everything else is a throughput
+LOWER_IS_BETTER = ("_us", "_bytes")
+
+_benchmarks = []
+
+
+def benchmark(name):
+    """Registers an async benchmark ``fn(timer)`` under name."""
+    def register(fn):
+        _benchmarks.append((name, fn))
+        return fn
+
+    return register
+
+
+def registered(pattern=None):
+    return [(name, fn) for name, fn in _benchmarks if pattern is None or pattern in name]
+
+
+class Timer:
+    """
+    Handed to every benchmark. Setup happens before ``start()``, the timed
+    section ends with ``stop(ops)``. Per operation latencies go to
+    ``record(ns)`` and anything else worth tracking to ``metric()``.
+    """
+
+    def __init__(self):
+        self.histogram = LatencyHistogram()
+        self.metrics = {}
+
+        self.__started = None
+
+    def start(self):
+        self.__started = time.perf_counter_ns()
+
+    def stop(self, ops):
+        elapsed = time.perf_counter_ns() - self.__started
+
+        self.metrics["ops_per_sec"] = round(ops / (elapsed / 1e9), 1)
+
+    def record(self, ns):
+        self.histogram.record(ns)
+
+    def metric(self, name, value):
+        self.metrics[name] = value
+
+    def results(self):
+        results = dict(self.metrics)
+
+        if self.histogram.count > 0:
+            for p in [50, 99, 99.9]:
+                results[f"p{p:g}_us".replace(".", "_")] = round(self.histogram.percentile(p) / 1000, 2)
+
+        return results
+
+
+async def measure_memory(fn):
+    """Returns (result of await fn(), bytes allocated and still alive)."""
+    tracemalloc.start()
+
+    try:
+        before = tracemalloc.take_snapshot()
+        result = await fn()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+    return result, allocated
+
+
+async def run(pattern=None, repeat=3):
+    """
+    Runs the registered benchmarks ``repeat`` times each and keeps the best
+    value of every metric.
+    """
+    results = {}
+
+    for name, fn in registered(pattern):
+        best = {}
+
+        for _ in range(repeat):
+            timer = Timer()
+            await fn(timer)
+
+            for metric, value in timer.results().items():
+                if metric not in best or _better(metric, value, best[metric]):
+                    best[metric] = value
+
+        results[name] = best
+
+    return results
+
+
+def _better(metric, value, other):
+    if metric.endswith(LOWER_IS_BETTER):
+        return value < other
+
+    return value > other
+
+
+def load_baseline(path=BASELINE_FILE):
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_baseline(results, path=BASELINE_FILE):
+    with open(path, "w") as f:
+        json.dump({
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": results
+        }, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def same_toolchain(baseline):
+    """True if baseline was recorded with this Python version (major.minor) and machine type."""
+    version = ".".join(platform.python_version_tuple()[:2])
+    recorded = ".".join(str(baseline.get("python", "")).split(".")[:2])
+
+    return recorded == version and baseline.get("machine") == platform.machine()
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns a row per metric (benchmark, metric, baseline, current, change,
+    regressed). A change worse than tolerance (0.2 = 20%) is a regression.
+    """
+    rows = []
+
+    for name, metrics in results.items():
+        base_metrics = baseline.get("results", {}).get(name, {})
+
+        for metric, value in metrics.items():
+            base = base_metrics.get(metric)
+
+            if not base:
+                rows.append((name, metric, None, value, None, False))
+                continue
+
+            change = (value - base) / base
+
+            if metric.endswith(LOWER_IS_BETTER):
+                regressed = change > tolerance
+            else:
+                regressed = change < -tolerance
+
+            rows.append((name, metric, base, value, change, regressed))
+
+    return rows
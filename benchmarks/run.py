@@ -0,0 +1,67 @@
+"""
+Runs the benchmark suite against the in-memory JetStream stand-in.
+
+    python -m benchmarks.run                  # run and compare with baseline.json
+    python -m benchmarks.run --save           # run and store the results as the new baseline
+    python -m benchmarks.run -k get_callback  # only benchmarks whose name contains the filter
+    python -m benchmarks.run --check          # fail on regressions
+
+Timings depend on the machine and interpreter, the comparison is a
+report by default. With --check it exits with status 1 when a metric
+regressed by more than --tolerance, as long as the baseline was recorded
+with the same Python version and machine type.
+"""
+import sys
+import asyncio
+import argparse
+from tabulate import tabulate
+from benchmarks import harness
+
+# Importing the modules registers their benchmarks
+from benchmarks import bench_realtime, bench_queue_kv
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="relayx_py benchmarks")
+    parser.add_argument("-k", dest="pattern", default=None, help="Only run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark, the best one is kept")
+    parser.add_argument("--save", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown before failing")
+    parser.add_argument("--baseline", default=harness.BASELINE_FILE, help="Baseline JSON file")
+
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(harness.run(args.pattern, args.repeat))
+
+    if args.save:
+        harness.save_baseline(results, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+
+    baseline = harness.load_baseline(args.baseline)
+
+    if baseline is None or args.save:
+        rows = [(name, metric, value) for name, metrics in results.items() for metric, value in metrics.items()]
+        print(tabulate(rows, headers=["benchmark", "metric", "value"]))
+
+        return 0
+
+    rows = harness.compare(results, baseline, args.tolerance)
+
+    print(tabulate([
+        (name, metric, base, value, f"{change:+.1%}" if change is not None else "", "REGRESSED" if regressed else "")
+        for name, metric, base, value, change, regressed in rows
+    ], headers=["benchmark", "metric", "baseline", "current", "change", ""]))
+
+    if not args.check:
+        return 0
+
+    if not harness.same_toolchain(baseline):
+        print(f"Baseline recorded with Python {baseline.get('python')} on {baseline.get('machine')}, not checking for regressions")
+        return 0
+
+    return 1 if any(row[5] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
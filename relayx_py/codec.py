@@ -0,0 +1,227 @@
+import msgpack
+from relayx_py.compression import create_compressor, COMPRESSION_HEADER, DEFAULT_THRESHOLD
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# NATS headers used to describe the envelope. Messages without
+# CODEC_HEADER are msgpack, which keeps older clients interoperable.
+CODEC_HEADER = "Relayx-Codec"
+ID_HEADER = "Relayx-Id"
+ROOM_HEADER = "Relayx-Room"
+START_HEADER = "Relayx-Start"
+
+DEFAULT_CODEC = "msgpack"
+
+
+class MsgpackCodec:
+    name = "msgpack"
+    envelope = True
+
+    def __init__(self):
+        # Packer keeps its internal buffer between calls
+        self.__packer = msgpack.Packer()
+
+    def encode(self, envelope):
+        return self.__packer.pack(envelope)
+
+    def decode(self, data):
+        return msgpack.unpackb(data, raw=False)
+
+
+class OrjsonCodec:
+    name = "orjson"
+    envelope = True
+
+    def __init__(self):
+        if orjson is None:
+            raise ValueError("orjson codec selected but orjson is not installed. pip install relayx_py[orjson]")
+
+    def encode(self, envelope):
+        return orjson.dumps(envelope)
+
+    def decode(self, data):
+        return orjson.loads(data)
+
+
+class RawCodec:
+    """
+    Sends the message bytes as-is. The envelope fields travel in
+    NATS headers instead of the payload.
+    """
+    name = "raw"
+    envelope = False
+
+    def encode(self, envelope):
+        message = envelope["message"]
+
+        if not isinstance(message, (bytes, bytearray, memoryview)):
+            raise ValueError("raw codec requires $message to be bytes")
+
+        return bytes(message)
+
+    def decode(self, data):
+        return data
+
+
+_codecs = {
+    MsgpackCodec.name: MsgpackCodec,
+    OrjsonCodec.name: OrjsonCodec,
+    RawCodec.name: RawCodec
+}
+
+
+def register_codec(codec_cls):
+    """
+    Registers a codec class under ``codec_cls.name``.
+
+    A codec exposes ``name``, ``envelope`` (False if it only carries the
+    message body), ``encode(envelope) -> bytes`` and ``decode(bytes)``.
+    """
+    if not getattr(codec_cls, "name", None):
+        raise ValueError("$codec_cls.name cannot be None / empty")
+
+    _codecs[codec_cls.name] = codec_cls
+
+
+def create_codec(name):
+    if name not in _codecs:
+        raise ValueError(f"Unknown codec '{name}'. Available codecs => {list(_codecs.keys())}")
+
+    return _codecs[name]()
+
+
+class MessageCodec:
+    """
+    Encodes / decodes the message envelope for a client.
+
+    The codec is picked per topic (``topic_codecs`` patterns) falling back
+    to the client default, and is named in the headers so receivers decode
+    each message with whatever codec its producer used. Payloads of at
+    least ``compression_threshold`` bytes are compressed when a
+    ``compression`` is set, and flagged in the headers as well.
+    """
+
+    # Max concrete topics remembered by the per-topic codec lookup
+    MAX_CACHED_TOPICS = 4096
+
+    def __init__(self, codec=DEFAULT_CODEC, topic_codecs=None, matcher=None, compression=None, compression_threshold=DEFAULT_THRESHOLD):
+        if topic_codecs is not None and not isinstance(topic_codecs, dict):
+            raise ValueError("$topic_codecs must be a dict of topic pattern => codec name")
+
+        if not isinstance(compression_threshold, int) or isinstance(compression_threshold, bool) or compression_threshold < 0:
+            raise ValueError("$compression_threshold must be an integer >= 0")
+
+        self.__compressors = {}
+        self.__compressor = self.__get_compressor(compression) if compression is not None else None
+        self.__compression_threshold = compression_threshold
+
+        self.__codecs = {}
+        self.__default = self.__get(codec)
+
+        self.__topic_codecs = {pattern: self.__get(name) for pattern, name in (topic_codecs or {}).items()}
+        self.__topic_cache = {}
+        self.__matcher = matcher
+
+    def encode(self, topic, envelope):
+        """
+        Returns (payload, headers) for an envelope published on topic.
+        headers is None for the default msgpack wire format.
+        """
+        codec = self.__resolve(topic)
+
+        payload = codec.encode(envelope)
+        compressor = None
+
+        if self.__compressor is not None and len(payload) >= self.__compression_threshold:
+            compressed = self.__compressor.compress(payload)
+
+            # Incompressible payloads go out as they are
+            if len(compressed) < len(payload):
+                payload = compressed
+                compressor = self.__compressor
+
+        if codec.name == DEFAULT_CODEC and compressor is None:
+            return payload, None
+
+        headers = {}
+
+        if codec.name != DEFAULT_CODEC:
+            headers[CODEC_HEADER] = codec.name
+
+        if compressor is not None:
+            headers[COMPRESSION_HEADER] = compressor.name
+
+        if not codec.envelope:
+            headers[ID_HEADER] = envelope["id"]
+            headers[ROOM_HEADER] = envelope["room"]
+            headers[START_HEADER] = str(envelope["start"])
+
+        return payload, headers
+
+    def decode(self, data, headers=None):
+        """Returns the envelope dict of a received message."""
+        name = DEFAULT_CODEC
+
+        if headers:
+            name = headers.get(CODEC_HEADER, DEFAULT_CODEC)
+
+            if COMPRESSION_HEADER in headers:
+                data = self.__get_compressor(headers[COMPRESSION_HEADER]).decompress(data)
+
+        codec = self.__get(name)
+
+        if codec.envelope:
+            return codec.decode(data)
+
+        return {
+            "id": headers.get(ID_HEADER),
+            "room": headers.get(ROOM_HEADER),
+            "message": codec.decode(data),
+            "start": int(headers[START_HEADER]) if START_HEADER in headers else None
+        }
+
+    def __resolve(self, topic):
+        if not self.__topic_codecs:
+            return self.__default
+
+        codec = self.__topic_cache.get(topic)
+
+        if codec is None:
+            codec = self.__topic_codecs.get(topic)
+
+            if codec is None and self.__matcher is not None:
+                for pattern, pattern_codec in self.__topic_codecs.items():
+                    if self.__matcher(pattern, topic):
+                        codec = pattern_codec
+                        break
+
+            if codec is None:
+                codec = self.__default
+
+            if len(self.__topic_cache) >= self.MAX_CACHED_TOPICS:
+                self.__topic_cache.clear()
+
+            self.__topic_cache[topic] = codec
+
+        return codec
+
+    def __get_compressor(self, name):
+        compressor = self.__compressors.get(name)
+
+        if compressor is None:
+            compressor = create_compressor(name)
+            self.__compressors[name] = compressor
+
+        return compressor
+
+    def __get(self, name):
+        codec = self.__codecs.get(name)
+
+        if codec is None:
+            codec = create_codec(name)
+            self.__codecs[name] = codec
+
+        return codec
@@ -0,0 +1,75 @@
+import zlib
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# NATS header naming the compressor of a compressed payload
+COMPRESSION_HEADER = "Relayx-Compression"
+
+DEFAULT_THRESHOLD = 1024
+
+
+class ZlibCompressor:
+    name = "zlib"
+
+    def __init__(self, level=6):
+        self.__level = level
+
+    def compress(self, data):
+        return zlib.compress(data, self.__level)
+
+    def decompress(self, data):
+        return zlib.decompress(data)
+
+
+class Lz4Compressor:
+    name = "lz4"
+
+    def __init__(self):
+        if lz4_frame is None:
+            raise ValueError("lz4 compression selected but lz4 is not installed. pip install relayx_py[lz4]")
+
+    def compress(self, data):
+        return lz4_frame.compress(data)
+
+    def decompress(self, data):
+        return lz4_frame.decompress(data)
+
+
+class ZstdCompressor:
+    name = "zstd"
+
+    def __init__(self, level=3):
+        if zstandard is None:
+            raise ValueError("zstd compression selected but zstandard is not installed. pip install relayx_py[zstd]")
+
+        # Contexts are reused, creating them is the expensive part
+        self.__compressor = zstandard.ZstdCompressor(level=level)
+        self.__decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, data):
+        return self.__compressor.compress(data)
+
+    def decompress(self, data):
+        return self.__decompressor.decompress(data)
+
+
+_compressors = {
+    ZlibCompressor.name: ZlibCompressor,
+    Lz4Compressor.name: Lz4Compressor,
+    ZstdCompressor.name: ZstdCompressor
+}
+
+
+def create_compressor(name):
+    if name not in _compressors:
+        raise ValueError(f"Unknown compression '{name}'. Available compressions => {list(_compressors.keys())}")
+
+    return _compressors[name]()
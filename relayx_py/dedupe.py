@@ -0,0 +1,43 @@
+from collections import OrderedDict
+
+DEFAULT_SIZE = 10_000
+
+
+class DedupeWindow:
+    """
+    Ids of the last ``size`` received messages, a message whose id is
+    still in the window is a duplicate. Publishers send the id as the
+    Nats-Msg-Id header so the stream already drops duplicates within its
+    duplicate window, this catches the ones that get past it, e.g. replays
+    republished after the window expired.
+    """
+
+    def __init__(self, size=DEFAULT_SIZE):
+        if not isinstance(size, int) or isinstance(size, bool) or size <= 0:
+            raise ValueError("$dedupe must be True or a positive integer")
+
+        self.__size = size
+        self.__ids = OrderedDict()
+
+        self.duplicates = 0
+
+    def __len__(self):
+        return len(self.__ids)
+
+    def seen(self, message_id):
+        """Returns True if message_id is in the window, adds it otherwise."""
+        if message_id is None:
+            return False
+
+        if message_id in self.__ids:
+            self.__ids.move_to_end(message_id)
+            self.duplicates += 1
+
+            return True
+
+        self.__ids[message_id] = None
+
+        if len(self.__ids) > self.__size:
+            self.__ids.popitem(last=False)
+
+        return False
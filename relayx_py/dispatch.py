@@ -0,0 +1,289 @@
+import os
+import asyncio
+import inspect
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+INLINE = "inline"
+BOUNDED = "bounded"
+SERIAL = "serial"
+THREAD = "thread"
+PROCESS = "process"
+
+DISPATCH_MODES = [INLINE, BOUNDED, SERIAL, THREAD, PROCESS]
+
+DEFAULT_CONCURRENCY = 100
+
+
+def default_workers():
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+class Dispatcher:
+    """
+    Runs user callbacks. ``spawn()`` is fire-and-forget and used for status
+    events, ``dispatch()`` is awaited by the message path and is where the
+    strategies differ.
+
+    ``pending`` counts dispatched handler calls that have not finished yet,
+    consumers use it to stop fetching while handlers are behind.
+    """
+
+    def __init__(self, workers=None, log=None):
+        self._workers = workers or default_workers()
+        self._log = log
+        self._executor = None
+        self._tasks = set()
+
+        self._pending = 0
+
+        # (limit, future) of every wait_for_pending() call, e.g. one per
+        # pull consumer fetch loop
+        self.__waiters = []
+
+    @property
+    def pending(self):
+        return self._pending
+
+    async def wait_for_pending(self, limit):
+        """Waits until at most ``limit`` handler calls are pending."""
+        while self._pending > limit:
+            waiter = (limit, asyncio.get_running_loop().create_future())
+            self.__waiters.append(waiter)
+
+            try:
+                await waiter[1]
+            finally:
+                if waiter in self.__waiters:
+                    self.__waiters.remove(waiter)
+
+    def spawn(self, handler, data):
+        if inspect.iscoroutinefunction(handler):
+            task = asyncio.create_task(self._call_async(handler, data))
+        else:
+            task = asyncio.ensure_future(self._call_sync(handler, data))
+
+        self._track(task)
+
+        return task
+
+    async def dispatch(self, key, handler, data):
+        self._begin()
+        self.spawn(handler, data).add_done_callback(self._end)
+
+    async def close(self):
+        # Running callbacks are left to finish, a callback may well be
+        # the one closing the client
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _create_executor(self):
+        return ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="relayx_dispatch")
+
+    def _get_executor(self):
+        # Created lazily so a closed dispatcher can be reused after reconnecting
+        if self._executor is None:
+            self._executor = self._create_executor()
+
+        return self._executor
+
+    async def _call_async(self, handler, data):
+        if data:
+            await handler(data)
+        else:
+            await handler()
+
+    async def _call_sync(self, handler, data):
+        loop = asyncio.get_running_loop()
+
+        if data:
+            await loop.run_in_executor(self._get_executor(), handler, data)
+        else:
+            await loop.run_in_executor(self._get_executor(), handler)
+
+    async def _call(self, handler, data):
+        if inspect.iscoroutinefunction(handler):
+            await self._call_async(handler, data)
+        else:
+            await self._call_sync(handler, data)
+
+    def _begin(self):
+        self._pending += 1
+
+    def _end(self, *args):
+        self._pending -= 1
+
+        if not self.__waiters:
+            return
+
+        for waiter in [waiter for waiter in self.__waiters if self._pending <= waiter[0]]:
+            self.__waiters.remove(waiter)
+
+            if not waiter[1].done():
+                waiter[1].set_result(None)
+
+    def _track(self, task):
+        self._tasks.add(task)
+        task.add_done_callback(self._on_done)
+
+    def _on_done(self, task):
+        self._tasks.discard(task)
+
+        if not task.cancelled() and task.exception() is not None and self._log is not None:
+            self._log("Callback error => %s", task.exception())
+
+
+class InlineDispatcher(Dispatcher):
+    """
+    Awaits every handler before the next message is processed. Sync
+    handlers run directly on the event loop.
+    """
+
+    async def dispatch(self, key, handler, data):
+        self._begin()
+
+        try:
+            if inspect.iscoroutinefunction(handler):
+                await handler(data)
+            else:
+                handler(data)
+        except Exception as e:
+            if self._log is not None:
+                self._log("Callback error => %s", e)
+        finally:
+            self._end()
+
+
+class BoundedDispatcher(Dispatcher):
+    """
+    Runs handlers concurrently, at most ``concurrency`` at a time. The
+    message path waits for a free slot once the limit is reached.
+    """
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, workers=None, log=None):
+        super().__init__(workers=workers or min(concurrency, default_workers()), log=log)
+
+        self.__semaphore = asyncio.Semaphore(concurrency)
+
+    async def dispatch(self, key, handler, data):
+        await self.__semaphore.acquire()
+
+        self._begin()
+        self._track(asyncio.create_task(self.__run(handler, data)))
+
+    async def __run(self, handler, data):
+        try:
+            await self._call(handler, data)
+        finally:
+            self.__semaphore.release()
+            self._end()
+
+
+class SerialDispatcher(Dispatcher):
+    """
+    One ordered lane per key (the concrete topic). Handlers for the same
+    topic run one after another in delivery order, different topics run
+    concurrently.
+    """
+
+    def __init__(self, workers=None, log=None):
+        super().__init__(workers=workers, log=log)
+
+        self.__lanes = {}
+
+    async def dispatch(self, key, handler, data):
+        self._begin()
+
+        lane = self.__lanes.get(key)
+
+        if lane is not None:
+            lane.append((handler, data))
+            return
+
+        lane = deque([(handler, data)])
+        self.__lanes[key] = lane
+
+        self._track(asyncio.create_task(self.__drain(key, lane)))
+
+    async def __drain(self, key, lane):
+        try:
+            while lane:
+                handler, data = lane.popleft()
+
+                try:
+                    await self._call(handler, data)
+                except Exception as e:
+                    if self._log is not None:
+                        self._log("Callback error => %s", e)
+                finally:
+                    self._end()
+        finally:
+            # Lanes only live while they have work queued
+            self.__lanes.pop(key, None)
+
+
+class ThreadDispatcher(Dispatcher):
+    """
+    Async handlers become tasks, sync handlers run on a thread pool sized
+    to the machine (``workers``, default min(32, cpu_count + 4)).
+    """
+
+
+class ProcessDispatcher(Dispatcher):
+    """
+    Sync message handlers run on a process pool for CPU heavy work. They
+    and the message data must be picklable, i.e. module level functions.
+    Async handlers and status events behave like the thread strategy.
+    """
+
+    def __init__(self, workers=None, log=None):
+        super().__init__(workers=workers, log=log)
+
+        self.__process_pool = None
+
+    async def dispatch(self, key, handler, data):
+        if inspect.iscoroutinefunction(handler):
+            await super().dispatch(key, handler, data)
+            return
+
+        if self.__process_pool is None:
+            self.__process_pool = ProcessPoolExecutor(max_workers=min(self._workers, os.cpu_count() or 1))
+
+        loop = asyncio.get_running_loop()
+
+        self._begin()
+
+        future = asyncio.ensure_future(loop.run_in_executor(self.__process_pool, handler, data))
+        future.add_done_callback(self._end)
+
+        self._track(future)
+
+    async def close(self):
+        await super().close()
+
+        if self.__process_pool is not None:
+            self.__process_pool.shutdown(wait=False)
+            self.__process_pool = None
+
+
+def create_dispatcher(mode=THREAD, concurrency=DEFAULT_CONCURRENCY, workers=None, log=None):
+    if mode not in DISPATCH_MODES:
+        raise ValueError(f"Unknown dispatch mode '{mode}'. Available modes => {DISPATCH_MODES}")
+
+    if not isinstance(concurrency, int) or isinstance(concurrency, bool) or concurrency <= 0:
+        raise ValueError("$dispatch_concurrency must be a positive integer")
+
+    if workers is not None and (not isinstance(workers, int) or isinstance(workers, bool) or workers <= 0):
+        raise ValueError("$dispatch_workers must be a positive integer")
+
+    if mode == INLINE:
+        return InlineDispatcher(log=log)
+    elif mode == BOUNDED:
+        return BoundedDispatcher(concurrency=concurrency, workers=workers, log=log)
+    elif mode == SERIAL:
+        return SerialDispatcher(workers=workers, log=log)
+    elif mode == PROCESS:
+        return ProcessDispatcher(workers=workers, log=log)
+    else:
+        return ThreadDispatcher(workers=workers, log=log)
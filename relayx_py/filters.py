@@ -0,0 +1,182 @@
+from relayx_py.pool import jump_hash, topic_key
+from relayx_py.topic_index import TopicIndex
+
+# Past this many subscriptions consumers filter on every subject of the
+# namespace (ALL) and the client side TopicIndex drops what nobody
+# subscribed to
+DEFAULT_MAX_FILTERS = 256
+
+ALL = ">"
+
+
+def generalize(pattern_a, pattern_b):
+    """
+    Least general pattern matching every subject either pattern matches,
+    e.g. a.*.c and a.b.* => a.*.*, a.b and a.b.c => a.>
+    """
+    a = pattern_a.split(".")
+    b = pattern_b.split(".")
+
+    if len(a) == len(b) and ">" not in a and ">" not in b:
+        return ".".join(x if x == y else "*" for x, y in zip(a, b))
+
+    # Different lengths or a '>' on either side: keep the tokens both
+    # patterns share up to the shorter one and let '>' take the rest
+    length = min(len(a), len(b))
+
+    for tokens in (a, b):
+        if ">" in tokens:
+            length = min(length, tokens.index(">") + 1)
+
+    prefix = [x if x == y else "*" for x, y in zip(a[:length - 1], b[:length - 1])]
+
+    return ".".join(prefix + [">"])
+
+
+class FilterSet:
+    """
+    Pairwise non-overlapping filter subjects that together match every
+    subject one of the subscribed patterns matches.
+
+    JetStream rejects a consumer whose filter subjects overlap, so
+    overlapping patterns are merged into a common pattern (see
+    generalize()). A subject then matches exactly one filter, which also
+    matches every pattern the subject matches.
+
+    Filters are kept in a TopicIndex, adding or removing a pattern only
+    looks at the filters it overlaps instead of reducing every pattern
+    again, so subscribing one more topic does not get slower with the
+    number of topics already subscribed.
+    """
+
+    def __init__(self, patterns=()):
+        self.__index = TopicIndex(cache_size=0)
+        # filter => patterns it was merged from (a dict used as an
+        # ordered set), pattern => its filter
+        self.__members = {}
+        self.__owner = {}
+
+        for pattern in patterns:
+            self.add(pattern)
+
+    def __len__(self):
+        return len(self.__members)
+
+    def __contains__(self, pattern):
+        return pattern in self.__owner
+
+    def filters(self):
+        return sorted(self.__members)
+
+    def add(self, pattern):
+        """
+        Adds a pattern, merging it with the filters it overlaps.
+
+        Returns:
+            bool: False if the pattern was already added.
+        """
+        if pattern in self.__owner:
+            return False
+
+        overlapping = self.__index.overlapping(pattern)
+
+        # Already covered by a filter, e.g. a.b under a.*
+        if len(overlapping) == 1 and generalize(overlapping[0], pattern) == overlapping[0]:
+            self.__members[overlapping[0]][pattern] = None
+            self.__owner[pattern] = overlapping[0]
+
+            return True
+
+        merged = pattern
+        groups = [{pattern: None}]
+
+        while overlapping:
+            for existing in overlapping:
+                groups.append(self.__remove_filter(existing))
+                merged = generalize(existing, merged)
+
+            # The merged filter is wider, it may overlap filters neither
+            # of its parts did
+            overlapping = self.__index.overlapping(merged)
+
+        # Grow the largest group instead of copying it
+        groups.sort(key=len)
+        members = groups.pop()
+
+        for group in groups:
+            members.update(group)
+
+        self.__add_filter(merged, members)
+
+        return True
+
+    def remove(self, pattern):
+        """
+        Removes a pattern. Unless the filter is itself a subscribed
+        pattern, the other patterns of its filter are added again so the
+        filter narrows back to what is still subscribed.
+
+        Returns:
+            bool: False if the pattern was not added.
+        """
+        subject_filter = self.__owner.pop(pattern, None)
+
+        if subject_filter is None:
+            return False
+
+        members = self.__members[subject_filter]
+        del members[pattern]
+
+        if subject_filter in members:
+            return True
+
+        self.__remove_filter(subject_filter)
+
+        for member in members:
+            self.add(member)
+
+        return True
+
+    def partitions(self, partitions):
+        """
+        Spreads the filters over partitions by jump consistent hash.
+        Returns one (possibly empty) sorted list of filters per partition,
+        a subject is matched by the filters of one partition only.
+        """
+        result = [[] for _ in range(partitions)]
+
+        for subject_filter in self.__members:
+            partition = jump_hash(topic_key(subject_filter), partitions) if partitions > 1 else 0
+            result[partition].append(subject_filter)
+
+        for filters in result:
+            filters.sort()
+
+        return result
+
+    def __add_filter(self, subject_filter, members):
+        self.__index.add(subject_filter)
+        self.__members[subject_filter] = members
+
+        for member in members:
+            self.__owner[member] = subject_filter
+
+    def __remove_filter(self, subject_filter):
+        self.__index.remove(subject_filter)
+
+        members = self.__members.pop(subject_filter)
+
+        for member in members:
+            del self.__owner[member]
+
+        return members
+
+
+def reduce_filters(patterns):
+    """Returns the filters of a FilterSet holding patterns, see FilterSet."""
+    return FilterSet(patterns).filters()
+
+
+def partition_filters(patterns, partitions):
+    """Spreads the filters of patterns over partitions, see FilterSet.partitions()."""
+    return FilterSet(patterns).partitions(partitions)
@@ -0,0 +1,298 @@
+import os
+import json
+import mmap
+import hashlib
+from datetime import datetime, timezone, timedelta
+from bisect import bisect_left, bisect_right
+import msgpack
+
+DEFAULT_SEGMENT_SIZE = 16 * 1024 * 1024
+
+SEGMENT_SUFFIX = ".seg"
+COVERAGE_FILE = "coverage.json"
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def to_micros(dt):
+    # Exact integer arithmetic, float timestamps can be off by a microsecond
+    if dt.tzinfo is None:
+        dt = dt.astimezone()
+
+    return (dt - EPOCH) // timedelta(microseconds=1)
+
+
+def from_micros(micros):
+    return EPOCH + timedelta(microseconds=micros)
+
+
+class _TopicCache:
+    """On-disk state of a single topic."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+        # Parallel lists sorted by stream sequence (and so by timestamp)
+        self.timestamps = []
+        self.entries = []
+
+        # [path, size, mmap or None]
+        self.segments = []
+        self.handle = None
+        self.dirty = False
+
+        # {"start", "end"} in microseconds and the last cached "sequence"
+        self.coverage = None
+        self.last_seq = 0
+
+
+class HistoryCache:
+    """
+    Local cache of stored messages, one directory per topic.
+
+    Messages are appended to msgpack segment files which roll over at
+    ``segment_size`` bytes and are read back through mmap. An in-memory
+    index by timestamp and stream sequence is rebuilt from the segments
+    on first use. ``coverage`` records the time range the cache holds
+    every message of, so only what lies past it has to be fetched.
+    """
+
+    def __init__(self, directory, segment_size=DEFAULT_SEGMENT_SIZE, log=None):
+        if not isinstance(directory, str) or directory == "":
+            raise ValueError("$history_cache must be a directory path")
+
+        if not isinstance(segment_size, int) or isinstance(segment_size, bool) or segment_size <= 0:
+            raise ValueError("$segment_size must be a positive integer")
+
+        self.__directory = directory
+        self.__segment_size = segment_size
+        self.__log = log
+
+        self.__topics = {}
+
+        os.makedirs(directory, exist_ok=True)
+
+    def coverage(self, topic):
+        """Returns (start, end, last_seq) covered for topic or None."""
+        cache = self.__get(topic)
+
+        if cache.coverage is None:
+            return None
+
+        return cache.coverage["start"], cache.coverage["end"], cache.last_seq
+
+    def reset(self, topic, start):
+        """Drops everything cached for topic and starts covering from start."""
+        cache = self.__get(topic)
+
+        self.__close_topic(cache)
+
+        for path, _, _ in cache.segments:
+            os.remove(path)
+
+        cache.timestamps = []
+        cache.entries = []
+        cache.segments = []
+        cache.last_seq = 0
+        cache.coverage = {"start": start, "end": start}
+
+        self.__save_coverage(cache)
+
+    def read(self, topic, start, end=None):
+        """Yields cached records with start <= timestamp <= end, oldest first."""
+        cache = self.__get(topic)
+
+        if cache.coverage is None:
+            return
+
+        if end is None or end > cache.coverage["end"]:
+            end = cache.coverage["end"]
+
+        self.__flush(cache)
+
+        first = bisect_left(cache.timestamps, start)
+        last = bisect_right(cache.timestamps, end)
+
+        for i in range(first, last):
+            segment, offset, length = cache.entries[i][1:]
+
+            yield msgpack.unpackb(self.__map(cache, segment)[offset:offset + length], raw=False)
+
+    def append(self, topic, record):
+        """
+        Appends a record (``seq`` and ``ts`` in microseconds included) and
+        moves the covered end up to its timestamp.
+
+        Returns:
+            bool: False if the sequence was already cached.
+        """
+        cache = self.__get(topic)
+
+        if cache.coverage is None or record["seq"] <= cache.last_seq:
+            return False
+
+        if not cache.segments or cache.segments[-1][1] >= self.__segment_size:
+            self.__roll(cache, record["seq"])
+        elif cache.handle is None:
+            cache.handle = open(cache.segments[-1][0], "ab")
+
+        data = msgpack.packb(record)
+        segment = len(cache.segments) - 1
+        offset = cache.segments[segment][1]
+
+        cache.handle.write(data)
+        cache.segments[segment][1] += len(data)
+        cache.dirty = True
+
+        cache.timestamps.append(record["ts"])
+        cache.entries.append((record["seq"], segment, offset, len(data)))
+        cache.last_seq = record["seq"]
+
+        if record["ts"] > cache.coverage["end"]:
+            cache.coverage["end"] = record["ts"]
+
+        return True
+
+    def commit(self, topic):
+        """Flushes appended records and persists the coverage."""
+        cache = self.__get(topic)
+
+        self.__flush(cache)
+        self.__save_coverage(cache)
+
+    def close(self):
+        for cache in self.__topics.values():
+            self.__flush(cache)
+            self.__save_coverage(cache)
+            self.__close_topic(cache)
+
+        self.__topics.clear()
+
+    def __get(self, topic):
+        cache = self.__topics.get(topic)
+
+        if cache is None:
+            name = hashlib.sha1(topic.encode("utf-8")).hexdigest()
+
+            cache = _TopicCache(os.path.join(self.__directory, name))
+            os.makedirs(cache.directory, exist_ok=True)
+
+            self.__load(cache)
+            self.__topics[topic] = cache
+
+        return cache
+
+    def __load(self, cache):
+        coverage_path = os.path.join(cache.directory, COVERAGE_FILE)
+
+        if os.path.exists(coverage_path):
+            try:
+                with open(coverage_path, "r") as f:
+                    cache.coverage = json.load(f)
+            except (ValueError, OSError) as e:
+                self.__log_message("Unreadable history cache coverage %s => %s", coverage_path, e)
+
+        names = sorted(name for name in os.listdir(cache.directory) if name.endswith(SEGMENT_SUFFIX))
+
+        if cache.coverage is None:
+            # Records without a known coverage can't be trusted
+            for name in names:
+                os.remove(os.path.join(cache.directory, name))
+
+            return
+
+        for name in names:
+            self.__load_segment(cache, os.path.join(cache.directory, name))
+
+        # Records lost in a torn write shrink the covered range
+        if cache.coverage.get("last_seq", 0) > cache.last_seq:
+            cache.coverage["end"] = cache.timestamps[-1] if cache.timestamps else cache.coverage["start"]
+
+        cache.coverage.pop("last_seq", None)
+
+    def __load_segment(self, cache, path):
+        segment = len(cache.segments)
+        size = 0
+
+        with open(path, "rb") as f:
+            data = f.read()
+
+        unpacker = msgpack.Unpacker(raw=False)
+        unpacker.feed(data)
+
+        try:
+            for record in unpacker:
+                end = unpacker.tell()
+
+                cache.timestamps.append(record["ts"])
+                cache.entries.append((record["seq"], segment, size, end - size))
+                cache.last_seq = record["seq"]
+
+                size = end
+        except (ValueError, KeyError, TypeError, msgpack.UnpackException) as e:
+            self.__log_message("Truncated history cache segment %s => %s", path, e)
+
+        if size < len(data):
+            # Cut off a torn write at the tail
+            with open(path, "r+b") as f:
+                f.truncate(size)
+
+        cache.segments.append([path, size, None])
+
+    def __roll(self, cache, first_seq):
+        if cache.handle is not None:
+            cache.handle.close()
+
+        path = os.path.join(cache.directory, f"{first_seq:020d}{SEGMENT_SUFFIX}")
+
+        cache.handle = open(path, "ab")
+        cache.segments.append([path, 0, None])
+
+    def __map(self, cache, segment):
+        path, size, mapped = cache.segments[segment]
+
+        # Remap once the segment grew past what is mapped
+        if mapped is None or len(mapped) < size:
+            if mapped is not None:
+                mapped.close()
+
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+
+            cache.segments[segment][2] = mapped
+
+        return mapped
+
+    def __flush(self, cache):
+        if cache.dirty:
+            cache.handle.flush()
+            cache.dirty = False
+
+    def __save_coverage(self, cache):
+        if cache.coverage is None:
+            return
+
+        coverage_path = os.path.join(cache.directory, COVERAGE_FILE)
+        tmp_path = f"{coverage_path}.tmp"
+
+        with open(tmp_path, "w") as f:
+            json.dump({**cache.coverage, "last_seq": cache.last_seq}, f)
+
+        os.replace(tmp_path, coverage_path)
+
+    def __close_topic(self, cache):
+        if cache.handle is not None:
+            cache.handle.close()
+            cache.handle = None
+
+        cache.dirty = False
+
+        for segment in cache.segments:
+            if segment[2] is not None:
+                segment[2].close()
+                segment[2] = None
+
+    def __log_message(self, msg, *args):
+        if self.__log is not None:
+            self.__log(msg, *args)
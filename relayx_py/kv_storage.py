@@ -4,6 +4,7 @@ import json
 import msgpack
 import re
 import inspect
+import time
 from datetime import datetime, timezone
 import nats.js.api as nats_config
 from nats.js.errors import APIError, NoKeysError
@@ -26,6 +27,9 @@ class KVStore:
         self.__error_logger = ErrorLogging()
         self.__logger = Logging(data["debug"])
 
+        self.__metrics = data.get("metrics")
+        self.__tracer = data.get("tracer")
+
 
     async def init(self):
         self.__validate_input()
@@ -39,6 +43,13 @@ class KVStore:
         self.__validate_key(key)
 
         val = None
+        error = None
+        span = None
+
+        if self.__tracer is not None:
+            span = self.__tracer.start_span("relayx.kv.get", {"key": key})
+
+        start = time.perf_counter_ns()
 
         try:
             val = await self.__kv_store.get(key)
@@ -48,8 +59,14 @@ class KVStore:
             else:
                 val = val.value
         except Exception as e:
+            error = e
             self.__logger.log(e)
 
+        self.__record("get", start)
+
+        if span is not None:
+            self.__tracer.end_span(span, error)
+
         return val
 
 
@@ -57,39 +74,64 @@ class KVStore:
         self.__validate_key(key)
         self.__validate_value(value)
 
-        self.__logger.log(f"Creating KV pair for {key}")
+        self.__logger.log("Creating KV pair for %s", key)
 
         value = self.__convert_to_bytes(value)
+        error = None
+        span = None
+
+        if self.__tracer is not None:
+            span = self.__tracer.start_span("relayx.kv.put", {"key": key})
+
+        start = time.perf_counter_ns()
 
         try:
             await self.__kv_store.put(key, value)
         except Exception as e:
+             error = e
              self.__error_logger.log_error({
                  "err": e
              })
 
+        self.__record("put", start)
+
+        if span is not None:
+            self.__tracer.end_span(span, error)
+
     
     async def delete(self, key):
         self.__validate_key(key)
 
-        self.__logger.log(f"Creating KV pair for {key}")
+        self.__logger.log("Deleting KV pair for %s", key)
+
+        start = time.perf_counter_ns()
 
         try:
             await self.__kv_store.purge(key)
         except:
             pass
 
+        self.__record("delete", start)
+
     async def keys(self):
         keys = []
+        start = time.perf_counter_ns()
 
         try:
             keys = await self.__kv_store.keys()
         except NoKeysError as nke:
             pass
 
+        self.__record("keys", start)
+
         return keys
 
 
+    def __record(self, op, start):
+        if self.__metrics is not None:
+            self.__metrics.kv_op(op, time.perf_counter_ns() - start)
+
+
     def __validate_input(self):
         if self.__namespace is None or self.__namespace == "":
             raise ValueError("$namespace cannot be None / empty")
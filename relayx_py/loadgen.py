@@ -0,0 +1,494 @@
+"""
+Load generator for sizing clients before a rollout.
+
+    python -m relayx_py.loadgen --publishers 4 --subscribers 2 --duration 10
+    python -m relayx_py.loadgen --queue-publishers 2 --queue-workers 4 --rate 500
+    python -m relayx_py.loadgen --server nats://localhost:4222 --outage 2
+
+Without --server every client runs against one in-process MemoryJetStream,
+which measures the client alone. With --server each client opens its own
+connection to a local nats-server (started with -js) and the streams are
+created for the run and deleted afterwards. Authentication and the
+namespace lookup are skipped in both cases.
+
+Reported are publish and delivery rates, end-to-end latency percentiles
+(publisher clock to subscriber handler), the reconnect recovery time when
+an outage is simulated and the peak RSS of the process.
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import nats
+import nats.js.api as nats_config
+from tabulate import tabulate
+from relayx_py.realtime import Realtime
+from relayx_py.queue import Queue
+from relayx_py.metrics import LatencyHistogram
+from relayx_py.dispatch import INLINE, BOUNDED, SERIAL, THREAD
+from relayx_py.outbox import DEFAULT_LIMIT as DEFAULT_OUTBOX_LIMIT
+from relayx_py.memory_jetstream import MemoryJetStream, MemoryNatsClient, attach_realtime
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+NAMESPACE = "loadgen"
+TOPIC_HASH = "loadgen_hash"
+QUEUE_TOPIC_HASH = "loadgen_queue_hash"
+
+TOPIC = "loadgen.events"
+QUEUE_TOPIC = "loadgen.jobs"
+QUEUE_CONSUMER = "loadgen_workers"
+
+PERCENTILES = [50, 99, 99.9]
+
+# Handlers run on the event loop or a thread, the process pool cannot
+# pickle the closures the generator registers
+DISPATCH_MODES = [INLINE, BOUNDED, SERIAL, THREAD]
+
+
+class _Backend:
+    """Hands out connections, in-process or to a nats-server."""
+
+    def __init__(self, server=None):
+        self.server = server
+
+        self.__jetstream = MemoryJetStream() if server is None else None
+        self.__clients = []
+        self.__dropped = []
+
+    async def connect(self):
+        """Returns (NATS client, JetStream context) of a new connection."""
+        if self.server is None:
+            client = MemoryNatsClient(self.__jetstream)
+
+            return client, client.jetstream()
+
+        client = await nats.connect(self.server)
+        self.__clients.append(client)
+
+        return client, client.jetstream()
+
+    async def setup(self):
+        if self.server is None:
+            return
+
+        _, jetstream = await self.connect()
+
+        for name, topic_hash in self.__streams():
+            await jetstream.add_stream(name=name, subjects=[f"{topic_hash}.>"], storage=nats_config.StorageType.MEMORY)
+
+    async def teardown(self):
+        if self.server is None:
+            for consumer in self.__dropped:
+                await consumer.unsubscribe()
+
+            return
+
+        jetstream = self.__clients[0].jetstream()
+
+        for name, _ in self.__streams():
+            try:
+                await jetstream.delete_stream(name)
+            except Exception:
+                pass
+
+        for client in self.__clients:
+            if not client.is_closed:
+                await client.close()
+
+    async def drop(self, consumer):
+        """
+        Stops delivery to a push consumer like a lost connection does,
+        messages the client already buffered are still handled.
+        """
+        if self.server is None:
+            self.__jetstream.remove_subscription(consumer)
+            self.__dropped.append(consumer)
+        else:
+            await consumer.drain()
+
+    def __streams(self):
+        return [(f"{NAMESPACE}_stream", TOPIC_HASH), (f"Q_{NAMESPACE}", QUEUE_TOPIC_HASH)]
+
+
+class _Stats:
+    def __init__(self, subscribers):
+        self.published = 0
+        self.received = [0] * subscribers
+        self.last_received = None
+        self.latency = LatencyHistogram()
+
+        # Subscriber => publisher => highest message number seen
+        self.last_seen = [{} for _ in range(subscribers)]
+
+        self.queue_published = 0
+        self.queue_handled = 0
+        self.queue_last_handled = None
+        self.queue_latency = LatencyHistogram()
+
+        # Messages sent in this window are replayed from the outbox, their
+        # latency is the outage and shows up as the recovery time instead
+        self.outage_window = None
+
+    def recovered(self, targets):
+        """True once every subscriber saw each publisher's number in targets."""
+        for seen in self.last_seen:
+            for publisher, n in targets.items():
+                if seen.get(publisher, -1) < n:
+                    return False
+
+        return True
+
+
+async def _realtime(backend, args):
+    realtime = Realtime({
+        "api_key": "loadgen",
+        "secret": "loadgen"
+    })
+
+    realtime.init({
+        "staging": True,
+        "opts": {
+            "debug": False,
+            "dispatch": args.dispatch,
+            # Latency summaries are pushed to the RelayX service, which is not there
+            "latency_sample_rate": 0,
+            "outbox_limit": args.outbox_limit
+        }
+    })
+
+    client, jetstream = await backend.connect()
+
+    attach_realtime(realtime, jetstream, namespace=NAMESPACE, topic_hash=TOPIC_HASH, client=client)
+
+    return realtime
+
+
+async def _queue(backend, args):
+    client, jetstream = await backend.connect()
+
+    queue = Queue({
+        "jetstream": jetstream,
+        "nats_client": client,
+        "api_key": "loadgen",
+        "debug": False
+    })
+
+    queue.namespace = NAMESPACE
+    queue.topic_hash = QUEUE_TOPIC_HASH
+
+    return queue
+
+
+async def _subscribe(realtime, index, stats):
+    async def handler(data):
+        message = data["data"]
+        sent = message["sent"]
+
+        stats.received[index] += 1
+        stats.last_received = time.perf_counter()
+
+        seen = stats.last_seen[index]
+
+        if message["n"] > seen.get(message["p"], -1):
+            seen[message["p"]] = message["n"]
+
+        window = stats.outage_window
+
+        if window is None or not window[0] <= sent <= window[1]:
+            stats.latency.record(time.time_ns() - sent)
+
+    await realtime.on(TOPIC, handler)
+
+
+async def _consume(queue, stats):
+    async def handler(message):
+        stats.queue_latency.record(time.time_ns() - message.message["sent"])
+        stats.queue_handled += 1
+        stats.queue_last_handled = time.perf_counter()
+
+        await message.ack()
+
+    await queue.consume({
+        "name": QUEUE_CONSUMER,
+        "group": QUEUE_CONSUMER,
+        "topic": QUEUE_TOPIC
+    }, handler)
+
+
+async def _publish(client, index, args, stop, count):
+    """Publishes until stop is set, count(n) is called after every message."""
+    payload = "x" * args.payload
+    interval = 1 / args.rate if args.rate > 0 else 0
+
+    topic = QUEUE_TOPIC if isinstance(client, Queue) else TOPIC
+    next_send = time.perf_counter()
+    n = 0
+
+    while not stop.is_set():
+        await client.publish(topic, {"p": index, "n": n, "sent": time.time_ns(), "payload": payload})
+        count(n)
+        n += 1
+
+        if interval:
+            next_send += interval
+            delay = next_send - time.perf_counter()
+
+            if delay > 0:
+                await asyncio.sleep(delay)
+        else:
+            # Publishing against the in-memory stream never suspends
+            await asyncio.sleep(0)
+
+
+async def _outage(backend, clients, stats, last_published, seconds, timeout):
+    """
+    Drops the connection of every Realtime client for ``seconds``, then
+    reconnects them and returns the time until the subscribers received
+    everything published offline, None if that took longer than timeout.
+    """
+    stats.outage_window = [time.time_ns(), None]
+
+    for realtime in clients:
+        for consumer in realtime._Realtime__consumers.values():
+            await backend.drop(consumer)
+
+        await realtime._Realtime__on_disconnect()
+
+    await asyncio.sleep(seconds)
+
+    targets = dict(last_published)
+    stats.outage_window[1] = time.time_ns()
+
+    started = time.perf_counter()
+
+    for realtime in clients:
+        await realtime._Realtime__on_reconnect()
+
+    deadline = started + timeout
+
+    while not stats.recovered(targets):
+        if time.perf_counter() > deadline:
+            return None
+
+        await asyncio.sleep(0.001)
+
+    return time.perf_counter() - started
+
+
+async def _drain(done, timeout):
+    deadline = time.perf_counter() + timeout
+
+    while not done() and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Bytes on macOS, kilobytes everywhere else
+    if sys.platform == "darwin":
+        return round(peak / 1024 / 1024, 1)
+
+    return round(peak / 1024, 1)
+
+
+def _rate(count, started, last):
+    if last is None:
+        return 0.0
+
+    return round(count / (last - started), 1)
+
+
+def _latency(histogram):
+    summary = histogram.summary(percentiles=PERCENTILES)
+
+    return {name: round(value, 3) for name, value in summary.items() if name not in ("count", "min")}
+
+
+async def run(args):
+    """Runs one load test described by parsed arguments, returns the report."""
+    backend = _Backend(args.server)
+    await backend.setup()
+
+    stats = _Stats(args.subscribers)
+    stop = asyncio.Event()
+
+    try:
+        subscribers = [await _realtime(backend, args) for _ in range(args.subscribers)]
+        publishers = [await _realtime(backend, args) for _ in range(args.publishers)]
+        workers = [await _queue(backend, args) for _ in range(args.queue_workers)]
+        queue_publishers = [await _queue(backend, args) for _ in range(args.queue_publishers)]
+
+        for index, realtime in enumerate(subscribers):
+            await _subscribe(realtime, index, stats)
+
+        for queue in workers:
+            await _consume(queue, stats)
+
+        last_published = {}
+
+        def published(index):
+            def count(n):
+                stats.published += 1
+                last_published[index] = n
+
+            return count
+
+        def queue_published(n):
+            stats.queue_published += 1
+
+        started = time.perf_counter()
+
+        tasks = [asyncio.create_task(_publish(realtime, index, args, stop, published(index))) for index, realtime in enumerate(publishers)]
+        tasks += [asyncio.create_task(_publish(queue, index, args, stop, queue_published)) for index, queue in enumerate(queue_publishers)]
+
+        recovery = None
+
+        if args.outage > 0:
+            await asyncio.sleep(args.duration / 3)
+            recovery = await _outage(backend, subscribers + publishers, stats, last_published, args.outage, args.drain)
+
+        await asyncio.sleep(max(0, args.duration - (time.perf_counter() - started)))
+
+        stop.set()
+        await asyncio.gather(*tasks)
+
+        elapsed = time.perf_counter() - started
+
+        # Messages the outbox dropped during an outage never arrive
+        def dropped():
+            return sum(realtime.stats()["outbox_dropped"] for realtime in publishers)
+
+        await _drain(lambda: all(received >= stats.published - dropped() for received in stats.received)
+                     and (not workers or stats.queue_handled >= stats.queue_published), args.drain)
+
+        outbox_dropped = dropped()
+
+        for realtime in subscribers + publishers:
+            await realtime.close()
+
+        for queue in workers:
+            await queue.detach_consumer(QUEUE_TOPIC)
+    finally:
+        stop.set()
+        await backend.teardown()
+
+    report = {
+        "target": args.server or "memory",
+        "duration_s": round(elapsed, 3),
+        "realtime": {
+            "publishers": args.publishers,
+            "subscribers": args.subscribers,
+            "published": stats.published,
+            "received": sum(stats.received),
+            # Not delivered by the end of the drain, outbox drops excluded
+            "undelivered": max(0, (stats.published - outbox_dropped) * args.subscribers - sum(stats.received)),
+            "publish_msgs_per_s": round(stats.published / elapsed, 1),
+            "receive_msgs_per_s": _rate(sum(stats.received), started, stats.last_received),
+            "latency_ms": _latency(stats.latency)
+        },
+        "queue": {
+            "publishers": args.queue_publishers,
+            "workers": args.queue_workers,
+            "published": stats.queue_published,
+            "handled": stats.queue_handled,
+            "undelivered": max(0, stats.queue_published - stats.queue_handled) if args.queue_workers else 0,
+            "publish_msgs_per_s": round(stats.queue_published / elapsed, 1),
+            "handle_msgs_per_s": _rate(stats.queue_handled, started, stats.queue_last_handled),
+            "latency_ms": _latency(stats.queue_latency)
+        },
+        "peak_rss_mb": _peak_rss_mb()
+    }
+
+    if args.outage > 0:
+        report["reconnect"] = {
+            "outage_s": args.outage,
+            "recovery_s": round(recovery, 3) if recovery is not None else None,
+            "outbox_dropped": outbox_dropped
+        }
+
+    return report
+
+
+def format_report(report):
+    rows = [("target", report["target"]), ("duration (s)", report["duration_s"])]
+
+    for section in ("realtime", "queue"):
+        for name, value in report[section].items():
+            if name == "latency_ms":
+                for percentile, ms in value.items():
+                    rows.append((f"{section} latency {percentile} (ms)", ms))
+            else:
+                rows.append((f"{section} {name}", value))
+
+    if "reconnect" in report:
+        rows.append(("outage (s)", report["reconnect"]["outage_s"]))
+        rows.append(("reconnect recovery (s)", report["reconnect"]["recovery_s"]))
+        rows.append(("outbox dropped", report["reconnect"]["outbox_dropped"]))
+
+    rows.append(("peak rss (MB)", report["peak_rss_mb"]))
+
+    return tabulate(rows, headers=["metric", "value"])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m relayx_py.loadgen", description="Load generator for relayx_py clients.")
+
+    parser.add_argument("--server", default=None, help="nats-server URL, e.g. nats://localhost:4222. In-process stream if omitted")
+    parser.add_argument("--publishers", type=int, default=1, help="Realtime publishers")
+    parser.add_argument("--subscribers", type=int, default=1, help="Realtime subscribers, every one receives all messages")
+    parser.add_argument("--queue-publishers", type=int, default=0, help="Queue publishers")
+    parser.add_argument("--queue-workers", type=int, default=0, help="Queue workers sharing one consumer")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds to publish for")
+    parser.add_argument("--rate", type=float, default=0, help="Messages per second per publisher, 0 for as fast as possible")
+    parser.add_argument("--payload", type=int, default=64, help="Payload size in bytes")
+    parser.add_argument("--dispatch", choices=DISPATCH_MODES, default=THREAD, help="Realtime dispatch mode")
+    parser.add_argument("--outage", type=float, default=0, help="Seconds of simulated connection loss a third into the run")
+    parser.add_argument("--outbox-limit", type=int, default=DEFAULT_OUTBOX_LIMIT, help="Messages a publisher buffers while offline")
+    parser.add_argument("--drain", type=float, default=10, help="Seconds to wait for outstanding deliveries")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    args = parser.parse_args(argv)
+
+    for name in ("publishers", "subscribers", "queue_publishers", "queue_workers", "payload"):
+        if getattr(args, name) < 0:
+            parser.error(f"--{name.replace('_', '-')} must not be negative")
+
+    for name in ("rate", "outage"):
+        if getattr(args, name) < 0:
+            parser.error(f"--{name} must not be negative")
+
+    if args.outbox_limit <= 0:
+        parser.error("--outbox-limit must be positive")
+
+    if args.duration <= 0 or args.drain <= 0:
+        parser.error("--duration and --drain must be positive")
+
+    if args.outage > 0 and args.outage >= args.duration:
+        parser.error("--outage must be shorter than --duration")
+
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report))
+
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import sys
+import queue
+import atexit
+import logging
+import logging.handlers
+
+LOGGER_NAME = "relayx_py"
+
+# Subsystem loggers, levels can be set on each of them independently
+REALTIME = "realtime"
+QUEUE = "queue"
+KV = "kv"
+
+SUBSYSTEMS = [REALTIME, QUEUE, KV]
+
+# Child of a subsystem logger shared by the clients created with "debug"
+DEBUG_CHILD = "debug"
+
+DEFAULT_FORMAT = "%(asctime)s %(name)s %(levelname)s %(message)s"
+
+# A library should stay silent unless the application configures logging
+logging.getLogger(LOGGER_NAME).addHandler(logging.NullHandler())
+
+_debug_handler = None
+_listener = None
+
+
+def get_logger(subsystem):
+    return logging.getLogger(f"{LOGGER_NAME}.{subsystem}")
+
+
+def debug_logger(subsystem, debug=False):
+    """
+    Returns the logger of a subsystem. ``debug=True`` (the "debug" option
+    of the clients) returns its "debug" child instead, with DEBUG enabled
+    on that child only so other clients in the process keep their level.
+    Records are printed to stdout as the client always did, unless logging
+    was set up with configure_logging().
+    """
+    if debug is not True:
+        return get_logger(subsystem)
+
+    logger = get_logger(f"{subsystem}.{DEBUG_CHILD}")
+    logger.setLevel(logging.DEBUG)
+
+    if _listener is None:
+        _add_debug_handler()
+
+    return logger
+
+
+def _is_debug_record(record):
+    return record.name.endswith(f".{DEBUG_CHILD}")
+
+
+def _add_debug_handler():
+    global _debug_handler
+
+    if _debug_handler is not None:
+        return
+
+    _debug_handler = logging.StreamHandler(sys.stdout)
+    _debug_handler.setFormatter(logging.Formatter("%(message)s"))
+
+    # Only print records of the clients that asked for them
+    _debug_handler.addFilter(_is_debug_record)
+
+    logging.getLogger(LOGGER_NAME).addHandler(_debug_handler)
+
+
+def configure_logging(level=logging.WARNING, levels=None, handler=None, fmt=DEFAULT_FORMAT):
+    """
+    Routes every relayx_py record through a QueueHandler, a listener thread
+    does the formatting and I/O so logging never blocks the event loop.
+
+    Args:
+        level: Level of the relayx_py logger.
+        levels (dict): Per subsystem levels, e.g. {"realtime": "DEBUG"}.
+        handler (logging.Handler): Where records end up, stderr by default.
+        fmt (str): Format used when no handler is passed.
+
+    Returns:
+        logging.handlers.QueueListener: The running listener. Stop it with
+        stop_logging(), which also runs at exit.
+    """
+    global _listener, _debug_handler
+
+    for subsystem in (levels or {}):
+        if subsystem not in SUBSYSTEMS:
+            raise ValueError(f"Unknown logging subsystem '{subsystem}'. Available subsystems => {SUBSYSTEMS}")
+
+    package = logging.getLogger(LOGGER_NAME)
+
+    stop_logging()
+
+    if _debug_handler is not None:
+        package.removeHandler(_debug_handler)
+        _debug_handler = None
+
+    if handler is None:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(fmt))
+
+    records = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(records)
+
+    package.addHandler(queue_handler)
+    package.setLevel(level)
+
+    # Records are handled once by the listener, not again by the root logger
+    package.propagate = False
+
+    for subsystem, subsystem_level in (levels or {}).items():
+        get_logger(subsystem).setLevel(subsystem_level)
+
+    _listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+    _listener.queue_handler = queue_handler
+    _listener.start()
+
+    return _listener
+
+
+def stop_logging():
+    """Flushes and stops the listener started by configure_logging()."""
+    global _listener
+
+    if _listener is None:
+        return
+
+    _listener.stop()
+
+    package = logging.getLogger(LOGGER_NAME)
+    package.removeHandler(_listener.queue_handler)
+    package.propagate = True
+
+    _listener = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,418 @@
+import asyncio
+import uuid
+import json
+import weakref
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import nats.errors
+import nats.js.api as nats_config
+from nats.js.errors import NotFoundError, KeyNotFoundError, NoKeysError
+from nats.js.kv import KeyValue
+
+STREAM_NAME = "memory"
+
+# Namespace and topic hash handed out in place of the server assigned ones
+NAMESPACE = "memory"
+TOPIC_HASH = "memory_hash"
+
+
+def subject_matches(pattern, subject):
+    """NATS subject matching, '*' is one token and a final '>' one or more."""
+    pattern_tokens = pattern.split(".")
+    subject_tokens = subject.split(".")
+
+    for i, token in enumerate(pattern_tokens):
+        if token == ">":
+            return i == len(pattern_tokens) - 1 and len(subject_tokens) > i
+
+        if i >= len(subject_tokens):
+            return False
+
+        if token != "*" and token != subject_tokens[i]:
+            return False
+
+    return len(pattern_tokens) == len(subject_tokens)
+
+
+class MemoryMsg:
+    __slots__ = ("subject", "data", "headers", "metadata", "_stream", "_ackd")
+
+    def __init__(self, stream, seq, subject, data, headers, timestamp, num_pending=0):
+        self._stream = stream
+        self._ackd = False
+
+        self.subject = subject
+        self.data = data
+        self.headers = headers
+        self.metadata = SimpleNamespace(
+            sequence=SimpleNamespace(stream=seq, consumer=seq),
+            num_pending=num_pending,
+            timestamp=timestamp
+        )
+
+    async def ack(self):
+        self._ackd = True
+        self._stream.acks += 1
+
+    async def nak(self, delay=None):
+        self._ackd = True
+        self._stream.naks += 1
+
+    async def term(self):
+        self._ackd = True
+        self._stream.acks += 1
+
+    async def in_progress(self):
+        pass
+
+
+class _PushSubscription:
+    def __init__(self, stream, name, filters, cb, config, manual_ack=False):
+        self.__stream = stream
+        self.name = name
+        self.filters = filters
+        self.__cb = cb
+        self.__config = config
+        self.__manual_ack = manual_ack
+
+        self.__queue = asyncio.Queue()
+        self.__task = asyncio.create_task(self.__deliver())
+
+    def push(self, msg):
+        self.__queue.put_nowait(msg)
+
+    async def __deliver(self):
+        while True:
+            msg = await self.__queue.get()
+
+            try:
+                await self.__cb(msg)
+
+                # Like nats-py, messages are acked after the callback
+                # unless the subscription acks them itself
+                if not self.__manual_ack and not msg._ackd:
+                    await msg.ack()
+            except Exception:
+                # The real client logs and keeps delivering as well
+                pass
+
+    async def consumer_info(self):
+        return SimpleNamespace(name=self.name, config=self.__config)
+
+    async def unsubscribe(self):
+        self.__task.cancel()
+        self.__stream.remove_subscription(self)
+
+
+class _PullConsumer:
+    def __init__(self, stream, name, filters, cursor, config=None):
+        self.__stream = stream
+        self.name = name
+        self.filters = filters
+        self.__config = config
+
+        # Index into the stream log of the next message to hand out
+        self.cursor = cursor
+
+    async def fetch(self, batch=1, timeout=5):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or 0)
+
+        while True:
+            msgs = self.__stream.take(self, batch)
+
+            if msgs:
+                return msgs
+
+            remaining = deadline - loop.time()
+
+            if remaining <= 0:
+                raise nats.errors.TimeoutError
+
+            try:
+                await asyncio.wait_for(self.__stream.wait_for_publish(), remaining)
+            except asyncio.TimeoutError:
+                raise nats.errors.TimeoutError
+
+    async def consumer_info(self):
+        return SimpleNamespace(name=self.name, config=self.__config)
+
+    async def unsubscribe(self):
+        pass
+
+
+class MemoryKeyValue:
+    def __init__(self, bucket):
+        self.__bucket = bucket
+        self.__entries = {}
+        self.__revision = 0
+
+    async def get(self, key):
+        entry = self.__entries.get(key)
+
+        if entry is None:
+            raise KeyNotFoundError
+
+        return entry
+
+    async def put(self, key, value):
+        self.__revision += 1
+        self.__entries[key] = KeyValue.Entry(self.__bucket, key, value, self.__revision, None, None, None)
+
+        return self.__revision
+
+    async def delete(self, key):
+        self.__entries.pop(key, None)
+
+    async def purge(self, key):
+        self.__entries.pop(key, None)
+
+    async def keys(self):
+        if not self.__entries:
+            raise NoKeysError
+
+        return list(self.__entries.keys())
+
+
+class MemoryJetStream:
+    """
+    In-process stand-in for a JetStream context covering what the client
+    uses: publish / publish_async, push and pull consumers, durable
+    consumer management and key value buckets.
+
+    Every subject lands in one in-memory log. It is meant for benchmarks
+    and load generation without a server, not for semantics testing:
+    there is no redelivery, ack wait or retention.
+    """
+
+    def __init__(self, publish_async_max_pending=4000):
+        self.__log = []
+        self.__msg_ids = {}
+        self.__subscriptions = []
+        self.__consumers = {}
+        self.__buckets = {}
+
+        # Ephemeral pull consumers, gone once their subscription is dropped
+        self.__ephemeral = weakref.WeakValueDictionary()
+
+        self.__publish_event = None
+        self.__pending = asyncio.Semaphore(publish_async_max_pending)
+
+        self.acks = 0
+        self.naks = 0
+
+    def __len__(self):
+        return len(self.__log)
+
+    async def publish(self, subject, payload=b"", timeout=None, stream=None, headers=None):
+        return self.__store(subject, payload, headers)
+
+    async def publish_async(self, subject, payload=b"", wait_stall=None, msg_id=None, headers=None):
+        await asyncio.wait_for(self.__pending.acquire(), wait_stall)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        # Acks arrive asynchronously like they would from a server
+        loop.call_soon(self.__resolve, future, subject, payload, headers)
+
+        return future
+
+    def __resolve(self, future, subject, payload, headers):
+        self.__pending.release()
+
+        if not future.done():
+            future.set_result(self.__store(subject, payload, headers))
+
+    def __store(self, subject, payload, headers):
+        msg_id = headers.get(nats_config.Header.MSG_ID.value) if headers else None
+
+        # No duplicate window, an id is stored once for the stream's lifetime
+        if msg_id is not None and msg_id in self.__msg_ids:
+            return nats_config.PubAck(stream=STREAM_NAME, seq=self.__msg_ids[msg_id], duplicate=True)
+
+        seq = len(self.__log) + 1
+
+        if msg_id is not None:
+            self.__msg_ids[msg_id] = seq
+        timestamp = datetime.now(timezone.utc)
+
+        self.__log.append((seq, subject, payload, headers, timestamp))
+
+        for subscription in self.__subscriptions:
+            if any(subject_matches(f, subject) for f in subscription.filters):
+                subscription.push(MemoryMsg(self, seq, subject, payload, headers, timestamp))
+
+        if self.__publish_event is not None:
+            self.__publish_event.set()
+            self.__publish_event = None
+
+        return nats_config.PubAck(stream=STREAM_NAME, seq=seq, duplicate=False)
+
+    def wait_for_publish(self):
+        """
+        Returns an awaitable completing on the next publish. The event is
+        set up before returning, so a publish landing before the awaitable
+        first runs (e.g. inside asyncio.wait_for) still wakes it.
+        """
+        if self.__publish_event is None:
+            self.__publish_event = asyncio.Event()
+
+        return self.__publish_event.wait()
+
+    def take(self, consumer, batch):
+        msgs = []
+        log = self.__log
+
+        while consumer.cursor < len(log) and len(msgs) < batch:
+            seq, subject, payload, headers, timestamp = log[consumer.cursor]
+            consumer.cursor += 1
+
+            if any(subject_matches(f, subject) for f in consumer.filters):
+                msgs.append(MemoryMsg(self, seq, subject, payload, headers, timestamp, len(log) - consumer.cursor))
+
+        return msgs
+
+    async def subscribe(self, subject, queue=None, cb=None, durable=None, stream=None, config=None, manual_ack=False, **kwargs):
+        name = config.name if config is not None and config.name else f"ephemeral_{uuid.uuid4()}"
+        subscription = _PushSubscription(self, name, self.__filters(subject, config), cb, config, manual_ack)
+
+        for seq, msg_subject, payload, headers, timestamp in self.__log[self.__start_index(config):]:
+            if any(subject_matches(f, msg_subject) for f in subscription.filters):
+                subscription.push(MemoryMsg(self, seq, msg_subject, payload, headers, timestamp))
+
+        self.__subscriptions.append(subscription)
+
+        return subscription
+
+    def remove_subscription(self, subscription):
+        if subscription in self.__subscriptions:
+            self.__subscriptions.remove(subscription)
+
+    async def pull_subscribe(self, subject, durable=None, stream=None, config=None, **kwargs):
+        name = durable or (config.durable_name if config is not None and config.durable_name else None)
+
+        # Durable consumers are shared between pull subscriptions
+        if name is not None and name in self.__consumers:
+            return self.__consumers[name]
+
+        ephemeral_name = config.name if config is not None and config.name else f"ephemeral_{uuid.uuid4()}"
+
+        consumer = _PullConsumer(self, name or ephemeral_name, self.__filters(subject, config), self.__start_index(config), config)
+
+        if name is not None:
+            self.__consumers[name] = consumer
+        else:
+            self.__ephemeral[consumer.name] = consumer
+
+        return consumer
+
+    async def consumer_info(self, stream, name, **kwargs):
+        if name not in self.__consumers:
+            raise NotFoundError
+
+        return SimpleNamespace(stream_name=stream, name=name)
+
+    async def add_consumer(self, stream, config=None, **kwargs):
+        name = config.durable_name or config.name
+
+        # Adding an existing consumer updates its filters, like the server does
+        for consumer in self.__subscriptions + list(self.__consumers.values()) + list(self.__ephemeral.values()):
+            if consumer.name == name:
+                consumer.filters = self.__filters(config.filter_subject or ">", config)
+
+                return SimpleNamespace(stream_name=stream, name=name)
+
+        if name not in self.__consumers:
+            self.__consumers[name] = _PullConsumer(self, name, self.__filters(config.filter_subject or ">", config), self.__start_index(config))
+
+        return SimpleNamespace(stream_name=stream, name=name)
+
+    async def delete_consumer(self, stream, name):
+        return self.__consumers.pop(name, None) is not None
+
+    async def key_value(self, bucket):
+        kv = self.__buckets.get(bucket)
+
+        if kv is None:
+            kv = MemoryKeyValue(bucket)
+            self.__buckets[bucket] = kv
+
+        return kv
+
+    def __filters(self, subject, config):
+        if config is not None and config.filter_subjects:
+            return list(config.filter_subjects)
+
+        return [subject]
+
+    def __start_index(self, config):
+        policy = config.deliver_policy if config is not None else None
+
+        if policy == nats_config.DeliverPolicy.ALL:
+            return 0
+
+        if policy == nats_config.DeliverPolicy.BY_START_SEQUENCE:
+            return max(0, (config.opt_start_seq or 1) - 1)
+
+        if policy == nats_config.DeliverPolicy.BY_START_TIME and config.opt_start_time:
+            start = datetime.fromisoformat(config.opt_start_time)
+
+            for index, entry in enumerate(self.__log):
+                if entry[4] >= start:
+                    return index
+
+        return len(self.__log)
+
+
+class MemoryNatsClient:
+    """Minimal NATS client handing out a MemoryJetStream."""
+
+    def __init__(self, jetstream=None):
+        self.client_id = 0
+        self.is_connected = True
+
+        self.__jetstream = jetstream
+
+    def jetstream(self, **kwargs):
+        if self.__jetstream is None:
+            self.__jetstream = MemoryJetStream(**kwargs)
+
+        return self.__jetstream
+
+    async def request(self, subject, payload=b"", timeout=None, headers=None):
+        if subject == "accounts.user.get_queue_namespace":
+            return SimpleNamespace(data=json.dumps({
+                "status": "NAMESPACE_RETRIEVE_SUCCESS",
+                "data": {"namespace": NAMESPACE, "hash": TOPIC_HASH}
+            }).encode("utf-8"))
+
+        return SimpleNamespace(data=b'{"status": "OK", "data": {}}')
+
+    async def close(self):
+        self.is_connected = False
+
+
+def attach_realtime(realtime, jetstream=None, namespace=NAMESPACE, topic_hash=TOPIC_HASH, client=None):
+    """
+    Wires an initialised Realtime client to an in-memory JetStream as if
+    it had connected, for benchmarks and load generation. Passing a NATS
+    ``client`` and its ``jetstream`` context attaches a plain connection
+    (e.g. to a local nats-server) the same way, skipping authentication.
+
+    Returns:
+        MemoryJetStream: The JetStream the client publishes to.
+    """
+    if client is None:
+        client = MemoryNatsClient(jetstream)
+        jetstream = client.jetstream()
+    elif jetstream is None:
+        jetstream = client.jetstream()
+
+    realtime._Realtime__natsClient = client
+    realtime._Realtime__jetstream = jetstream
+    realtime._Realtime__namespace = namespace
+    realtime._Realtime__topicHash = topic_hash
+    realtime._Realtime__connected = True
+
+    return jetstream
@@ -0,0 +1,268 @@
+import math
+import time
+from array import array
+
+# 2^SUB_BUCKET_BITS linear sub-buckets per power of two, i.e. values are
+# kept with a relative error below 1 / 2^(SUB_BUCKET_BITS - 1) (~1.6%)
+SUB_BUCKET_BITS = 7
+
+# Largest trackable value, 2^40 ns is a bit over 18 minutes
+MAX_VALUE_BITS = 40
+
+PERCENTILES = [50, 90, 99, 99.9]
+
+
+class LatencyHistogram:
+    """
+    Fixed size log-linear histogram of nanosecond values (HDR style).
+
+    Recording is a bucket index computation plus an array increment, no
+    allocation per value. Values below zero are clamped to zero (clock
+    skew between hosts) and values above the range to the max.
+    """
+
+    def __init__(self, sub_bucket_bits=SUB_BUCKET_BITS, max_value_bits=MAX_VALUE_BITS):
+        if sub_bucket_bits < 2 or max_value_bits <= sub_bucket_bits:
+            raise ValueError("$max_value_bits must be greater than $sub_bucket_bits >= 2")
+
+        self.__sub_bits = sub_bucket_bits
+        self.__sub_count = 1 << sub_bucket_bits
+        self.__half_count = self.__sub_count >> 1
+        self.__max_value = (1 << max_value_bits) - 1
+
+        self.__counts = array("Q", [0]) * self.__index(self.__max_value) + array("Q", [0])
+
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def record(self, value):
+        if value < 0:
+            value = 0
+        elif value > self.__max_value:
+            value = self.__max_value
+
+        self.__counts[self.__index(value)] += 1
+
+        if self.count == 0 or value < self.min:
+            self.min = value
+
+        if value > self.max:
+            self.max = value
+
+        self.count += 1
+        self.total += value
+
+    def percentile(self, p):
+        """Returns the value at percentile p (0 - 100), 0 if nothing was recorded."""
+        if self.count == 0:
+            return 0
+
+        target = max(1, math.ceil(p / 100 * self.count))
+        seen = 0
+
+        for index, bucket_count in enumerate(self.__counts):
+            seen += bucket_count
+
+            if seen >= target:
+                return min(self.__value(index), self.max)
+
+        return self.max
+
+    def summary(self, percentiles=PERCENTILES, scale=1_000_000):
+        """
+        Compact description of the recorded values, divided by ``scale``
+        (ns to ms by default).
+        """
+        summary = {
+            "count": self.count,
+            "min": self.min / scale,
+            "max": self.max / scale,
+            "mean": (self.total / self.count / scale) if self.count > 0 else 0
+        }
+
+        for p in percentiles:
+            summary[f"p{p:g}".replace(".", "_")] = self.percentile(p) / scale
+
+        return summary
+
+    def reset(self):
+        for index in range(len(self.__counts)):
+            self.__counts[index] = 0
+
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def __index(self, value):
+        if value < self.__sub_count:
+            return value
+
+        shift = value.bit_length() - self.__sub_bits
+
+        return self.__sub_count + (shift - 1) * self.__half_count + (value >> shift) - self.__half_count
+
+    def __value(self, index):
+        # Middle of the bucket, the error is at most half a bucket
+        if index < self.__sub_count:
+            return index
+
+        shift = (index - self.__sub_count) // self.__half_count + 1
+        sub_bucket = (index - self.__sub_count) % self.__half_count + self.__half_count
+
+        return (sub_bucket << shift) + ((1 << shift) >> 1)
+
+
+class ClientMetrics:
+    """
+    Counters and latency histograms of a client.
+
+    Updating a metric is an attribute increment or a histogram record, so
+    they are always on. Gauges owned by other components (dispatch queue
+    depth, outbox size) are passed in when a snapshot is taken.
+    """
+
+    def __init__(self):
+        self.created = time.time()
+
+        self.published = 0
+        self.publish_errors = 0
+        self.publish_ack_latency = LatencyHistogram()
+
+        # Subscription pattern => messages handed to its callback
+        self.received = {}
+
+        self.reconnects = 0
+        self.outages = 0
+        self.outage_seconds = 0.0
+        self.last_outage_seconds = 0.0
+        self.__outage_started = None
+
+        self.queue_fetched = 0
+        self.queue_acked = 0
+        self.queue_nacked = 0
+
+        # KV operation => latency histogram
+        self.kv_latency = {}
+
+    def message_received(self, pattern):
+        self.received[pattern] = self.received.get(pattern, 0) + 1
+
+    def outage_started(self):
+        if self.__outage_started is None:
+            self.__outage_started = time.monotonic()
+
+    def outage_ended(self, reconnected=True):
+        if reconnected:
+            self.reconnects += 1
+
+        if self.__outage_started is None:
+            return
+
+        self.last_outage_seconds = time.monotonic() - self.__outage_started
+        self.outage_seconds += self.last_outage_seconds
+        self.outages += 1
+
+        self.__outage_started = None
+
+    def kv_op(self, op, elapsed_ns):
+        histogram = self.kv_latency.get(op)
+
+        if histogram is None:
+            histogram = LatencyHistogram()
+            self.kv_latency[op] = histogram
+
+        histogram.record(elapsed_ns)
+
+    def snapshot(self, gauges=None):
+        """Returns every metric as a plain dict, latencies in milliseconds."""
+        snapshot = {
+            "uptime_seconds": time.time() - self.created,
+            "publish": {
+                "count": self.published,
+                "errors": self.publish_errors,
+                "ack_latency": self.publish_ack_latency.summary()
+            },
+            "received": dict(self.received),
+            "connection": {
+                "reconnects": self.reconnects,
+                "outages": self.outages,
+                "outage_seconds": self.outage_seconds,
+                "last_outage_seconds": self.last_outage_seconds,
+                "in_outage": self.__outage_started is not None
+            },
+            "queue": {
+                "fetched": self.queue_fetched,
+                "acked": self.queue_acked,
+                "nacked": self.queue_nacked
+            },
+            "kv": {op: histogram.summary() for op, histogram in self.kv_latency.items()}
+        }
+
+        snapshot.update(gauges or {})
+
+        return snapshot
+
+    def openmetrics(self, gauges=None, prefix="relayx"):
+        """
+        Renders the metrics in the OpenMetrics text format, ready to be
+        served on a /metrics endpoint. ``gauges`` is a flat dict of
+        name => value.
+        """
+        lines = []
+
+        def counter(name, value, help_text, labels=""):
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"{prefix}_{name}_total{labels} {value}")
+
+        def summary(name, histogram, help_text, labels=None):
+            lines.append(f"# TYPE {prefix}_{name} summary")
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+
+            for label_set, hist in (labels or [("", histogram)]):
+                separator = "," if label_set else ""
+
+                for p in PERCENTILES:
+                    lines.append(f"{prefix}_{name}{{{label_set}{separator}quantile=\"{p / 100:g}\"}} {hist.percentile(p) / 1e9:g}")
+
+                braces = f"{{{label_set}}}" if label_set else ""
+
+                lines.append(f"{prefix}_{name}_count{braces} {hist.count}")
+                lines.append(f"{prefix}_{name}_sum{braces} {hist.total / 1e9:g}")
+
+        counter("published", self.published, "Messages acknowledged by JetStream")
+        counter("publish_errors", self.publish_errors, "Publishes that failed or timed out")
+        summary("publish_ack_latency_seconds", self.publish_ack_latency, "Time from publish to PubAck")
+
+        lines.append(f"# TYPE {prefix}_received counter")
+        lines.append(f"# HELP {prefix}_received Messages delivered per subscription")
+
+        for pattern, count in self.received.items():
+            lines.append(f"{prefix}_received_total{{subscription=\"{_escape_label(pattern)}\"}} {count}")
+
+        counter("reconnects", self.reconnects, "Successful reconnects")
+        counter("outages", self.outages, "Connection outages")
+        counter("outage_seconds", f"{self.outage_seconds:g}", "Time spent disconnected")
+
+        counter("queue_fetched", self.queue_fetched, "Queue messages fetched")
+        counter("queue_acked", self.queue_acked, "Queue messages acked")
+        counter("queue_nacked", self.queue_nacked, "Queue messages nacked")
+
+        if self.kv_latency:
+            summary("kv_latency_seconds", None, "KV store operation latency",
+                    labels=[(f"op=\"{op}\"", histogram) for op, histogram in self.kv_latency.items()])
+
+        for name, value in (gauges or {}).items():
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {value}")
+
+        lines.append("# EOF")
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label(value):
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
@@ -1,3 +1,5 @@
+from collections.abc import Mapping
+
 
 class Message: 
     id = None
@@ -15,9 +17,108 @@ class Message:
 
         self.msg = message["msg"]
 
+        self.__metrics = message.get("metrics")
+
     async def ack(self):
         await self.msg.ack()
 
+        if self.__metrics is not None:
+            self.__metrics.queue_acked += 1
+
 
     async def nack(self, millis):
         await self.msg.nak(millis)
+
+        if self.__metrics is not None:
+            self.__metrics.queue_nacked += 1
+
+
+MSG_ID_HEADER = "Nats-Msg-Id"
+
+_FIELDS = ("id", "topic", "data")
+
+
+class RealtimeMessage(Mapping):
+    """
+    Immutable message handed to Realtime handlers with the "lazy_messages"
+    option. It keeps the received payload as is and only decodes it the
+    first time ``id`` or ``data`` is read, ``topic`` and the stream
+    metadata (``sequence``, ``timestamp``) never need a decode. One
+    instance is shared by every handler the message matches.
+
+    Reads like the dict handlers get otherwise: message["id"],
+    message["topic"], message["data"].
+    """
+
+    __slots__ = ("topic", "sequence", "timestamp", "__raw", "__headers", "__codec", "__envelope")
+
+    def __init__(self, topic, sequence, timestamp, raw, headers=None, codec=None, envelope=None):
+        setattr_ = object.__setattr__
+
+        setattr_(self, "topic", topic)
+        setattr_(self, "sequence", sequence)
+        setattr_(self, "timestamp", timestamp)
+        setattr_(self, "_RealtimeMessage__raw", raw)
+        setattr_(self, "_RealtimeMessage__headers", headers)
+        setattr_(self, "_RealtimeMessage__codec", codec)
+        setattr_(self, "_RealtimeMessage__envelope", envelope)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RealtimeMessage is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("RealtimeMessage is immutable")
+
+    @property
+    def envelope(self):
+        """The decoded message envelope, decoded on first access."""
+        envelope = self.__envelope
+
+        if envelope is None:
+            envelope = self.__codec.decode(self.__raw, self.__headers)
+
+            object.__setattr__(self, "_RealtimeMessage__envelope", envelope)
+            object.__setattr__(self, "_RealtimeMessage__raw", None)
+
+        return envelope
+
+    @property
+    def decoded(self):
+        return self.__envelope is not None
+
+    @property
+    def id(self):
+        # Publishers send the id as a header too, reading it needs no decode
+        if self.__envelope is None and self.__headers and MSG_ID_HEADER in self.__headers:
+            return self.__headers[MSG_ID_HEADER]
+
+        return self.envelope.get("id")
+
+    @property
+    def data(self):
+        return self.envelope["message"]
+
+    def __getitem__(self, key):
+        if key == "topic":
+            return self.topic
+
+        if key == "id":
+            return self.id
+
+        if key == "data":
+            return self.data
+
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(_FIELDS)
+
+    def __len__(self):
+        return len(_FIELDS)
+
+    def __repr__(self):
+        return f"RealtimeMessage(topic={self.topic!r}, sequence={self.sequence!r})"
+
+    def __reduce__(self):
+        # Process dispatch pickles the message, it is sent decoded
+        return (RealtimeMessage, (self.topic, self.sequence, self.timestamp, None, None, None, self.envelope))
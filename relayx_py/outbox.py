@@ -0,0 +1,218 @@
+import os
+import asyncio
+from collections import deque
+import msgpack
+
+BLOCK = "block"
+DROP_OLDEST = "drop_oldest"
+SPILL = "spill"
+
+OVERFLOW_POLICIES = [BLOCK, DROP_OLDEST, SPILL]
+
+DEFAULT_LIMIT = 10000
+
+JOURNAL_FILE = "outbox.log"
+SPILL_FILE = "spill.log"
+
+
+class Outbox:
+    """
+    Bounded buffer for messages published while offline.
+
+    At most ``limit`` records are kept in memory. When full, ``overflow``
+    decides what happens to a new record:
+
+    - block: ``put()`` waits until a replay frees space
+    - drop_oldest: the oldest record is evicted
+    - spill: the record is appended to a spill segment on disk
+
+    With a ``directory`` the outbox is durable: every buffered record is
+    also appended to a journal segment, which is reloaded on start so
+    messages survive a process restart. ``drain()`` hands out everything
+    buffered and ``commit()`` persists what is left once it was replayed.
+    """
+
+    def __init__(self, limit=DEFAULT_LIMIT, overflow=DROP_OLDEST, directory=None, log=None):
+        if not isinstance(limit, int) or isinstance(limit, bool) or limit <= 0:
+            raise ValueError("$outbox_limit must be a positive integer")
+
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown outbox overflow policy '{overflow}'. Available policies => {OVERFLOW_POLICIES}")
+
+        if overflow == SPILL and directory is None:
+            raise ValueError("$outbox_dir is required for the 'spill' overflow policy")
+
+        self.__limit = limit
+        self.__overflow = overflow
+        self.__directory = directory
+        self.__log = log
+
+        self.__records = deque()
+        self.__waiters = deque()
+
+        self.__dropped = 0
+        self.__journal_count = 0
+        self.__spill_count = 0
+        self.__spill_drained = 0
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self.__load()
+
+    @property
+    def durable(self):
+        return self.__directory is not None
+
+    @property
+    def dropped(self):
+        """Number of records evicted by the drop_oldest policy."""
+        return self.__dropped
+
+    def __len__(self):
+        return len(self.__records) + self.__spill_count
+
+    async def put(self, record):
+        if len(self.__records) >= self.__limit:
+            if self.__overflow == BLOCK:
+                while len(self.__records) >= self.__limit:
+                    waiter = asyncio.get_running_loop().create_future()
+                    self.__waiters.append(waiter)
+
+                    await waiter
+            elif self.__overflow == DROP_OLDEST:
+                self.__records.popleft()
+                self.__dropped += 1
+
+                self.__log_message("Outbox full, dropped oldest message. Total dropped => %s", self.__dropped)
+            else:
+                self.__append(SPILL_FILE, record)
+                self.__spill_count += 1
+
+                return
+
+        self.__records.append(record)
+
+        if self.durable:
+            self.__append(JOURNAL_FILE, record)
+            self.__journal_count += 1
+
+            # drop_oldest leaves evicted records in the journal, compact it
+            if self.__journal_count > 2 * self.__limit:
+                self.__rewrite_journal()
+
+    def drain(self):
+        """
+        Returns every buffered record, oldest first, and empties the
+        in-memory buffer. Durable segments keep them until ``commit()``.
+        """
+        records = list(self.__records)
+        self.__records.clear()
+
+        if self.__spill_count > 0:
+            records.extend(self.__read(SPILL_FILE))
+            self.__spill_drained = self.__spill_count
+
+        self.__wake_waiters()
+
+        return records
+
+    def commit(self, failed=()):
+        """
+        Persists the buffer after drained records have been replayed.
+        ``failed`` records were not published, they go back in front of
+        the buffer (they are the oldest) and stay on disk.
+        """
+        if failed:
+            self.__records.extendleft(reversed(failed))
+
+        if not self.durable:
+            return
+
+        self.__rewrite_journal()
+
+        if self.__spill_drained > 0:
+            # Records spilled while the replay was running stay on disk
+            remaining = self.__read(SPILL_FILE)[self.__spill_drained:]
+            self.__write(SPILL_FILE, remaining)
+
+            self.__spill_count = len(remaining)
+            self.__spill_drained = 0
+
+    def clear(self):
+        self.__records.clear()
+        self.__spill_count = 0
+        self.__spill_drained = 0
+
+        if self.durable:
+            self.__write(JOURNAL_FILE, [])
+            self.__write(SPILL_FILE, [])
+            self.__journal_count = 0
+
+        self.__wake_waiters()
+
+    def __wake_waiters(self):
+        while self.__waiters:
+            waiter = self.__waiters.popleft()
+
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def __load(self):
+        records = self.__read(JOURNAL_FILE)
+
+        if self.__overflow == DROP_OLDEST and len(records) > self.__limit:
+            self.__dropped += len(records) - self.__limit
+            records = records[-self.__limit:]
+
+        self.__records.extend(records)
+        self.__spill_count = len(self.__read(SPILL_FILE))
+
+        self.__rewrite_journal()
+
+        if len(self) > 0:
+            self.__log_message("Loaded %s buffered messages from %s", len(self), self.__directory)
+
+    def __rewrite_journal(self):
+        self.__write(JOURNAL_FILE, self.__records)
+        self.__journal_count = len(self.__records)
+
+    def __path(self, name):
+        return os.path.join(self.__directory, name)
+
+    def __append(self, name, record):
+        with open(self.__path(name), "ab") as f:
+            f.write(msgpack.packb(record))
+
+    def __write(self, name, records):
+        # Write to a temp segment and swap it in so a crash never leaves a half written file
+        tmp_path = self.__path(f"{name}.tmp")
+
+        with open(tmp_path, "wb") as f:
+            for record in records:
+                f.write(msgpack.packb(record))
+
+        os.replace(tmp_path, self.__path(name))
+
+    def __read(self, name):
+        path = self.__path(name)
+
+        if not os.path.exists(path):
+            return []
+
+        records = []
+
+        with open(path, "rb") as f:
+            unpacker = msgpack.Unpacker(f, raw=False)
+
+            try:
+                for record in unpacker:
+                    records.append(record)
+            except (ValueError, msgpack.UnpackException) as e:
+                # A torn write at the tail, keep what was fully written
+                self.__log_message("Truncated outbox segment %s => %s", path, e)
+
+        return records
+
+    def __log_message(self, msg, *args):
+        if self.__log is not None:
+            self.__log(msg, *args)
@@ -0,0 +1,90 @@
+import hashlib
+
+# Assignments are cached per topic, the cache is dropped when it grows
+# past this many topics
+MAX_CACHED_TOPICS = 10_000
+
+
+def jump_hash(key, buckets):
+    """
+    Jump consistent hash (Lamping & Veach). Maps a 64 bit key to a bucket
+    in [0, buckets), growing the pool from n to n + 1 buckets only moves
+    1 / (n + 1) of the keys.
+    """
+    if buckets <= 0:
+        raise ValueError("$buckets must be a positive integer")
+
+    bucket = -1
+    j = 0
+
+    while j < buckets:
+        bucket = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+
+    return bucket
+
+
+def topic_key(topic):
+    """Stable 64 bit key of a topic, hash() is salted per process."""
+    return int.from_bytes(hashlib.blake2b(topic.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class ConnectionPool:
+    """
+    NATS connections publishes and receive partitions are spread over. A
+    topic always maps to the same connection, so messages of one topic
+    keep their order while different topics use different sockets and
+    flushers.
+    """
+
+    def __init__(self):
+        self.__clients = []
+        self.__jetstreams = []
+        self.__assigned = {}
+
+    def __len__(self):
+        return len(self.__jetstreams)
+
+    @property
+    def clients(self):
+        return list(self.__clients)
+
+    def add(self, client, jetstream):
+        self.__clients.append(client)
+        self.__jetstreams.append(jetstream)
+
+        self.__assigned.clear()
+
+    def index(self, topic):
+        index = self.__assigned.get(topic)
+
+        if index is None:
+            index = jump_hash(topic_key(topic), len(self.__jetstreams))
+
+            if len(self.__assigned) >= MAX_CACHED_TOPICS:
+                self.__assigned.clear()
+
+            self.__assigned[topic] = index
+
+        return index
+
+    def jetstream(self, topic):
+        """Returns the JetStream context of the connection owning topic."""
+        return self.__jetstreams[self.index(topic)]
+
+    def jetstream_at(self, index):
+        """Returns the JetStream context of the connection at index."""
+        return self.__jetstreams[index]
+
+    async def close(self):
+        # The first connection is the primary one, close it last
+        for client in reversed(self.__clients):
+            try:
+                await client.close()
+            except Exception:
+                pass
+
+        self.__clients.clear()
+        self.__jetstreams.clear()
+        self.__assigned.clear()
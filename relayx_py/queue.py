@@ -1,12 +1,15 @@
 import asyncio
 import uuid
 import json
-import msgpack
 import re
 import inspect
+import logging
 from datetime import datetime, timezone
 import nats.js.api as nats_config
 from relayx_py.models.message import Message
+from relayx_py.codec import MessageCodec
+from relayx_py.topic_index import TopicIndex
+from relayx_py.log import debug_logger, QUEUE
 from nats.js.errors import APIError
 
 class Queue:
@@ -42,8 +45,14 @@ class Queue:
 
         self.__event_func = {}
         self.__topic_map = []
+        self.__topic_index = TopicIndex()
 
         self.__debug = config.get("debug", False)
+        self.__logger = debug_logger(QUEUE, self.__debug)
+
+        self.__codec = config.get("codec") or MessageCodec(matcher=self.__topic_pattern_matcher)
+        self.__metrics = config.get("metrics")
+        self.__tracer = config.get("tracer")
 
         # Status Codes (private)
         self.__RECONNECTING = "RECONNECTING"
@@ -168,26 +177,41 @@ class Queue:
         }
 
         if self.connected:
-            self.__log("Encoding message via msgpack...")
-            encoded_message = msgpack.packb(message)
+            debug = self.__logger.isEnabledFor(logging.DEBUG)
+
+            encoded_message, headers = self.__codec.encode(topic, message)
+
+            span = None
+
+            if self.__tracer is not None:
+                span = self.__tracer.start_span("relayx.queue.publish", {"topic": topic})
+                headers = self.__tracer.inject(span, headers)
 
-            self.__log(f"Publishing to topic => {self.__get_stream_topic(topic)}")
+            if debug:
+                self.__logger.debug("Publishing to topic => %s", self.__get_stream_topic(topic))
 
             ack = None
 
             try:
-                ack = await self.__jetstream.publish(self.__get_stream_topic(topic), encoded_message)
-                self.__log("Publish Ack =>")
-                self.__log(ack)
+                ack = await self.__jetstream.publish(self.__get_stream_topic(topic), encoded_message, headers=headers)
 
-                latency = (datetime.now(timezone.utc).timestamp() * 1000) - start
-                self.__log(f"Latency => {latency} ms")
+                if debug:
+                    latency = (datetime.now(timezone.utc).timestamp() - start) * 1000
+                    self.__logger.debug("Publish Ack => %s, latency => %s ms", ack, latency)
             except Exception as err:
-                self.__log(f"Error publishing: {err}")
+                self.__log("Error publishing: %s", err)
+
+                if span is not None:
+                    self.__tracer.end_span(span, err)
+                    span = None
+
+            if span is not None:
+                self.__tracer.end_span(span)
 
             return ack is not None
         else:
-            print("offline!")
+            self.__log("Offline, buffering message for %s", topic)
+
             self.__offline_message_buffer.append({
                 "topic": topic,
                 "message": data
@@ -234,6 +258,7 @@ class Queue:
                 raise ValueError("Invalid topic, use is_topic_valid($topic) to validate topic")
 
             self.__topic_map.append(topic)
+            self.__topic_index.add(topic)
 
             if self.connected:
                 await self.__start_consumer(data)
@@ -257,6 +282,7 @@ class Queue:
             raise ValueError(f"Expected the topic type -> string. Instead received -> {type(topic)}")
         
         self.__topic_map = [item for item in self.__topic_map if item != topic]
+        self.__topic_index.remove(topic)
 
         consumer = self.__consumer_map[topic]
 
@@ -268,7 +294,7 @@ class Queue:
         if topic in self.__consumer_map:
             del self.__consumer_map[topic]
 
-        self.__log(f"Consumer closed => {topic}")
+        self.__log("Consumer closed => %s", topic)
 
 
     async def __publish_messages_on_reconnect(self):
@@ -318,13 +344,21 @@ class Queue:
                 if msg is None:
                     continue
 
+                if self.__metrics is not None:
+                    self.__metrics.queue_fetched += 1
+
+                span = None
+
+                if self.__tracer is not None:
+                    span = self.__tracer.start_span("relayx.queue.receive", {"subject": msg.subject}, msg.headers)
+
                 try:
-                    self.__log("Decoding msgpack message...")
-                    data = msgpack.unpackb(msg.data, raw=False)
+                    data = self.__codec.decode(msg.data, msg.headers)
 
                     msg_topic = self.__strip_stream_hash(msg.subject)
 
-                    self.__log(data)
+                    if self.__logger.isEnabledFor(logging.DEBUG):
+                        self.__logger.debug("Received message => %s", data)
 
                     # Push topic message to main thread
                     topic_match = self.__topic_pattern_matcher(topic, msg_topic)
@@ -334,14 +368,27 @@ class Queue:
                             "id": data.get("id"),
                             "topic": msg_topic,
                             "message": data.get("message"),
-                            "msg": msg
+                            "msg": msg,
+                            "metrics": self.__metrics
                         })
 
+                        if span is not None:
+                            self.__tracer.add_event(span, "handler", {"topic": topic})
+
                         await self.__event_func[topic](message)
+
+                    if span is not None:
+                        self.__tracer.end_span(span)
                 except Exception as err:
-                    self.__log(f"Consumer err {err}")
+                    self.__log("Consumer err %s", err)
                     await msg.nak()
 
+                    if self.__metrics is not None:
+                        self.__metrics.queue_nacked += 1
+
+                    if span is not None:
+                        self.__tracer.end_span(span, err)
+
         name = config.get("name")
         topic = config.get("topic")
 
@@ -374,12 +421,12 @@ class Queue:
         except Exception as e:
             self.__log(e)
 
-        self.__log(consumer_info != None)
+        self.__log("Consumer exists => %s", consumer_info != None)
 
         try:
             await self.__jetstream.add_consumer(stream=self.__get_queue_name(), config=nats_config.ConsumerConfig(**opts))
 
-            self.__log(f"Consumer {"created" if consumer_info == None else "Updated"}")
+            self.__log("Consumer %s", "created" if consumer_info == None else "Updated")
         except Exception as e:
             self.__log(e)
             self.__log("Consumer create / update error")
@@ -433,6 +480,9 @@ class Queue:
             Every pattern key from ``self._event_func`` that matches *topic*
             and is **not** one of the control events.
         """
+        if "*" not in topic and ">" not in topic:
+            return self.__topic_index.match(topic)
+
         ignore = {
             self.CONNECTED,
             self.RECONNECT,
@@ -642,7 +692,6 @@ class Queue:
         await asyncio.sleep(milliseconds / 1000)
 
 
-    def __log(self, msg):
-        """Log message if debug is enabled."""
-        if self.__debug:
-            print(msg)
+    def __log(self, msg, *args):
+        """Debug log, %-style args are only formatted if the record is emitted."""
+        self.__logger.debug(msg, *args)
@@ -5,28 +5,38 @@ import asyncio
 import tzlocal
 import nats
 from nats.aio.client import RawCredentials
-from concurrent.futures import ThreadPoolExecutor
 import nats.js.api as nats_config
 from nats.js.errors import ServiceUnavailableError
 import json
 import re
 import inspect
-import msgpack
 import uuid
 import numbers
+import random
 import socket
 from functools import wraps
 import os
 import re
+import logging
 from relayx_py.queue import Queue
 from relayx_py.utils import ErrorLogging
 from relayx_py.kv_storage import KVStore
+from relayx_py.codec import MessageCodec, DEFAULT_CODEC
+from relayx_py.compression import DEFAULT_THRESHOLD
+from relayx_py.topic_index import TopicIndex
+from relayx_py.dispatch import create_dispatcher, THREAD, DEFAULT_CONCURRENCY
+from relayx_py.outbox import Outbox, DROP_OLDEST, DEFAULT_LIMIT as DEFAULT_OUTBOX_LIMIT
+from relayx_py.metrics import LatencyHistogram, ClientMetrics
+from relayx_py.tracing import Tracer
+from relayx_py.history_cache import HistoryCache, to_micros, from_micros
+from relayx_py.log import debug_logger, REALTIME
+from relayx_py.pool import ConnectionPool
+from relayx_py.filters import FilterSet, DEFAULT_MAX_FILTERS, ALL
+from relayx_py.dedupe import DedupeWindow
+from relayx_py.topic_handle import TopicHandle
+from relayx_py.models.message import RealtimeMessage
 
 class Realtime:
-    __event_func = {}
-    __topic_map = []
-    __pool = None
-
     CONNECTED = "CONNECTED"
     RECONNECT = "RECONNECT"
     MESSAGE_RESEND = "MESSAGE_RESEND"
@@ -37,13 +47,61 @@ class Realtime:
     __RECONNECTED = "RECONNECTED"
     __RECONN_FAIL = "RECONN_FAIL"
 
-    __reserved_topics = [CONNECTED, DISCONNECTED, RECONNECT, __RECONNECTED, __RECONNECTING, __RECONN_FAIL, MESSAGE_RESEND]
+    __reserved_topics = frozenset([CONNECTED, DISCONNECTED, RECONNECT, __RECONNECTED, __RECONNECTING, __RECONN_FAIL, MESSAGE_RESEND])
+
+    __TOPIC_REGEX = re.compile(r"^(?!.*\$)(?:[A-Za-z0-9_*~-]+(?:\.[A-Za-z0-9_*~-]+)*(?:\.>)?|>)$")
 
     __natsClient = None
     __jetstream = None
     __jsManager = None
     __consumerMap = {}
-    __consumer = None
+
+    # Consumer modes
+    __PUSH = "push"
+    __PULL = "pull"
+
+    # Pull consumer flow control. Fetching pauses once __high_watermark
+    # handler calls are pending and resumes at __low_watermark
+    __consumer_mode = __PUSH
+    __fetch_batch = 100
+    __high_watermark = 1000
+    __low_watermark = 500
+    __max_ack_pending = None
+
+    # Receiving is split over this many consumers, each one gets its share
+    # of the subscription filters (see relayx_py.filters). Partition n
+    # consumes on connection n % connections
+    __receive_partitions = 1
+
+    # Consumers filter on the subscriptions up to this many of them, past
+    # it they take every subject of the namespace and get_callback_topics()
+    # drops the ones nobody subscribed to
+    __max_filters = DEFAULT_MAX_FILTERS
+
+    # Consumer filter changes from on()/off() within this many seconds are
+    # applied as one update. With 0 (default) on() returns once the server
+    # filter includes the topic, otherwise messages published before the
+    # debounced update lands are not delivered
+    __filter_debounce = 0
+
+    # History consumers, messages per fetch, seconds to wait for a batch
+    # and idle seconds before the server removes the consumer
+    __HISTORY_BATCH = 256
+    __HISTORY_FETCH_TIMEOUT = 1
+    __HISTORY_INACTIVE_THRESHOLD = 30
+
+    # Ack modes
+    __ACK_EXPLICIT = "explicit"
+    __ACK_ALL = "all"
+    __ACK_NONE = "none"
+
+    # With AckPolicy.ALL the newest delivered message is acked every
+    # __ack_interval seconds or once __ack_batch messages are unacked
+    __ack_mode = __ACK_EXPLICIT
+    __ack_interval = 0.1
+    __ack_batch = 100
+    __unacked_count = 0
+    __ack_flush_task = None
 
     __kv_store = None
 
@@ -56,15 +114,38 @@ class Realtime:
 
     __auth_err_logged = False
 
-    __offline_message_buffer = []
-
-    __latency = []
-    __latency_push_task = None
-    __is_sending_latency = False
+    __latency_task = None
+    # "start" values below this are seconds, not milliseconds (year 1973 in ms)
+    __MS_EPOCH_THRESHOLD = 100_000_000_000
+    __latency_interval = 30
+    __latency_sample_rate = 1.0
+    __timezone = None
 
     __disconnect_time = None
     __connect_called = False
 
+    # Max PubAcks outstanding in publish_many() and
+    # seconds to wait for each of them
+    __publish_window = 1000
+    __ack_timeout = 5
+
+    # Max async publishes awaiting a PubAck on the connection and
+    # seconds publish_async() waits for a free slot (None => forever)
+    __max_pending_publishes = 4000
+    __publish_stall_timeout = None
+
+    # NATS connections publishes are spread over by topic and receive
+    # partitions by index, the first one also carries the connection status
+    __connections = 1
+    __pool = None
+
+    # The message id travels in this header too, JetStream drops messages
+    # with an id it stored within the stream's duplicate window
+    __MSG_ID_HEADER = nats_config.Header.MSG_ID.value
+
+    # Handlers get a RealtimeMessage decoded on first access instead of a dict
+    __lazy_messages = False
+
     def __init__(self, config=None):
         if config is not None:
             if type(config) is not dict:
@@ -99,7 +180,58 @@ class Realtime:
 
         self.__error_logging = ErrorLogging()
 
-        self._pool = ThreadPoolExecutor(max_workers=1000)
+        self.__debug = False
+        self.__logger = debug_logger(REALTIME)
+
+        self.__codec = MessageCodec(matcher=self.topic_pattern_matcher)
+
+        self.__event_func = {}
+
+        # Subscribed and published topics, a dict keeps insertion order
+        # and makes the per-publish membership check O(1)
+        self.__topic_map = {}
+        self.__topic_index = TopicIndex()
+
+        # Consumer filter subjects of the subscriptions, kept up to date on
+        # on() / off() instead of being reduced from scratch. None past
+        # __max_filters subscriptions
+        self.__filter_set = FilterSet()
+
+        # Receive partition => consumer, its fetch task (pull mode) and the
+        # filter subjects it was created with
+        self.__consumers = {}
+        self.__pull_tasks = {}
+        self.__partition_filters = {}
+        self.__consumer_lock = asyncio.Lock()
+        self.__filter_update_task = None
+
+        # Newest unacked message per receive partition (AckPolicy.ALL)
+        self.__unacked = {}
+
+        # Stream sequence of the last message received per partition,
+        # consumers recreated on reconnect resume right after it
+        self.__last_sequence = {}
+
+        # Pool connection index => when it went down, consumers recreated
+        # on it without a last sequence start from there
+        self.__pool_disconnect_times = {}
+
+        self.__outbox = Outbox(log=self.__log)
+
+        self.__history_cache = None
+
+        # Topic => lock, one cached history read fills or resets a topic at a time
+        self.__history_locks = {}
+
+        self.__dedupe = None
+
+        self.__latency_histogram = LatencyHistogram()
+
+        self.__metrics = ClientMetrics()
+
+        self.__tracer = None
+
+        self.__dispatcher = create_dispatcher(log=self.__log)
 
         self.quit_event = asyncio.Event()
         
@@ -127,6 +259,94 @@ class Realtime:
                 self.__debug = self.opts["debug"]
             else:
                 self.__debug = False
+
+            self.__logger = debug_logger(REALTIME, self.__debug)
+
+            if "publish_window" in self.opts:
+                self.__publish_window = self.opts["publish_window"]
+
+            if "max_pending_publishes" in self.opts:
+                self.__max_pending_publishes = self.opts["max_pending_publishes"]
+
+            if "publish_stall_timeout" in self.opts:
+                self.__publish_stall_timeout = self.opts["publish_stall_timeout"]
+
+            if "receive_partitions" in self.opts:
+                partitions = self.opts["receive_partitions"]
+
+                if not isinstance(partitions, int) or isinstance(partitions, bool) or partitions <= 0:
+                    raise ValueError("$receive_partitions must be a positive integer")
+
+                self.__receive_partitions = partitions
+
+            if "max_filters" in self.opts:
+                max_filters = self.opts["max_filters"]
+
+                if not isinstance(max_filters, int) or isinstance(max_filters, bool) or max_filters <= 0:
+                    raise ValueError("$max_filters must be a positive integer")
+
+                self.__max_filters = max_filters
+
+            self.__filter_set = None
+            self.__track_filters()
+
+            if "filter_debounce" in self.opts:
+                debounce = self.opts["filter_debounce"]
+
+                if not isinstance(debounce, (int, float)) or isinstance(debounce, bool) or debounce < 0:
+                    raise ValueError("$filter_debounce must be a non negative number")
+
+                self.__filter_debounce = debounce
+
+            if "connections" in self.opts:
+                connections = self.opts["connections"]
+
+                if not isinstance(connections, int) or isinstance(connections, bool) or connections <= 0:
+                    raise ValueError("$connections must be a positive integer")
+
+                self.__connections = connections
+
+            self.__codec = MessageCodec(
+                codec=self.opts.get("codec", DEFAULT_CODEC),
+                topic_codecs=self.opts.get("topic_codecs"),
+                matcher=self.topic_pattern_matcher,
+                compression=self.opts.get("compression"),
+                compression_threshold=self.opts.get("compression_threshold", DEFAULT_THRESHOLD)
+            )
+
+            self.__dispatcher = create_dispatcher(
+                mode=self.opts.get("dispatch", THREAD),
+                concurrency=self.opts.get("dispatch_concurrency", DEFAULT_CONCURRENCY),
+                workers=self.opts.get("dispatch_workers"),
+                log=self.__log
+            )
+
+            self.__init_flow_control(self.opts)
+            self.__init_latency(self.opts)
+
+            self.__outbox = Outbox(
+                limit=self.opts.get("outbox_limit", DEFAULT_OUTBOX_LIMIT),
+                overflow=self.opts.get("outbox_overflow", DROP_OLDEST),
+                directory=self.opts.get("outbox_dir"),
+                log=self.__log
+            )
+
+            self.__tracer = self.opts.get("tracer")
+
+            if self.__tracer != None and not isinstance(self.__tracer, Tracer):
+                raise ValueError("$tracer must be a relayx_py.tracing.Tracer")
+
+            if self.opts.get("history_cache") != None:
+                self.__history_cache = HistoryCache(self.opts["history_cache"], log=self.__log)
+
+            self.__lazy_messages = self.opts.get("lazy_messages", False) is True
+
+            dedupe = self.opts.get("dedupe")
+
+            if dedupe is True:
+                self.__dedupe = DedupeWindow()
+            elif dedupe is not None and dedupe is not False:
+                self.__dedupe = DedupeWindow(dedupe)
         else:
             self.__debug = False
 
@@ -149,6 +369,60 @@ class Realtime:
         self.__log(self.__base_url)
             
 
+    def __init_latency(self, opts):
+        sample_rate = opts.get("latency_sample_rate", 1.0)
+
+        if not isinstance(sample_rate, numbers.Number) or isinstance(sample_rate, bool) or not 0 <= sample_rate <= 1:
+            raise ValueError("$latency_sample_rate must be a number between 0 and 1")
+
+        interval = opts.get("latency_interval", 30)
+
+        if not isinstance(interval, numbers.Number) or isinstance(interval, bool) or interval <= 0:
+            raise ValueError("$latency_interval must be a positive number of seconds")
+
+        self.__latency_sample_rate = sample_rate
+        self.__latency_interval = interval
+
+
+    def __init_flow_control(self, opts):
+        self.__consumer_mode = opts.get("consumer_mode", self.__PUSH)
+
+        if self.__consumer_mode not in [self.__PUSH, self.__PULL]:
+            raise ValueError("$consumer_mode must be 'push' or 'pull'")
+
+        for key in ["fetch_batch", "high_watermark", "low_watermark", "max_ack_pending"]:
+            value = opts.get(key)
+
+            if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value <= 0):
+                raise ValueError(f"${key} must be a positive integer")
+
+        self.__fetch_batch = opts.get("fetch_batch", 100)
+        self.__high_watermark = opts.get("high_watermark", 1000)
+        self.__low_watermark = opts.get("low_watermark", self.__high_watermark // 2)
+        self.__max_ack_pending = opts.get("max_ack_pending")
+
+        if self.__low_watermark >= self.__high_watermark:
+            raise ValueError("$low_watermark must be lower than $high_watermark")
+
+        self.__ack_mode = opts.get("ack_mode", self.__ACK_EXPLICIT)
+
+        if self.__ack_mode not in [self.__ACK_EXPLICIT, self.__ACK_ALL, self.__ACK_NONE]:
+            raise ValueError("$ack_mode must be 'explicit', 'all' or 'none'")
+
+        ack_interval = opts.get("ack_interval", 100)
+
+        if not isinstance(ack_interval, numbers.Number) or isinstance(ack_interval, bool) or ack_interval <= 0:
+            raise ValueError("$ack_interval must be a positive number of milliseconds")
+
+        ack_batch = opts.get("ack_batch", 100)
+
+        if not isinstance(ack_batch, int) or isinstance(ack_batch, bool) or ack_batch <= 0:
+            raise ValueError("$ack_batch must be a positive integer")
+
+        self.__ack_interval = ack_interval / 1000
+        self.__ack_batch = ack_batch
+
+
     async def __get_namespace(self):
         """
         Gets the __namespace of the user using a service
@@ -162,7 +436,7 @@ class Realtime:
         try:
             response = await self.__natsClient.request("accounts.user.get_namespace", encoded, timeout=5)
         except Exception as e:
-            self.__log(f"Error getting namespace: {e}")
+            self.__log("Error getting namespace: %s", e)
             response = None
         
         if response:
@@ -180,37 +454,21 @@ class Realtime:
 
     async def __push_latency(self, data):
         """
-        Gets the __namespace of the user using a service
+        Sends a latency summary to the server
         """
-        self.__is_sending_latency = True
-
         encoded = self.__encode_json({
             "api_key": self.api_key,
             "payload": data
         })
 
-        response = None
         try:
             response = await self.__natsClient.request("accounts.user.log_latency", encoded, timeout=5)
         except Exception as e:
-            self.__log(f"Error getting namespace: {e}")
-            response = None
-        
-        if response:
-            resp_data = response.data.decode('utf-8')
-            resp_data = json.loads(resp_data)
-
-            self.__latency.clear()
+            self.__log("Error pushing latency: %s", e)
+            return
 
-            if self.__latency_push_task is not None:
-                self.__latency_push_task.cancel()
-                self.__latency_push_task = None
-            
-            self.__log(f"Latency push response: {resp_data}")
-        else:
-            self.__log("Repsonse is None")
-        
-        self.__is_sending_latency = False
+        resp_data = json.loads(response.data.decode('utf-8'))
+        self.__log("Latency push response: %s", resp_data)
 
 
     async def connect(self):
@@ -233,7 +491,10 @@ class Realtime:
             }
 
             self.__natsClient = await nats.connect(**options)
-            self.__jetstream = self.__natsClient.jetstream()
+            self.__jetstream = self.__natsClient.jetstream(publish_async_max_pending=self.__max_pending_publishes)
+
+            if self.__connections > 1:
+                await self.__open_pool(options)
 
             self.__connection_status = "CONNECTED"
 
@@ -257,6 +518,81 @@ class Realtime:
         await self.__run_in_background(__connect)
 
 
+    async def __open_pool(self, options):
+        """
+        Opens the extra connections. They reconnect on their own and only
+        recreate the consumers of their receive partitions, the client
+        status follows the primary connection only.
+        """
+        pool = ConnectionPool()
+        pool.add(self.__natsClient, self.__jetstream)
+
+        for index in range(1, self.__connections):
+            async def on_disconnect(index=index):
+                self.__pool_disconnect_times[index] = datetime.now(timezone.utc).isoformat()
+
+            async def on_reconnect(index=index):
+                await self.__on_pool_reconnect(index)
+
+            extra_options = dict(options, reconnected_cb=on_reconnect, disconnected_cb=on_disconnect)
+            extra_options.pop("closed_cb")
+
+            client = await nats.connect(**extra_options)
+            pool.add(client, client.jetstream(publish_async_max_pending=self.__max_pending_publishes))
+
+        self.__pool = pool
+
+        self.__log("Opened %d connections", len(pool))
+
+
+    async def __on_pool_reconnect(self, index):
+        self.__log("Pool connection %d reconnected", index)
+
+        self.__drop_partitions(index)
+
+        # Otherwise the primary connection's reconnect recreates them
+        if self.__connected:
+            try:
+                await self.__update_partitions()
+            except Exception as e:
+                self.__log("Consumer error after pool reconnect => %s", e)
+
+            self.__pool_disconnect_times.pop(index, None)
+
+
+    def __connection_index(self, partition):
+        if self.__pool is None:
+            return 0
+
+        return partition % len(self.__pool)
+
+
+    def __partition_jetstream(self, partition):
+        if self.__pool is None:
+            return self.__jetstream
+
+        return self.__pool.jetstream_at(self.__connection_index(partition))
+
+
+    def __drop_partitions(self, index):
+        """
+        Forgets the consumers of the partitions on connection index, their
+        subscriptions died with it. The next partition update creates them
+        again, resuming from the last sequence each one received.
+        """
+        for partition in list(self.__consumers):
+            if self.__connection_index(partition) != index:
+                continue
+
+            task = self.__pull_tasks.pop(partition, None)
+
+            if task is not None:
+                task.cancel()
+
+            self.__consumers.pop(partition)
+            self.__partition_filters.pop(partition, None)
+
+
     async def __on_disconnect(self):
         self.__log("Disconnected from server")
 
@@ -265,6 +601,7 @@ class Realtime:
         self.__disconnected = True
         self.__connected = False
         self.__disconnect_time = datetime.now(timezone.utc).isoformat()
+        self.__metrics.outage_started()
 
         if not self.__manual_disconnect:
             # This was not a manual disconnect.
@@ -281,13 +618,23 @@ class Realtime:
         self.__connected = True
 
         self.__connection_status = "RECONNECTED"
+        self.__metrics.outage_ended()
 
         if self.RECONNECT in self.__event_func:
             self.__execute_topic_callback(self.RECONNECT, self.__RECONNECTED)
 
-        self.__consumer = None
+        # Partitions on pool connections keep their consumers, those
+        # connections reconnect on their own
+        self.__stop_filter_update()
+        self.__drop_partitions(0)
 
-        await self.__subscribe_to_topics()
+        if len(self.__topic_map) > 0:
+            await self.__update_partitions()
+
+        # Consumers missing messages from the outage were created above,
+        # ones created by later on() calls start from now
+        self.__disconnect_time = None
+        self.__pool_disconnect_times.clear()
 
         # Publish messages issued when client was in reconnection state
         await self.__publish_messages_on_reconnect()
@@ -329,7 +676,7 @@ class Realtime:
 
         self.__connection_status = "CLOSED"
 
-        self.__offline_message_buffer.clear()
+        self.__clear_outbox()
         self.__disconnect_time = None
         self.__connected = False
         self.__disconnected = True
@@ -343,7 +690,7 @@ class Realtime:
 
 
     async def __on_reconnect_attempt(self):
-        self.__log(f"Reconnection attempt underway...")
+        self.__log("Reconnection attempt underway...")
 
         self.__connection_status = "RECONNECTING"
 
@@ -365,11 +712,24 @@ class Realtime:
 
             self.__manual_disconnect = True
 
-            self.__offline_message_buffer.clear()
+            self.__clear_outbox()
 
             await self.__delete_consumer()
 
-            await self.__natsClient.close()
+            await self.__dispatcher.close()
+
+            self.__stop_latency_task()
+
+            if self.__history_cache != None:
+                self.__history_cache.close()
+
+            if self.__pool is not None:
+                # Closes the primary connection as well
+                await self.__pool.close()
+                self.__pool = None
+            else:
+                await self.__natsClient.close()
+
             self.quit_event.set()
         else:
             self.__manual_disconnect = False
@@ -378,60 +738,94 @@ class Realtime:
 
 
     async def publish(self, topic, data):
-        if topic == None:
-            raise ValueError("$topic cannot be None.")
-        
-        if topic == "":
-            raise ValueError("$topic cannot be an empty string.")
-        
-        if not isinstance(topic, str):
-            raise ValueError("$topic must be a string.")
-        
-        if not self.is_topic_valid(topic):
-            raise ValueError("$topic is not valid, use is_topic_valid($topic) to validate topic")
-        
+        self.__validate_publish(topic, data)
+
+        return await self.__publish(topic, None, data)
+
+
+    def topic(self, topic):
+        """
+        Returns a handle publishing to topic. The topic is validated here
+        once instead of on every publish, which suits hot publish loops.
+
+        Args:
+            topic (str): Topic to publish to.
+
+        Returns:
+            TopicHandle: Handle with publish(data) and publish_async(data).
+        """
+        self.__validate_topic(topic)
+
+        return TopicHandle(topic, self.__publish_handle, self.__publish_async_handle)
+
+
+    async def __publish_handle(self, handle, data):
         self.is_message_valid(data)
 
-        start = datetime.now(timezone.utc).timestamp()
+        return await self.__publish(handle.topic, self.__handle_subject(handle), data)
 
-        if self.__connected:
-            message_id = str(uuid.uuid4())
 
-            message = {
-                "id": message_id,
-                "room": topic,
-                "message": data,
-                "start": int(datetime.now(timezone.utc).timestamp())
-            }
+    async def __publish_async_handle(self, handle, data):
+        self.is_message_valid(data)
 
-            encoded = msgpack.packb(message)
+        return await self.__publish_async(handle.topic, self.__handle_subject(handle), data)
 
-            if topic not in self.__topic_map:
-                self.__topic_map.append(topic)
-            else:
-                self.__log(f"{topic} exitsts locally, moving on...")
 
-            topic = self.__get_stream_topic(topic)
-            self.__log(f"Publishing to topic => {self.__get_stream_topic(topic)}")
+    def __handle_subject(self, handle):
+        # The namespace hash is only known once connected
+        if handle.topic_hash != self.__topicHash:
+            handle.subject = self.__get_stream_topic(handle.topic)
+            handle.topic_hash = self.__topicHash
+
+        return handle.subject
+
+
+    async def __publish(self, topic, subject, data):
+        if self.__connected:
+            span = None
+
+            if self.__tracer is not None:
+                span = self.__tracer.start_span("relayx.publish", {"topic": topic})
+
+            topic, encoded, headers = self.__encode_message(topic, data, subject=subject)
+
+            if span is not None:
+                headers = self.__tracer.inject(span, headers)
 
             ack = None
+            error = None
+            start = time.perf_counter_ns()
 
             try:
-                ack = await self.__jetstream.publish(topic, encoded)
-                self.__log("Publish Ack =>")
-                self.__log(ack)
+                ack = await self.__publish_jetstream(topic).publish(topic, encoded, headers=headers)
+                latency = time.perf_counter_ns() - start
+                self.__metrics.publish_ack_latency.record(latency)
 
-                latency = (datetime.now(timezone.utc).timestamp() * 1000) - start
-                self.__log(f"Latency => {latency} ms")
+                if self.__logger.isEnabledFor(logging.DEBUG):
+                    self.__logger.debug("Publish Ack => %s, latency => %s ms", ack, latency / 1_000_000)
             except ServiceUnavailableError as err:
+                error = err
+
                 self.__error_logging.log_error({
                     "err": err,
                     "op": "publish"
                 })
 
+            if ack != None:
+                self.__metrics.published += 1
+            else:
+                self.__metrics.publish_errors += 1
+
+            if span is not None:
+                if ack != None:
+                    self.__tracer.add_event(span, "ack", {"seq": ack.seq})
+
+                self.__tracer.end_span(span, error)
+
             return ack != None
         else:
-            self.__offline_message_buffer.append({
+            await self.__outbox.put({
+                "id": str(uuid.uuid4()),
                 "topic": topic,
                 "message": data
             })
@@ -439,250 +833,1098 @@ class Realtime:
             return False
 
 
-    async def on(self, topic, func):
+    async def publish_many(self, items, window=None):
         """
-        Registers a callback function for a given topic or event.
+        Publishes a batch of messages without waiting for each ack in turn.
+
+        Every item is validated and encoded before anything is sent, the
+        messages are then written to the connection back to back while at
+        most ``window`` PubAcks are left outstanding.
 
         Args:
-            topic (str): The topic or event name.
-            func (callable): The callback function to execute.
+            items (list): Dicts of the form {"topic": str, "message": data}.
+                An optional "id" is used as the message id, the stream
+                stores a message once per id within its duplicate window.
+            window (int): Max number of unacknowledged messages in flight.
+                Defaults to the "publish_window" init option.
 
         Returns:
-            bool: True if successfully registered, False otherwise.
+            list: One bool per item, True if JetStream acknowledged it.
         """
-        if topic == None:
-            raise ValueError("$topic cannot be None.")
-            
-        if not isinstance(topic, str):
-            raise ValueError("The topic must be a string.")
-        
-        if func == None:
-            raise ValueError("$func cannot be None.")
+        if items == None:
+            raise ValueError("$items cannot be None.")
 
-        if not callable(func):
-            raise ValueError("The callback must be a callable function.")
-        
-        if topic in self.__event_func or topic in self.__topic_map:
-            return False
-        
-        self.__event_func[topic] = func
+        if not isinstance(items, (list, tuple)):
+            raise ValueError("$items must be a list.")
 
-        if topic not in self.__reserved_topics:
-            if not self.is_topic_valid(topic):
-                self.__event_func.pop(topic)
-                raise ValueError("$topic is not valid, use is_topic_valid($topic) to validate topic")
+        if window == None:
+            window = self.__publish_window
 
-            self.__topic_map.append(topic)
+        if not isinstance(window, int) or isinstance(window, bool) or window <= 0:
+            raise ValueError("$window must be a positive integer.")
 
-            if self.__connected:
-                await self.__start_consumer()
-    
-        return True  
+        for item in items:
+            if not isinstance(item, dict):
+                raise ValueError("Each item must be a dict with 'topic' and 'message' keys.")
 
+            self.__validate_publish(item.get("topic"), item.get("message"))
 
-    async def off(self, topic):
-        """
-        Unregisters a callback function for a given topic or event.
+        if not self.__connected:
+            for item in items:
+                await self.__outbox.put({
+                    "id": item.get("id") or str(uuid.uuid4()),
+                    "topic": item["topic"],
+                    "message": item["message"]
+                })
 
-        Args:
-            topic (str): The topic or event name.
+            return [False] * len(items)
 
-        Returns:
-            bool: True if successfully unregistered, False otherwise.
-        """
+        batch = [self.__encode_message(item["topic"], item["message"], item.get("id")) for item in items]
 
-        if topic == None:
-            raise ValueError("$topic cannot be None.")
-        
-        if not isinstance(topic, str):
-                raise ValueError("The topic must be a string.")
-        
-        if topic == "":
-                raise ValueError("$topic can't be an empty string.")
+        self.__log("Publishing batch of %d messages, window => %d", len(batch), window)
 
-        if topic in self.__event_func:
-            self.__event_func.pop(topic)
-            self.__topic_map.remove(topic)
+        results = []
+        pending = []
 
-            return True
-        else:
-            return False
+        for topic, encoded, headers in batch:
+            pending.append(await self.__send_async(topic, encoded, headers))
 
+            if len(pending) >= window:
+                results.extend(await self.__wait_for_acks(pending))
+                pending = []
 
-    async def history(self, topic, start=None, end=None):
-        if topic == None:
-            raise ValueError("$topic cannot be None.")
+        results.extend(await self.__wait_for_acks(pending))
 
-        if not isinstance(topic, str):
-            raise ValueError("The topic must be a string.")
-        
-        if topic == "":
-            raise ValueError("The topic must be NOT be an empty string.")
-        
-        if not self.is_topic_valid(topic):
-            raise ValueError("The topic not valid. use is_topic_valid($topic)")
-        
-        if start == None:
-            raise ValueError("$start cannot be None.")
-        
-        if not isinstance(start, datetime):
-            raise ValueError("$start must be a datetime object")
-        
-        if end != None:
-            if not isinstance(end, datetime):
-                raise ValueError("$end must be a datetime object")
-            
-            if start > end:
-                raise ValueError("$start > $end. $start must be lesser than $end")
+        return results
 
-        self.__log(f"TOPIC => {self.__get_stream_topic(topic)}")
 
-        if not self.__connected:
-            return []
+    async def publish_async(self, topic, data):
+        """
+        Enqueues a message and returns without waiting for the server.
 
-        consumer = await self.__jetstream.subscribe(self.__get_stream_topic(topic), deliver_policy=nats_config.DeliverPolicy.BY_START_TIME, config=nats_config.ConsumerConfig(
-            name=f"python_{uuid.uuid4()}_history_consumer",
-            opt_start_time=start.isoformat(),
-            ack_policy=nats_config.AckPolicy.EXPLICIT,
-        ))
+        The returned future resolves to the JetStream PubAck (``seq``,
+        ``stream``, ``duplicate``) or raises if the publish failed or no ack
+        arrived within the ack timeout. When "max_pending_publishes" acks are
+        already outstanding this call waits for a free slot, raising
+        TooManyStalledMsgsError after "publish_stall_timeout" seconds.
 
-        history = []
+        Args:
+            topic (str): Topic to publish to.
+            data: Message to send.
 
-        while True:
-            try:
-                msg = await consumer.next_msg()
+        Returns:
+            asyncio.Future: Resolves to the PubAck. Resolves to None if the
+            client is offline and the message was buffered for replay.
+        """
+        self.__validate_publish(topic, data)
 
-                if msg == None:
-                    break
+        return await self.__publish_async(topic, None, data)
 
-                dt_aware = msg.metadata.timestamp.timestamp()
-                utc_timestamp = datetime.fromtimestamp(dt_aware, tz=timezone.utc)
-                
-                if end != None:
-                    if utc_timestamp > end:
-                        self.__log(f"{utc_timestamp.isoformat()} > {end.isoformat()}")
-                        break
 
-                # Decoding using msgpack
-                data = msgpack.unpackb(msg.data, raw=False)
+    async def __publish_async(self, topic, subject, data):
+        if not self.__connected:
+            await self.__outbox.put({
+                "id": str(uuid.uuid4()),
+                "topic": topic,
+                "message": data
+            })
 
-                history.append({
-                    "id": data["id"],
-                    "topic": data["room"],
-                    "message": data["message"],
-                    "timestamp": utc_timestamp
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(None)
+
+            return future
+
+        topic, encoded, headers = self.__encode_message(topic, data, subject=subject)
+
+        return await self.__send_async(topic, encoded, headers)
+
+
+    async def __send_async(self, topic, encoded, headers):
+        span = None
+
+        if self.__tracer is not None:
+            span = self.__tracer.start_span("relayx.publish", {"subject": topic})
+            headers = self.__tracer.inject(span, headers)
+
+        start = time.perf_counter_ns()
+
+        future = await self.__publish_jetstream(topic).publish_async(topic, encoded, wait_stall=self.__publish_stall_timeout, headers=headers)
+
+        # Fail the future if no ack arrives, this also frees its pending slot
+        timer = asyncio.get_running_loop().call_later(self.__ack_timeout, self.__expire_ack, future)
+
+        def on_done(done):
+            # One timer per in-flight message, drop it as soon as the ack is in
+            timer.cancel()
+            self.__on_publish_ack(done, start, span)
+
+        future.add_done_callback(on_done)
+
+        return future
+
+
+    def __publish_jetstream(self, topic):
+        if self.__pool is None:
+            return self.__jetstream
+
+        return self.__pool.jetstream(topic)
+
+
+    def __on_publish_ack(self, future, start, span):
+        error = None
+
+        if future.cancelled():
+            error = asyncio.CancelledError()
+        elif future.exception() is not None:
+            error = future.exception()
+
+        if error is None and future.result() != None:
+            self.__metrics.published += 1
+            self.__metrics.publish_ack_latency.record(time.perf_counter_ns() - start)
+        else:
+            self.__metrics.publish_errors += 1
+
+        if span is not None:
+            if error is None and future.result() != None:
+                self.__tracer.add_event(span, "ack", {"seq": future.result().seq})
+
+            self.__tracer.end_span(span, error)
+
+
+    def __expire_ack(self, future):
+        if not future.done():
+            future.set_exception(asyncio.TimeoutError("Timed out waiting for PubAck"))
+
+
+    async def __wait_for_acks(self, futures):
+        acks = await asyncio.gather(*futures, return_exceptions=True)
+
+        results = []
+
+        for ack in acks:
+            if isinstance(ack, ServiceUnavailableError):
+                self.__error_logging.log_error({
+                    "err": ack,
+                    "op": "publish"
                 })
+            elif isinstance(ack, BaseException):
+                self.__log("Publish error => %s", ack)
 
-                await msg.ack()
+            results.append(not isinstance(ack, BaseException) and ack != None)
+
+        return results
+
+
+    def __validate_publish(self, topic, data):
+        self.__validate_topic(topic)
+
+        self.is_message_valid(data)
+
+
+    def __validate_topic(self, topic):
+        if topic == None:
+            raise ValueError("$topic cannot be None.")
+        
+        if topic == "":
+            raise ValueError("$topic cannot be an empty string.")
+        
+        if not isinstance(topic, str):
+            raise ValueError("$topic must be a string.")
+        
+        if not self.is_topic_valid(topic):
+            raise ValueError("$topic is not valid, use is_topic_valid($topic) to validate topic")
+
+
+    def __encode_message(self, topic, data, message_id=None, subject=None):
+        """
+        Returns (subject, payload, headers) of a message. subject is the
+        precomputed stream subject of a TopicHandle, the topic is then
+        already known and validated.
+        """
+        if message_id is None:
+            message_id = str(uuid.uuid4())
+
+        message = {
+            "id": message_id,
+            "room": topic,
+            "message": data,
+            "start": time.time_ns() // 1_000_000
+        }
+
+        encoded, headers = self.__codec.encode(topic, message)
+
+        if headers is None:
+            headers = {self.__MSG_ID_HEADER: message_id}
+        else:
+            headers[self.__MSG_ID_HEADER] = message_id
+
+        if subject is None:
+            if topic not in self.__topic_map:
+                self.__topic_map[topic] = None
+            elif self.__logger.isEnabledFor(logging.DEBUG):
+                self.__logger.debug("%s exitsts locally, moving on...", topic)
+
+            subject = self.__get_stream_topic(topic)
+
+        if self.__logger.isEnabledFor(logging.DEBUG):
+            self.__logger.debug("Publishing to topic => %s", subject)
+
+        return subject, encoded, headers
+
+
+    async def on(self, topic, func):
+        """
+        Registers a callback function for a given topic or event.
+
+        Args:
+            topic (str): The topic or event name.
+            func (callable): The callback function to execute.
+
+        Returns:
+            bool: True if successfully registered, False otherwise.
+        """
+        if topic == None:
+            raise ValueError("$topic cannot be None.")
+            
+        if not isinstance(topic, str):
+            raise ValueError("The topic must be a string.")
+        
+        if func == None:
+            raise ValueError("$func cannot be None.")
+
+        if not callable(func):
+            raise ValueError("The callback must be a callable function.")
+        
+        if topic in self.__event_func or topic in self.__topic_map:
+            return False
+        
+        self.__event_func[topic] = func
+
+        if topic not in self.__reserved_topics:
+            if not self.is_topic_valid(topic):
+                self.__event_func.pop(topic)
+                raise ValueError("$topic is not valid, use is_topic_valid($topic) to validate topic")
+
+            self.__topic_map[topic] = None
+            self.__topic_index.add(topic)
+
+            if self.__filter_set is not None:
+                self.__filter_set.add(topic)
+                self.__track_filters()
+
+            if self.__connected:
+                await self.__start_consumer()
+    
+        return True  
+
+
+    async def off(self, topic):
+        """
+        Unregisters a callback function for a given topic or event.
+
+        Args:
+            topic (str): The topic or event name.
+
+        Returns:
+            bool: True if successfully unregistered, False otherwise.
+        """
+
+        if topic == None:
+            raise ValueError("$topic cannot be None.")
+        
+        if not isinstance(topic, str):
+                raise ValueError("The topic must be a string.")
+        
+        if topic == "":
+                raise ValueError("$topic can't be an empty string.")
+
+        if topic in self.__event_func:
+            self.__event_func.pop(topic)
+            self.__topic_map.pop(topic, None)
+            self.__topic_index.remove(topic)
+
+            if self.__filter_set is not None:
+                self.__filter_set.remove(topic)
+            else:
+                self.__track_filters()
+
+            if self.__connected:
+                await self.__start_consumer()
+
+            return True
+        else:
+            return False
+
+
+    async def history(self, topic, start=None, end=None, shards=None):
+        self.__validate_history(topic, start, end)
+        self.__validate_shards(shards)
+
+        self.__log("TOPIC => %s", self.__get_stream_topic(topic))
+
+        if not self.__connected:
+            return []
+
+        messages = [message async for message in self.__history_messages(topic, start, end, self.__HISTORY_BATCH, None, None, shards)]
+
+        if shards != None and shards > 1:
+            messages.sort(key=lambda message: message["sequence"])
+
+        return messages
+
+
+    def history_iter(self, topic, start=None, end=None, batch_size=None, max_messages=None, max_bytes=None, shards=None):
+        """
+        Streams stored messages of a topic instead of collecting them in a list.
+
+        Messages are pulled from JetStream in batches of ``batch_size`` and
+        yielded one by one as they arrive, so memory stays flat no matter
+        how wide [start, end] is.
+
+        With ``shards`` > 1 the range is split into that many time shards
+        which are fetched in parallel, each by its own consumer. Messages
+        are still yielded in stream order, a shard is yielded once the
+        ones before it are done while it keeps buffering in the background.
+
+        Args:
+            topic (str): Topic to read.
+            start (datetime): Start of the time range.
+            end (datetime): Optional end of the time range, defaults to now when sharding.
+            batch_size (int): Messages requested per fetch.
+            max_messages (int): Stop after this many messages.
+            max_bytes (int): Stop once this many payload bytes were read.
+            shards (int): Number of time shards fetched in parallel.
+
+        Returns:
+            AsyncIterator[dict]: {"id", "topic", "message", "timestamp", "sequence"} per message.
+        """
+        self.__validate_history(topic, start, end)
+        self.__validate_shards(shards)
+
+        if batch_size == None:
+            batch_size = self.__HISTORY_BATCH
+
+        for name, value in [("batch_size", batch_size), ("max_messages", max_messages), ("max_bytes", max_bytes)]:
+            if value != None and (not isinstance(value, int) or isinstance(value, bool) or value <= 0):
+                raise ValueError(f"${name} must be a positive integer")
+
+        return self.__history_messages(topic, start, end, batch_size, max_messages, max_bytes, shards)
+
+
+    async def __history_messages(self, topic, start, end, batch_size, max_messages, max_bytes, shards):
+        if not self.__connected:
+            return
+
+        if self.__history_cache != None:
+            source = self.__read_history_cached(topic, start, end, batch_size, shards)
+        else:
+            source = self.__read_remote_history(topic, start, end, batch_size, shards)
+
+        count = 0
+        size = 0
+
+        try:
+            async for message, message_size in source:
+                yield message
+
+                count += 1
+                size += message_size
+
+                if max_messages != None and count >= max_messages:
+                    return
+
+                if max_bytes != None and size >= max_bytes:
+                    return
+        finally:
+            await source.aclose()
+
+
+    def __read_remote_history(self, topic, start, end, batch_size, shards):
+        if shards != None and shards > 1:
+            return self.__read_history_shards(topic, start, end, batch_size, shards)
+
+        return self.__read_history(topic, start, end, batch_size)
+
+
+    async def __read_history_cached(self, topic, start, end, batch_size, shards):
+        """
+        Serves the part of [start, end] the history cache covers locally
+        and only fetches what lies past the covered end, appending it to
+        the cache. A start outside of the covered range resets the cache
+        of the topic.
+
+        Reads of the same topic run one after the other. A concurrent
+        read would otherwise skip the messages the first one appended
+        while fetching them, or reset the index the first one is walking.
+        """
+        lock = self.__history_locks.setdefault(topic, asyncio.Lock())
+
+        async with lock:
+            source = self.__fill_history_cache(topic, start, end, batch_size, shards)
+
+            try:
+                async for message, size in source:
+                    yield message, size
+            finally:
+                await source.aclose()
+
+
+    async def __fill_history_cache(self, topic, start, end, batch_size, shards):
+        cache = self.__history_cache
+
+        start_us = to_micros(start)
+        end_us = to_micros(end) if end != None else None
+
+        coverage = cache.coverage(topic)
+
+        if coverage == None or start_us < coverage[0] or start_us > coverage[1]:
+            cache.reset(topic, start_us)
+            fetch_from = start
+        else:
+            for record in cache.read(topic, start_us, end_us):
+                yield self.__cached_history_message(record), record["size"]
+
+            if end_us != None and end_us <= coverage[1]:
+                return
+
+            # The covered end is inclusive, sequences already cached are skipped
+            fetch_from = from_micros(coverage[1])
+
+        source = self.__read_remote_history(topic, fetch_from, end, batch_size, shards)
+
+        try:
+            async for message, size in source:
+                appended = cache.append(topic, {
+                    "seq": message["sequence"],
+                    "ts": to_micros(message["timestamp"]),
+                    "id": message["id"],
+                    "topic": message["topic"],
+                    "message": message["message"],
+                    "size": size
+                })
+
+                if appended:
+                    yield message, size
+        finally:
+            await source.aclose()
+            cache.commit(topic)
+
+
+    def __cached_history_message(self, record):
+        return {
+            "id": record["id"],
+            "topic": record["topic"],
+            "message": record["message"],
+            "timestamp": from_micros(record["ts"]),
+            "sequence": record["seq"]
+        }
+
+
+    async def __read_history(self, topic, start, end, batch_size, end_exclusive=False):
+        """
+        Reads [start, end] (or [start, end) with end_exclusive) through an
+        ephemeral pull consumer and yields (message, payload size) tuples.
+        """
+        consumer = await self.__jetstream.pull_subscribe(self.__get_stream_topic(topic),
+                                                    stream=self.__get_stream_name(),
+                                                    config=nats_config.ConsumerConfig(
+                                                        name=f"python_{uuid.uuid4()}_history_consumer",
+                                                        deliver_policy=nats_config.DeliverPolicy.BY_START_TIME,
+                                                        opt_start_time=start.isoformat(),
+                                                        ack_policy=nats_config.AckPolicy.NONE,
+                                                        replay_policy=nats_config.ReplayPolicy.INSTANT,
+                                                        inactive_threshold=self.__HISTORY_INACTIVE_THRESHOLD
+                                                    ))
+
+        try:
+            while True:
+                try:
+                    msgs = await consumer.fetch(batch_size, timeout=self.__HISTORY_FETCH_TIMEOUT)
+                except nats.errors.TimeoutError:
+                    # Nothing newer than the last message
+                    return
+
+                for msg in msgs:
+                    dt_aware = msg.metadata.timestamp.timestamp()
+                    utc_timestamp = datetime.fromtimestamp(dt_aware, tz=timezone.utc)
+
+                    if end != None:
+                        if utc_timestamp > end or (end_exclusive and utc_timestamp == end):
+                            self.__log("%s > %s", utc_timestamp, end)
+                            return
+
+                    data = self.__codec.decode(msg.data, msg.headers)
+
+                    yield {
+                        "id": data["id"],
+                        "topic": data["room"],
+                        "message": data["message"],
+                        "timestamp": utc_timestamp,
+                        "sequence": msg.metadata.sequence.stream
+                    }, len(msg.data)
+
+                    # Reached the end of the stream as of this delivery
+                    if msg.metadata.num_pending == 0:
+                        return
+        finally:
+            try:
+                await consumer.unsubscribe()
             except Exception as e:
                 self.__log(e)
-                break
 
-        await consumer.unsubscribe()
+
+    async def __read_history_shards(self, topic, start, end, batch_size, shards):
+        if end == None:
+            end = datetime.now(tz=start.tzinfo)
+
+        step = (end - start) / shards
+        bounds = [start + step * i for i in range(shards)] + [end]
+
+        buffers = []
+        tasks = []
+
+        for i in range(shards):
+            # Bounded so a shard can't run far ahead of the one being yielded
+            buffer = asyncio.Queue(maxsize=batch_size)
+
+            # Inner boundaries are exclusive so a message lands in exactly one shard
+            shard = self.__read_history(topic, bounds[i], bounds[i + 1], batch_size, end_exclusive=i < shards - 1)
+
+            buffers.append(buffer)
+            tasks.append(asyncio.create_task(self.__fill_history_shard(shard, buffer)))
+
+        try:
+            for buffer in buffers:
+                while True:
+                    item = await buffer.get()
+
+                    if item is None:
+                        break
+
+                    if isinstance(item, Exception):
+                        raise item
+
+                    yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+    async def __fill_history_shard(self, shard, buffer):
+        try:
+            async for item in shard:
+                await buffer.put(item)
+
+            await buffer.put(None)
+        except Exception as e:
+            await buffer.put(e)
+        finally:
+            await shard.aclose()
+
+
+    def __validate_shards(self, shards):
+        if shards != None and (not isinstance(shards, int) or isinstance(shards, bool) or shards <= 0):
+            raise ValueError("$shards must be a positive integer")
+
+
+    def __validate_history(self, topic, start, end):
+        if topic == None:
+            raise ValueError("$topic cannot be None.")
+
+        if not isinstance(topic, str):
+            raise ValueError("The topic must be a string.")
+        
+        if topic == "":
+            raise ValueError("The topic must be NOT be an empty string.")
+        
+        if not self.is_topic_valid(topic):
+            raise ValueError("The topic not valid. use is_topic_valid($topic)")
+        
+        if start == None:
+            raise ValueError("$start cannot be None.")
+        
+        if not isinstance(start, datetime):
+            raise ValueError("$start must be a datetime object")
         
-        return history
+        if end != None:
+            if not isinstance(end, datetime):
+                raise ValueError("$end must be a datetime object")
+            
+            if start > end:
+                raise ValueError("$start > $end. $start must be lesser than $end")
 
 
     async def __delete_consumer(self):
-        if self.__consumer:
-            await self.__consumer.unsubscribe()
+        self.__stop_filter_update()
+        self.__stop_pull_tasks()
+
+        if self.__ack_flush_task is not None:
+            self.__ack_flush_task.cancel()
+            self.__ack_flush_task = None
+
+        await self.__flush_ack()
+
+        for consumer in self.__consumers.values():
+            await consumer.unsubscribe()
+
+        self.__consumers.clear()
+        self.__partition_filters.clear()
+        self.__last_sequence.clear()
 
         return True
 
 
+    def __stop_pull_tasks(self):
+        for task in self.__pull_tasks.values():
+            task.cancel()
+
+        self.__pull_tasks.clear()
+
+
     async def __subscribe_to_topics(self):
         if len(self.__topic_map) > 0:
             await self.__start_consumer()
 
 
     async def __start_consumer(self):
-        if self.__consumer is not None:
-            return
-        
-        async def on_message(msg):
-            now = datetime.now(timezone.utc).timestamp()
-            
-            data = msgpack.unpackb(msg.data, raw=False)
-            self.__log(f"Received message => {data}")
+        """
+        Brings the consumer filters in line with the subscriptions. The
+        first consumers are created right away, later changes are
+        debounced into a single update.
+        """
+        if len(self.__consumers) == 0 or self.__filter_debounce == 0:
+            self.__stop_filter_update()
+            await self.__update_partitions()
+        elif self.__filter_update_task is None:
+            self.__filter_update_task = asyncio.create_task(self.__delayed_filter_update())
 
-            await msg.ack()
 
-            topic = self.__strip_stream_hash(msg.subject)
+    async def __delayed_filter_update(self):
+        await asyncio.sleep(self.__filter_debounce)
 
-            topics = self.get_callback_topics(topic)
+        self.__filter_update_task = None
 
-            for top in topics:
-                self.__execute_topic_callback(top, {
-                        "id": data["id"],
-                        "topic": topic,
-                        "data": data["message"]
-                    })
-            
-            self.__log(f"Message processed for topic: {topic}")
-            await self.__log_latency(now, data)
+        try:
+            await self.__update_partitions()
+        except Exception as e:
+            self.__log("Consumer filter update error => %s", e)
+
+
+    def __stop_filter_update(self):
+        if self.__filter_update_task is not None:
+            self.__filter_update_task.cancel()
+            self.__filter_update_task = None
+
+
+    def __track_filters(self):
+        """
+        Drops the filter set once there are more than __max_filters
+        subscriptions and builds it again from the subscriptions once
+        there are not, so it never holds more than __max_filters patterns.
+        """
+        if len(self.__topic_index) > self.__max_filters:
+            self.__filter_set = None
+        elif self.__filter_set is None:
+            self.__filter_set = FilterSet(self.__topic_index.patterns())
+
+
+    async def __update_partitions(self):
+        """
+        Spreads the subscription filters over the receive partitions and
+        brings the consumers in line, the server only delivers subjects a
+        subscription matches. Partitions that gained filters get a
+        consumer, changed ones are updated in place on the server and the
+        ones left without filters are removed.
+        """
+        async with self.__consumer_lock:
+            if self.__filter_set is not None:
+                wanted = self.__filter_set.partitions(self.__receive_partitions)
+            else:
+                # Receiving collapses onto the first partition
+                wanted = [[ALL]] + [[] for _ in range(self.__receive_partitions - 1)]
+
+            for partition, filters in enumerate(wanted):
+                subjects = [self.__get_stream_topic(subject_filter) for subject_filter in filters]
+                current = self.__partition_filters.get(partition)
+
+                if subjects == current:
+                    continue
+
+                if len(subjects) == 0:
+                    await self.__remove_consumer(partition)
+                elif current is None:
+                    await self.__create_consumer(partition, subjects)
+                else:
+                    await self.__update_consumer(partition, subjects)
+
+
+    async def __update_consumer(self, partition, subjects):
+        consumer = self.__consumers[partition]
+
+        info = await consumer.consumer_info()
+
+        config = info.config
+        config.filter_subject = None
+        config.filter_subjects = subjects
+
+        await self.__partition_jetstream(partition).add_consumer(self.__get_stream_name(), config)
+
+        self.__partition_filters[partition] = subjects
+        self.__log("Partition %d filters => %s", partition, subjects)
+
+
+    async def __remove_consumer(self, partition):
+        task = self.__pull_tasks.pop(partition, None)
 
-        startTime = datetime.now(timezone.utc).isoformat() if self.__disconnect_time is None else self.__disconnect_time
+        if task is not None:
+            task.cancel()
 
-        self.__consumer = await self.__jetstream.subscribe(self.__get_stream_topic(">"), 
+        consumer = self.__consumers.pop(partition, None)
+        self.__partition_filters.pop(partition, None)
+        self.__last_sequence.pop(partition, None)
+
+        if consumer is not None:
+            await consumer.unsubscribe()
+
+
+    async def __create_consumer(self, partition, subjects):
+        config = nats_config.ConsumerConfig(
+            name=f"python_{uuid.uuid4()}_consumer",
+            replay_policy=nats_config.ReplayPolicy.INSTANT,
+            ack_policy=self.__get_ack_policy()
+        )
+
+        last_sequence = self.__last_sequence.get(partition)
+
+        if last_sequence is not None:
+            # Resume right after the last message this partition received,
+            # nothing is replayed or skipped across the reconnect
+            config.deliver_policy = nats_config.DeliverPolicy.BY_START_SEQUENCE
+            config.opt_start_seq = last_sequence + 1
+        else:
+            index = self.__connection_index(partition)
+            disconnect_time = self.__disconnect_time if index == 0 else self.__pool_disconnect_times.get(index)
+
+            config.deliver_policy = nats_config.DeliverPolicy.BY_START_TIME
+            config.opt_start_time = datetime.now(timezone.utc).isoformat() if disconnect_time is None else disconnect_time
+
+        if self.__max_ack_pending is not None:
+            config.max_ack_pending = self.__max_ack_pending
+
+        config.filter_subjects = subjects
+
+        if self.__consumer_mode == self.__PULL:
+            # Ephemeral pull consumers are removed by the server after this
+            # many idle seconds, keep it above the time spent waiting on handlers
+            config.inactive_threshold = 300
+
+            consumer = await self.__partition_jetstream(partition).pull_subscribe(self.__get_stream_topic(">"),
+                                                    stream=self.__get_stream_name(),
+                                                    config=config)
+
+            self.__consumers[partition] = consumer
+            self.__pull_tasks[partition] = asyncio.create_task(self.__pull_messages(partition, consumer))
+        else:
+            async def on_message(msg):
+                await self.__on_message(msg, partition)
+
+            self.__consumers[partition] = await self.__partition_jetstream(partition).subscribe(self.__get_stream_topic(">"), 
                                                     stream=self.__get_stream_name(), 
                                                     cb=on_message,
-                                                    config=nats_config.ConsumerConfig(
-                                                        name=f"python_{uuid.uuid4()}_consumer",
-                                                        replay_policy=nats_config.ReplayPolicy.INSTANT,
-                                                        deliver_policy=nats_config.DeliverPolicy.BY_START_TIME,
-                                                        opt_start_time=startTime,
-                                                        ack_policy=nats_config.AckPolicy.EXPLICIT
-                                                    ))
+                                                    config=config,
+                                                    manual_ack=True)
+
+        self.__partition_filters[partition] = subjects
+
+        self.__log("Consumer is consuming, partition %d => %s", partition, subjects)
+
+
+    async def __pull_messages(self, partition, consumer):
+        """
+        Fetch loop of the pull consumer. Batches are sized to the room left
+        below the high watermark of pending handler calls. Once handlers
+        reach it, fetching stops until they drain to the low watermark, so
+        the server holds the backlog instead of the client heap.
+        """
+        while self.__consumers.get(partition) is consumer:
+            backlog = self.__dispatcher.pending
+
+            if backlog >= self.__high_watermark:
+                self.__log("Dispatch backlog %d at high watermark, pausing fetch", backlog)
+                await self.__dispatcher.wait_for_pending(self.__low_watermark)
+                continue
+
+            batch = min(self.__fetch_batch, self.__high_watermark - backlog)
+
+            try:
+                msgs = await consumer.fetch(batch, timeout=1)
+            except nats.errors.TimeoutError:
+                continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Connection is down, the consumer is replaced on reconnect
+                self.__log("Fetch error => %s", e)
+                await asyncio.sleep(1)
+                continue
 
-        self.__log("Consumer is consuming")
+            for msg in msgs:
+                await self.__on_message(msg, partition)
 
 
-    async def __log_latency(self, now, data):
+    async def __on_message(self, msg, partition=0):
         """
-        Logs latency data to the server.
+        Entry point of push and pull deliveries. A message that fails to
+        decode or process is logged and terminated, so it is neither
+        redelivered nor able to stop the consumer.
         """
+        span = None
+
+        if self.__tracer is not None:
+            span = self.__tracer.start_span("relayx.receive", {"subject": msg.subject}, msg.headers)
+
+        try:
+            await self.__handle_message(msg, span, partition)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if span is not None:
+                self.__tracer.end_span(span, e)
+
+            await self.__reject_message(msg, e)
+            return
+
+        if span is not None:
+            self.__tracer.end_span(span)
+
+
+    async def __reject_message(self, msg, error):
+        self.__log("Dropping message on %s => %s", msg.subject, error)
+
+        if self.__ack_mode == self.__ACK_NONE:
+            return
+
+        try:
+            await msg.term()
+        except Exception as e:
+            # Already acked before the failure
+            self.__log("Term error => %s", e)
+
+
+    async def __handle_message(self, msg, span, partition):
+        sequence = msg.metadata.sequence.stream
+
+        if sequence <= self.__last_sequence.get(partition, 0):
+            # Delivered again, e.g. still buffered for the consumer that was
+            # replaced on reconnect
+            await self.__ack(msg, partition)
+            return
+
+        self.__last_sequence[partition] = sequence
+
+        if self.__lazy_messages:
+            await self.__handle_lazy_message(msg, span, partition, sequence)
+            return
+
+        data = self.__codec.decode(msg.data, msg.headers)
+        debug = self.__logger.isEnabledFor(logging.DEBUG)
+
+        if debug:
+            self.__logger.debug("Received message => %s", data)
+
+        if span is not None:
+            self.__tracer.add_event(span, "decoded", {"id": data.get("id")})
+
+        await self.__ack(msg, partition)
+
+        if self.__dedupe is not None and self.__dedupe.seen(data.get("id")):
+            if debug:
+                self.__logger.debug("Skipping duplicate message => %s", data.get("id"))
+
+            return
+
+        topic = self.__strip_stream_hash(msg.subject)
+
+        topics = self.get_callback_topics(topic)
+
+        for top in topics:
+            handler = self.__event_func.get(top)
+
+            if handler is None:
+                continue
+
+            self.__metrics.message_received(top)
+
+            if span is not None:
+                self.__tracer.add_event(span, "dispatch", {"subscription": top})
+
+            await self.__dispatcher.dispatch(topic, handler, {
+                    "id": data["id"],
+                    "topic": topic,
+                    "data": data["message"]
+                })
+
+        if debug:
+            self.__logger.debug("Message processed for topic: %s", topic)
+
+        self.__record_latency(data)
+
+
+    async def __handle_lazy_message(self, msg, span, partition, sequence):
+        topic = self.__strip_stream_hash(msg.subject)
+
+        message = RealtimeMessage(topic, sequence, msg.metadata.timestamp, msg.data, msg.headers, self.__codec)
+        debug = self.__logger.isEnabledFor(logging.DEBUG)
+
+        if debug:
+            self.__logger.debug("Received message => %s", message)
+
+        if span is not None:
+            self.__tracer.add_event(span, "received", {"id": message.id})
+
+        await self.__ack(msg, partition)
+
+        if self.__dedupe is not None and self.__dedupe.seen(message.id):
+            if debug:
+                self.__logger.debug("Skipping duplicate message => %s", message.id)
+
+            return
+
+        for top in self.get_callback_topics(topic):
+            handler = self.__event_func.get(top)
+
+            if handler is None:
+                continue
+
+            self.__metrics.message_received(top)
+
+            if span is not None:
+                self.__tracer.add_event(span, "dispatch", {"subscription": top})
+
+            await self.__dispatcher.dispatch(topic, handler, message)
+
+        self.__record_stream_latency(message.timestamp)
+
+
+    def __get_ack_policy(self):
+        if self.__ack_mode == self.__ACK_NONE:
+            return nats_config.AckPolicy.NONE
+        elif self.__ack_mode == self.__ACK_ALL:
+            return nats_config.AckPolicy.ALL
+        else:
+            return nats_config.AckPolicy.EXPLICIT
+
+
+    async def __ack(self, msg, partition):
+        if self.__ack_mode == self.__ACK_EXPLICIT:
+            await msg.ack()
+        elif self.__ack_mode == self.__ACK_ALL:
+            # Under AckPolicy.ALL acking a message acks everything before it,
+            # so only the newest one of each consumer is acked per flush
+            self.__unacked[partition] = msg
+            self.__unacked_count += 1
+
+            if self.__unacked_count >= self.__ack_batch:
+                await self.__flush_ack()
+            elif self.__ack_flush_task is None:
+                self.__ack_flush_task = asyncio.create_task(self.__delayed_ack_flush())
+
+
+    async def __delayed_ack_flush(self):
+        await asyncio.sleep(self.__ack_interval)
+
+        self.__ack_flush_task = None
+
+        await self.__flush_ack()
+
+
+    async def __flush_ack(self):
+        msgs = list(self.__unacked.values())
+
+        self.__unacked.clear()
+        self.__unacked_count = 0
+
+        for msg in msgs:
+            try:
+                await msg.ack()
+            except Exception as e:
+                self.__log("Ack error => %s", e)
+
+
+    def __record_latency(self, data):
+        """
+        Records the delivery latency of a received message. Summaries are
+        sent by a background task every latency_interval seconds.
+        """
+        if self.__latency_sample_rate < 1 and random.random() >= self.__latency_sample_rate:
+            return
+
         if data.get("client_id") == self.__get_client_id():
             self.__log("Skipping latency log for own message")
             return
-        
-        timezone = tzlocal.get_localzone().key
-        self.__log(f"Timezone: {timezone}")
 
-        latency = (now * 1000) - data.get("start")
-        self.__log(now)
-        self.__log(f"Latency => {latency}")
+        start = data.get("start")
 
-        self.__latency.append({
-            "latency": latency,
-            "timestamp": now
-        })
+        if not isinstance(start, numbers.Number):
+            return
 
-        if self.__latency_push_task is None and self.__connected:
-            self.__latency_push_task = asyncio.create_task(self.__delayed_latency_push(timezone))
-        
-        if len(self.__latency) >= 100 and not self.__is_sending_latency and self.__connected:
-            self.__log(f"Push from Length Check: {len(self.__latency)}")
+        # Older clients sent whole seconds
+        if start < self.__MS_EPOCH_THRESHOLD:
+            start *= 1000
 
-            await self.__push_latency({
-                "timezone": timezone,
-                "history": self.__latency.copy()
-            })
+        self.__add_latency(time.time_ns() - int(start * 1_000_000))
+
+
+    def __record_stream_latency(self, timestamp):
+        """
+        Latency of a lazy message, measured from the time JetStream stored
+        it so the payload does not have to be decoded for it.
+        """
+        if self.__latency_sample_rate < 1 and random.random() >= self.__latency_sample_rate:
+            return
+
+        if not isinstance(timestamp, datetime):
+            return
+
+        self.__add_latency(time.time_ns() - int(timestamp.timestamp() * 1_000_000_000))
+
+
+    def __add_latency(self, latency):
+        self.__latency_histogram.record(latency)
+
+        if self.__latency_task is None and self.__connected:
+            self.__latency_task = asyncio.create_task(self.__report_latency())
+
+
+    async def __report_latency(self):
+        if self.__timezone is None:
+            self.__timezone = tzlocal.get_localzone().key
+
+        while True:
+            await asyncio.sleep(self.__latency_interval)
+
+            histogram = self.__latency_histogram
+
+            if histogram.count == 0 or not self.__connected:
+                continue
 
+            summary = histogram.summary()
+            histogram.reset()
 
-    async def __delayed_latency_push(self, time_zone):
-        await asyncio.sleep(30)
-        self.__log("setTimeout called")
+            self.__log("Latency summary => %s", summary)
 
-        if len(self.__latency) > 0:
-            self.__log("Push from setTimeout")
             await self.__push_latency({
-                "timezone": time_zone,
-                "history": self.__latency.copy()
+                "timezone": self.__timezone,
+                "summary": summary
             })
-        else:
-            self.__log("No latency data to push")
 
-        self.__latency_push_task = None
+
+    def __stop_latency_task(self):
+        if self.__latency_task is not None:
+            self.__latency_task.cancel()
+            self.__latency_task = None
 
 
     # Queue
@@ -701,6 +1943,9 @@ class Realtime:
             "nats_client": self.__natsClient,
             "api_key": self.api_key,
             "debug": self.__debug,
+            "codec": self.__codec,
+            "metrics": self.__metrics,
+            "tracer": self.__tracer,
             "realtime": self
         })
 
@@ -715,7 +1960,9 @@ class Realtime:
             self.__kv_store = KVStore({
                 "namespace": self.__namespace,
                 "jetstream": self.__jetstream,
-                "debug": self.__debug
+                "debug": self.__debug,
+                "metrics": self.__metrics,
+                "tracer": self.__tracer
             })
 
             init = await self.__kv_store.init()
@@ -725,25 +1972,46 @@ class Realtime:
             return self.__kv_store
 
 
+    def stats(self):
+        """
+        Snapshot of the client metrics: publish count and PubAck latency
+        percentiles, messages received per subscription, dispatch queue
+        depth, offline buffer size, reconnects and outage durations, Queue
+        fetch / ack / nack counts and KV store operation latencies.
+        Latencies are in milliseconds.
+
+        Returns:
+            dict: Plain values, safe to serialize.
+        """
+        return self.__metrics.snapshot(self.__metric_gauges())
+
+
+    def openmetrics(self):
+        """
+        Returns the client metrics in the OpenMetrics text format for a
+        Prometheus scrape endpoint.
+        """
+        return self.__metrics.openmetrics(self.__metric_gauges())
+
+
+    def __metric_gauges(self):
+        return {
+            "dispatch_pending": self.__dispatcher.pending,
+            "outbox_size": len(self.__outbox),
+            "outbox_dropped": self.__outbox.dropped,
+            "duplicates_skipped": self.__dedupe.duplicates if self.__dedupe is not None else 0
+        }
+
+
     def status(self):
         return self.__connection_status
 
     # Utility functions
     def is_topic_valid(self, topic):
         if topic != None and isinstance(topic, str):
-            array_check = topic not in [
-                self.CONNECTED,
-                self.RECONNECT,
-                self.MESSAGE_RESEND,
-                self.DISCONNECTED,
-                self.__RECONNECTED,
-                self.__RECONNECTING,
-                self.__RECONN_FAIL
-            ]
+            array_check = topic not in self.__reserved_topics
 
-            TOPIC_REGEX = re.compile(r"^(?!.*\$)(?:[A-Za-z0-9_*~-]+(?:\.[A-Za-z0-9_*~-]+)*(?:\.>)?|>)$")
-
-            space_star_check = " " not in topic and bool(TOPIC_REGEX.match(topic))
+            space_star_check = " " not in topic and bool(self.__TOPIC_REGEX.match(topic))
 
             return array_check and space_star_check
         else:
@@ -769,36 +2037,67 @@ class Realtime:
                 success = result["success"]
 
                 if success:
-                    self.__log(f"Successfully called {func.__name__}")
+                    self.__log("Successfully called %s", func.__name__)
                     break
             except Exception as e:
-                self.__log(f"Attempt {attempt} failed: {e}")
+                self.__log("Attempt %d failed: %s", attempt, e)
         
         if not success:
-            self.__log(f"Failed to execute {func.__name__} after {retries} attempts")
+            self.__log("Failed to execute %s after %d attempts", func.__name__, retries)
     
         return method_output
 
 
     async def __publish_messages_on_reconnect(self):
-        message_sent_status = []
+        messages = self.__outbox.drain()
+
+        if len(messages) == 0:
+            return
+
+        self.__log("Replaying %d buffered messages", len(messages))
+
+        # Pipelined with a bounded ack window, anything published
+        # offline again during the replay goes back to the outbox
+        sent = self.__connected
 
-        for message in self.__offline_message_buffer:
-            output = await self.publish(message["topic"], message["message"])
+        try:
+            results = await self.publish_many(messages)
+        except asyncio.CancelledError:
+            self.__outbox.commit(messages)
+            raise
+        except Exception as e:
+            # Nothing is known to be stored, every record is kept for the
+            # next replay and the stream drops the ones it stored by id
+            self.__log("Replay error => %s", e)
+            self.__outbox.commit(messages)
+            return
+
+        # Records that were sent but not acked are kept for the next
+        # replay, the stream drops any that were stored after all by id
+        failed = [message for message, output in zip(messages, results) if not output] if sent else []
+
+        self.__outbox.commit(failed)
+
+        message_sent_status = []
 
+        for message, output in zip(messages, results):
             message_sent_status.append({
                 "topic": message["topic"],
                 "message": message["message"],
                 "resent": output
             })
 
-        self.__offline_message_buffer.clear()
-
         if len(message_sent_status) > 0:
             if self.MESSAGE_RESEND in self.__event_func:
                 self.__execute_topic_callback(self.MESSAGE_RESEND, output)
 
 
+    def __clear_outbox(self):
+        # A durable outbox keeps its messages for the next connection / process
+        if not self.__outbox.durable:
+            self.__outbox.clear()
+
+
     def encode_json(self, data):
         return json.dumps(data).encode('utf-8')
 
@@ -827,9 +2126,12 @@ class Realtime:
             raise ValueError(f"Error encoding JSON: {e}")
 
 
-    def __log(self, msg):
-        if self.__debug:
-            print(msg)  # Replace with a logging system if necessary
+    def __log(self, msg, *args):
+        """
+        Debug log with %-style arguments, they are only formatted when the
+        record is emitted. Per message paths check isEnabledFor() first.
+        """
+        self.__logger.debug(msg, *args)
 
 
     def is_message_valid(self, msg):
@@ -864,6 +2166,11 @@ class Realtime:
             Every pattern key from ``self._event_func`` that matches *topic*
             and is **not** one of the control events.
         """
+        # Concrete subjects are resolved through the trie, wildcard
+        # topics still need the pairwise pattern comparison below
+        if "*" not in topic and ">" not in topic:
+            return self.__topic_index.match(topic)
+
         ignore = {
             self.CONNECTED,
             self.RECONNECT,
@@ -953,31 +2260,31 @@ class Realtime:
 
 
     def __strip_stream_hash(self, topic):
-        return topic.replace(f"{self.__topicHash}.", "")
+        prefix = self.__topicHash
+
+        # Subjects are "<hash>.<topic>", slice the prefix off instead of
+        # scanning the whole subject for it
+        if topic.startswith(prefix) and topic[len(prefix):len(prefix) + 1] == ".":
+            return topic[len(prefix) + 1:]
+
+        return topic
 
 
     def __execute_topic_callback(self, topic, data):
-        handler = self.__event_func[topic]
+        task = self.__dispatcher.spawn(self.__event_func[topic], data)
 
-        if inspect.iscoroutinefunction(handler):
-            if data:
-                asyncio.create_task(handler(data))
-            else:
-                asyncio.create_task(handler())
-        else:
-            loop = asyncio.get_running_loop()
-
-            if data:
-                loop.run_in_executor(
-                    self._pool,
-                    handler,
-                    data
-                )
-            else:
-                loop.run_in_executor(
-                    self._pool,
-                    handler
-                )
+        if self.__tracer is not None:
+            span = self.__tracer.start_span("relayx.event", {"event": topic})
+            task.add_done_callback(lambda done: self.__end_task_span(span, done))
+
+
+    def __end_task_span(self, span, task):
+        error = None
+
+        if not task.cancelled():
+            error = task.exception()
+
+        self.__tracer.end_span(span, error)
 
 
     def sleep(self, seconds):
@@ -0,0 +1,113 @@
+import pytest
+import msgpack
+from relayx_py.codec import MessageCodec, MsgpackCodec, RawCodec, create_codec, register_codec, orjson, CODEC_HEADER
+
+
+def envelope(message):
+    return {
+        "id": "message-id",
+        "room": "codec.topic",
+        "message": message,
+        "start": 1700000000000
+    }
+
+
+def matcher(pattern, topic):
+    return pattern == topic or (pattern.endswith(".>") and topic.startswith(pattern[:-1]))
+
+
+# Tests - Codec Registry
+class TestCodecRegistry:
+    def test_should_create_known_codecs(self):
+        assert isinstance(create_codec("msgpack"), MsgpackCodec)
+        assert isinstance(create_codec("raw"), RawCodec)
+
+    def test_should_throw_error_for_unknown_codec(self):
+        with pytest.raises(ValueError, match="Unknown codec"):
+            create_codec("does-not-exist")
+
+    def test_should_register_custom_codec(self):
+        class UpperCodec:
+            name = "upper"
+            envelope = False
+
+            def encode(self, envelope):
+                return envelope["message"].upper()
+
+            def decode(self, data):
+                return data.lower()
+
+        register_codec(UpperCodec)
+
+        codec = MessageCodec(codec="upper")
+        payload, headers = codec.encode("codec.topic", envelope(b"hello"))
+
+        assert payload == b"HELLO"
+        assert codec.decode(payload, headers)["message"] == b"hello"
+
+    def test_should_throw_error_when_registering_codec_without_name(self):
+        with pytest.raises(ValueError):
+            register_codec(object)
+
+
+# Tests - Message Codec
+class TestMessageCodec:
+    def test_should_keep_legacy_msgpack_wire_format_by_default(self):
+        codec = MessageCodec()
+        payload, headers = codec.encode("codec.topic", envelope({"hello": "world"}))
+
+        assert headers is None
+        assert msgpack.unpackb(payload, raw=False) == envelope({"hello": "world"})
+
+    def test_should_decode_messages_without_codec_header_as_msgpack(self):
+        codec = MessageCodec()
+        payload = msgpack.packb(envelope("hello"))
+
+        assert codec.decode(payload, None) == envelope("hello")
+        assert codec.decode(payload, {}) == envelope("hello")
+
+    def test_should_carry_envelope_in_headers_for_raw_codec(self):
+        codec = MessageCodec(codec="raw")
+        payload, headers = codec.encode("codec.topic", envelope(b"\x00\x01binary"))
+
+        assert payload == b"\x00\x01binary"
+        assert headers[CODEC_HEADER] == "raw"
+        assert codec.decode(payload, headers) == envelope(b"\x00\x01binary")
+
+    def test_should_reject_non_bytes_for_raw_codec(self):
+        codec = MessageCodec(codec="raw")
+
+        with pytest.raises(ValueError, match="raw codec requires"):
+            codec.encode("codec.topic", envelope("not bytes"))
+
+    def test_should_select_codec_per_topic(self):
+        codec = MessageCodec(topic_codecs={"sensors.>": "raw"}, matcher=matcher)
+
+        _, headers = codec.encode("sensors.a", envelope(b"raw"))
+        assert headers[CODEC_HEADER] == "raw"
+
+        _, headers = codec.encode("chat", envelope("text"))
+        assert headers is None
+
+    def test_should_decode_mixed_producers(self):
+        producer_a = MessageCodec()
+        producer_b = MessageCodec(codec="raw")
+        consumer = MessageCodec()
+
+        payload, headers = producer_a.encode("codec.topic", envelope("from a"))
+        assert consumer.decode(payload, headers)["message"] == "from a"
+
+        payload, headers = producer_b.encode("codec.topic", envelope(b"from b"))
+        assert consumer.decode(payload, headers)["message"] == b"from b"
+
+    def test_should_throw_error_when_topic_codecs_is_not_a_dict(self):
+        with pytest.raises(ValueError, match="topic_codecs must be a dict"):
+            MessageCodec(topic_codecs=["raw"])
+
+    @pytest.mark.skipif(orjson is None, reason="orjson not installed")
+    def test_should_round_trip_with_orjson(self):
+        codec = MessageCodec(codec="orjson")
+        payload, headers = codec.encode("codec.topic", envelope({"hello": "world"}))
+
+        assert headers[CODEC_HEADER] == "orjson"
+        assert codec.decode(payload, headers) == envelope({"hello": "world"})
@@ -0,0 +1,73 @@
+import pytest
+import msgpack
+from relayx_py.codec import MessageCodec, CODEC_HEADER
+from relayx_py.compression import create_compressor, ZlibCompressor, COMPRESSION_HEADER, lz4_frame, zstandard
+
+
+def envelope(message):
+    return {
+        "id": "message-id",
+        "room": "compression.topic",
+        "message": message,
+        "start": 1700000000000
+    }
+
+
+LARGE_MESSAGE = {"readings": [{"sensor": "temperature", "value": 21.5, "unit": "celsius"}] * 200}
+
+
+# Tests - Compressors
+class TestCompressors:
+    def test_should_create_zlib_compressor(self):
+        assert isinstance(create_compressor("zlib"), ZlibCompressor)
+
+    def test_should_throw_error_for_unknown_compression(self):
+        with pytest.raises(ValueError, match="Unknown compression"):
+            create_compressor("does-not-exist")
+
+    @pytest.mark.parametrize("name,module", [("zlib", True), ("lz4", lz4_frame), ("zstd", zstandard)])
+    def test_should_round_trip(self, name, module):
+        if module is None:
+            pytest.skip(f"{name} not installed")
+
+        compressor = create_compressor(name)
+        data = msgpack.packb(LARGE_MESSAGE)
+
+        assert compressor.decompress(compressor.compress(data)) == data
+
+
+# Tests - Compression in the envelope
+class TestEnvelopeCompression:
+    def test_should_throw_error_when_threshold_is_invalid(self):
+        with pytest.raises(ValueError, match="compression_threshold"):
+            MessageCodec(compression="zlib", compression_threshold=-1)
+
+    def test_should_not_compress_below_threshold(self):
+        codec = MessageCodec(compression="zlib", compression_threshold=1024)
+        payload, headers = codec.encode("compression.topic", envelope("small"))
+
+        assert headers is None
+        assert msgpack.unpackb(payload, raw=False)["message"] == "small"
+
+    def test_should_compress_above_threshold_and_flag_it(self):
+        codec = MessageCodec(compression="zlib", compression_threshold=1024)
+        payload, headers = codec.encode("compression.topic", envelope(LARGE_MESSAGE))
+
+        assert headers == {COMPRESSION_HEADER: "zlib"}
+        assert len(payload) < len(msgpack.packb(envelope(LARGE_MESSAGE)))
+
+    def test_should_decompress_automatically(self):
+        producer = MessageCodec(compression="zlib", compression_threshold=0)
+        consumer = MessageCodec()
+
+        payload, headers = producer.encode("compression.topic", envelope(LARGE_MESSAGE))
+
+        assert consumer.decode(payload, headers) == envelope(LARGE_MESSAGE)
+
+    def test_should_skip_incompressible_payloads(self):
+        codec = MessageCodec(codec="raw", compression="zlib", compression_threshold=0)
+        payload, headers = codec.encode("compression.topic", envelope(b"\x01"))
+
+        assert payload == b"\x01"
+        assert COMPRESSION_HEADER not in headers
+        assert headers[CODEC_HEADER] == "raw"
@@ -0,0 +1,36 @@
+import pytest
+from relayx_py.dedupe import DedupeWindow
+
+
+# Tests - Dedupe window
+class TestDedupeWindow:
+    def test_should_report_repeated_ids(self):
+        window = DedupeWindow(10)
+
+        assert window.seen("a") is False
+        assert window.seen("b") is False
+        assert window.seen("a") is True
+        assert window.duplicates == 1
+
+    def test_should_forget_the_least_recently_seen_ids(self):
+        window = DedupeWindow(2)
+
+        window.seen("a")
+        window.seen("b")
+        window.seen("a")
+        window.seen("c")
+
+        assert len(window) == 2
+        assert window.seen("b") is False
+        assert window.seen("a") is False
+
+    def test_should_ignore_messages_without_id(self):
+        window = DedupeWindow(2)
+
+        assert window.seen(None) is False
+        assert window.seen(None) is False
+        assert len(window) == 0
+
+    def test_should_reject_invalid_size(self):
+        with pytest.raises(ValueError):
+            DedupeWindow(0)
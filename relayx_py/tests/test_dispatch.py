@@ -0,0 +1,133 @@
+import pytest
+import asyncio
+from relayx_py.dispatch import create_dispatcher, InlineDispatcher, BoundedDispatcher, SerialDispatcher, ThreadDispatcher, ProcessDispatcher
+
+
+# Tests - Dispatcher factory
+class TestCreateDispatcher:
+    def test_should_create_every_mode(self):
+        assert isinstance(create_dispatcher("inline"), InlineDispatcher)
+        assert isinstance(create_dispatcher("bounded"), BoundedDispatcher)
+        assert isinstance(create_dispatcher("serial"), SerialDispatcher)
+        assert isinstance(create_dispatcher("thread"), ThreadDispatcher)
+        assert isinstance(create_dispatcher("process"), ProcessDispatcher)
+
+    def test_should_default_to_thread_mode(self):
+        assert isinstance(create_dispatcher(), ThreadDispatcher)
+
+    def test_should_throw_error_for_unknown_mode(self):
+        with pytest.raises(ValueError, match="Unknown dispatch mode"):
+            create_dispatcher("fork-bomb")
+
+    def test_should_throw_error_for_invalid_limits(self):
+        with pytest.raises(ValueError, match="dispatch_concurrency"):
+            create_dispatcher("bounded", concurrency=0)
+
+        with pytest.raises(ValueError, match="dispatch_workers"):
+            create_dispatcher("thread", workers=-1)
+
+
+# Tests - Strategies
+class TestStrategies:
+    @pytest.mark.asyncio
+    async def test_inline_should_run_handler_before_returning(self):
+        dispatcher = create_dispatcher("inline")
+        received = []
+
+        async def handler(data):
+            await asyncio.sleep(0.01)
+            received.append(data)
+
+        await dispatcher.dispatch("topic", handler, {"n": 1})
+
+        assert received == [{"n": 1}]
+
+    @pytest.mark.asyncio
+    async def test_bounded_should_limit_concurrency(self):
+        dispatcher = create_dispatcher("bounded", concurrency=2)
+        running = 0
+        peak = 0
+
+        async def handler(data):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        for n in range(10):
+            await dispatcher.dispatch("topic", handler, {"n": n})
+
+        await asyncio.sleep(0.05)
+
+        assert peak == 2
+
+    @pytest.mark.asyncio
+    async def test_serial_should_keep_order_per_topic(self):
+        dispatcher = create_dispatcher("serial")
+        received = {"a": [], "b": []}
+
+        async def handler(data):
+            # Later messages finish faster, an unordered strategy would reorder them
+            await asyncio.sleep(0.001 * (10 - data["n"]))
+            received[data["topic"]].append(data["n"])
+
+        for n in range(10):
+            await dispatcher.dispatch("a", handler, {"topic": "a", "n": n})
+            await dispatcher.dispatch("b", handler, {"topic": "b", "n": n})
+
+        await asyncio.sleep(0.2)
+
+        assert received["a"] == list(range(10))
+        assert received["b"] == list(range(10))
+
+    @pytest.mark.asyncio
+    async def test_thread_should_run_sync_handlers_off_the_loop(self):
+        dispatcher = create_dispatcher("thread", workers=2)
+        done = asyncio.Event()
+        loop = asyncio.get_running_loop()
+
+        def handler(data):
+            loop.call_soon_threadsafe(done.set)
+
+        await dispatcher.dispatch("topic", handler, {"n": 1})
+        await asyncio.wait_for(done.wait(), 1)
+
+        await dispatcher.close()
+
+    @pytest.mark.asyncio
+    async def test_spawn_should_call_handler_without_data(self):
+        dispatcher = create_dispatcher("inline")
+        called = asyncio.Event()
+
+        async def handler():
+            called.set()
+
+        dispatcher.spawn(handler, None)
+
+        await asyncio.wait_for(called.wait(), 1)
+
+
+# Tests - Pending handler calls
+class TestWaitForPending:
+    @pytest.mark.asyncio
+    async def test_should_wake_every_waiter(self):
+        dispatcher = create_dispatcher("thread")
+        gate = asyncio.Event()
+
+        async def handler(data):
+            await gate.wait()
+
+        for n in range(4):
+            await dispatcher.dispatch("topic", handler, {"n": n})
+
+        # E.g. the fetch loops of two receive partitions
+        first = asyncio.create_task(dispatcher.wait_for_pending(2))
+        second = asyncio.create_task(dispatcher.wait_for_pending(1))
+        await asyncio.sleep(0)
+
+        gate.set()
+
+        await asyncio.wait_for(asyncio.gather(first, second), 1)
+
+        assert dispatcher.pending == 0
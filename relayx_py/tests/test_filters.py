@@ -0,0 +1,115 @@
+from relayx_py import Realtime
+import random
+import itertools
+from relayx_py.filters import FilterSet, generalize, reduce_filters, partition_filters
+from relayx_py.topic_index import TopicIndex
+
+
+def matcher(a, b):
+    return Realtime.topic_pattern_matcher(None, a, b)
+
+
+SUBJECTS = [".".join(tokens) for length in range(1, 7) for tokens in itertools.product("abc", repeat=length)]
+
+
+# Tests - Pattern generalization
+class TestGeneralize:
+    def test_should_keep_shared_tokens(self):
+        assert generalize("a.*.c", "a.b.*") == "a.*.*"
+        assert generalize("a.b.c", "a.b.d") == "a.b.*"
+
+    def test_should_use_full_wildcard_for_different_lengths(self):
+        assert generalize("a.b", "a.b.c") == "a.>"
+        assert generalize("a.>", "a.b.c") == "a.>"
+        assert generalize("x.b.>", "y.b.c.d") == "*.b.>"
+
+
+# Tests - Filter reduction
+class TestReduceFilters:
+    def test_should_keep_disjoint_patterns(self):
+        assert reduce_filters(["orders.eu", "orders.us", "chat.*"]) == ["chat.*", "orders.eu", "orders.us"]
+
+    def test_should_merge_overlapping_patterns(self):
+        filters = reduce_filters(["orders.*", "orders.eu", "orders.>", "chat.room"])
+
+        assert filters == ["chat.room", "orders.>"]
+
+    def test_should_not_leave_overlapping_filters(self):
+        patterns = ["a.*.c", "a.b.*", "a.b.c.d", "x.y", "*.y"]
+        filters = reduce_filters(patterns)
+
+        for i, a in enumerate(filters):
+            for b in filters[i + 1:]:
+                assert not matcher(a, b)
+
+        # Every pattern is still covered by a filter
+        for pattern in patterns:
+            assert any(matcher(f, pattern) for f in filters)
+
+
+# Tests - Filter partitioning
+class TestPartitionFilters:
+    def test_should_assign_each_filter_once(self):
+        patterns = [f"room{n}" for n in range(40)]
+        partitions = partition_filters(patterns, 4)
+
+        assert len(partitions) == 4
+        assert sorted(f for partition in partitions for f in partition) == sorted(patterns)
+        assert all(len(partition) > 0 for partition in partitions)
+
+
+# Tests - Incremental filter set
+class TestFilterSet:
+    def assert_valid(self, filter_set, patterns):
+        filters = filter_set.filters()
+
+        index = TopicIndex()
+
+        for subject_filter in filters:
+            index.add(subject_filter)
+
+        # No subject matches two filters, every subscribed subject matches one
+        for subject in SUBJECTS:
+            assert len(index.match(subject)) <= 1
+
+        for pattern in patterns:
+            assert any(generalize(f, pattern) == f for f in filters), pattern
+
+    def test_should_keep_filters_valid_on_add_and_remove(self):
+        rng = random.Random(1234)
+        tokens = ["a", "b", "c", "*"]
+
+        for _ in range(25):
+            filter_set = FilterSet()
+            patterns = []
+
+            for _ in range(rng.randint(1, 20)):
+                pattern = ".".join(rng.choice(tokens) for _ in range(rng.randint(1, 4)))
+
+                if rng.random() < 0.2:
+                    pattern += ".>"
+
+                if filter_set.add(pattern):
+                    patterns.append(pattern)
+
+                self.assert_valid(filter_set, patterns)
+
+            rng.shuffle(patterns)
+
+            while patterns:
+                assert filter_set.remove(patterns.pop()) is True
+                self.assert_valid(filter_set, patterns)
+
+            assert filter_set.filters() == []
+
+    def test_should_narrow_filters_after_remove(self):
+        filter_set = FilterSet()
+
+        for pattern in ["orders.eu", "orders.us", "orders.*"]:
+            filter_set.add(pattern)
+
+        assert filter_set.filters() == ["orders.*"]
+
+        filter_set.remove("orders.*")
+
+        assert filter_set.filters() == ["orders.eu", "orders.us"]
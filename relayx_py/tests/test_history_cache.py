@@ -0,0 +1,108 @@
+import os
+import pytest
+from datetime import datetime, timezone
+from relayx_py.history_cache import HistoryCache, to_micros, from_micros
+
+
+def record(seq, ts=None):
+    return {"seq": seq, "ts": ts if ts is not None else seq * 10, "id": f"id-{seq}", "topic": "chat", "message": seq, "size": 8}
+
+
+# Tests - History Cache Constructor
+class TestHistoryCacheConstructor:
+    def test_should_throw_error_for_invalid_directory(self):
+        with pytest.raises(ValueError, match="history_cache must be a directory path"):
+            HistoryCache("")
+
+    def test_should_throw_error_for_invalid_segment_size(self, tmp_path):
+        with pytest.raises(ValueError, match="segment_size"):
+            HistoryCache(str(tmp_path), segment_size=0)
+
+
+# Tests - Coverage
+class TestCoverage:
+    def test_should_not_cover_unknown_topics(self, tmp_path):
+        cache = HistoryCache(str(tmp_path))
+
+        assert cache.coverage("chat") is None
+        assert list(cache.read("chat", 0)) == []
+        assert cache.append("chat", record(1)) is False
+
+    def test_should_extend_coverage_and_skip_cached_sequences(self, tmp_path):
+        cache = HistoryCache(str(tmp_path))
+        cache.reset("chat", 5)
+
+        assert cache.append("chat", record(1)) is True
+        assert cache.append("chat", record(2)) is True
+        assert cache.append("chat", record(2)) is False
+
+        assert cache.coverage("chat") == (5, 20, 2)
+
+    def test_should_read_by_time_range(self, tmp_path):
+        cache = HistoryCache(str(tmp_path), segment_size=64)
+        cache.reset("chat", 0)
+
+        for seq in range(1, 21):
+            cache.append("chat", record(seq))
+
+        assert [r["seq"] for r in cache.read("chat", 50, 100)] == [5, 6, 7, 8, 9, 10]
+        assert [r["seq"] for r in cache.read("chat", 195)] == [20]
+        assert len([name for name in os.listdir(cache._HistoryCache__get("chat").directory) if name.endswith(".seg")]) > 1
+
+    def test_should_reset_dropping_records(self, tmp_path):
+        cache = HistoryCache(str(tmp_path))
+        cache.reset("chat", 0)
+        cache.append("chat", record(1))
+
+        cache.reset("chat", 100)
+
+        assert cache.coverage("chat") == (100, 100, 0)
+        assert list(cache.read("chat", 0)) == []
+
+
+# Tests - Persistence
+class TestPersistence:
+    def test_should_reload_segments(self, tmp_path):
+        cache = HistoryCache(str(tmp_path), segment_size=64)
+        cache.reset("chat", 0)
+
+        for seq in range(1, 11):
+            cache.append("chat", record(seq))
+
+        cache.close()
+
+        reloaded = HistoryCache(str(tmp_path))
+
+        assert reloaded.coverage("chat") == (0, 100, 10)
+        assert [r["seq"] for r in reloaded.read("chat", 0)] == list(range(1, 11))
+
+        assert reloaded.append("chat", record(11)) is True
+        assert [r["seq"] for r in reloaded.read("chat", 100)] == [10, 11]
+
+    def test_should_shrink_coverage_after_torn_write(self, tmp_path):
+        cache = HistoryCache(str(tmp_path))
+        cache.reset("chat", 0)
+
+        for seq in range(1, 4):
+            cache.append("chat", record(seq))
+
+        cache.close()
+
+        directory = os.path.join(str(tmp_path), os.listdir(str(tmp_path))[0])
+        segment = os.path.join(directory, [name for name in os.listdir(directory) if name.endswith(".seg")][0])
+
+        with open(segment, "r+b") as f:
+            f.truncate(os.path.getsize(segment) - 3)
+
+        reloaded = HistoryCache(str(tmp_path))
+
+        assert reloaded.coverage("chat") == (0, 20, 2)
+        assert [r["seq"] for r in reloaded.read("chat", 0)] == [1, 2]
+
+
+# Tests - Timestamps
+class TestTimestamps:
+    def test_should_convert_microseconds_exactly(self):
+        dt = datetime(2025, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc)
+
+        assert from_micros(to_micros(dt)) == dt
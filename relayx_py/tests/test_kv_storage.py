@@ -4,6 +4,7 @@ import asyncio
 import json
 from unittest.mock import Mock, AsyncMock, MagicMock, patch
 from relayx_py.kv_storage import KVStore
+from relayx_py.metrics import ClientMetrics
 
 
 # Mock objects for JetStream
@@ -504,6 +505,23 @@ class TestGetMethod:
         assert result is None
 
 
+class TestOperationMetrics:
+    @pytest.mark.asyncio
+    async def test_records_operation_latencies(self, kv_store_config):
+        metrics = ClientMetrics()
+
+        store = KVStore({**kv_store_config, "metrics": metrics})
+        await store.init()
+
+        await store.put("test.key", "test value")
+        await store.get("test.string")
+        await store.get("test.number")
+
+        assert metrics.kv_latency["put"].count == 1
+        assert metrics.kv_latency["get"].count == 2
+        assert "delete" not in metrics.kv_latency
+
+
 class TestDeleteMethod:
     @pytest.mark.asyncio
     async def test_delete_validates_key_null(self, kv_store):
@@ -0,0 +1,59 @@
+import json
+import pytest
+from relayx_py import loadgen
+
+
+# Tests - Arguments
+class TestParseArgs:
+    def test_should_default_to_the_in_memory_stream(self):
+        args = loadgen.parse_args([])
+
+        assert args.server is None
+        assert args.publishers == 1
+        assert args.subscribers == 1
+
+    @pytest.mark.parametrize("argv", [
+        ["--publishers", "-1"],
+        ["--duration", "0"],
+        ["--outage", "5", "--duration", "5"],
+        ["--dispatch", "process"]
+    ])
+    def test_should_reject_invalid_arguments(self, argv):
+        with pytest.raises(SystemExit):
+            loadgen.parse_args(argv)
+
+
+# Tests - Load run against the in-memory stream
+class TestLoadgen:
+    @pytest.mark.asyncio
+    async def test_should_deliver_every_message_to_every_subscriber(self):
+        args = loadgen.parse_args(["--publishers", "2", "--subscribers", "2", "--duration", "0.3",
+                                   "--rate", "200", "--queue-publishers", "1", "--queue-workers", "2"])
+
+        report = await loadgen.run(args)
+
+        realtime = report["realtime"]
+        queue = report["queue"]
+
+        assert realtime["published"] > 0
+        assert realtime["received"] == realtime["published"] * 2
+        assert realtime["undelivered"] == 0
+        assert realtime["latency_ms"]["p50"] > 0
+
+        assert queue["published"] > 0
+        assert queue["handled"] == queue["published"]
+
+    @pytest.mark.asyncio
+    async def test_should_measure_reconnect_recovery(self):
+        args = loadgen.parse_args(["--duration", "0.6", "--rate", "500", "--outage", "0.2", "--dispatch", "inline"])
+
+        report = await loadgen.run(args)
+
+        assert report["reconnect"]["recovery_s"] is not None
+        assert report["reconnect"]["outbox_dropped"] == 0
+        assert report["realtime"]["undelivered"] == 0
+
+    def test_should_print_json_report(self, capsys):
+        report = loadgen.main(["--duration", "0.2", "--rate", "100", "--json"])
+
+        assert json.loads(capsys.readouterr().out) == report
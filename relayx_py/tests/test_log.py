@@ -0,0 +1,109 @@
+import pytest
+import logging
+from relayx_py import Realtime, log
+from relayx_py.queue import Queue
+from relayx_py.utils import Logging
+
+
+class CountingStr:
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return "counted"
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture(autouse=True)
+def reset_loggers():
+    yield
+
+    log.stop_logging()
+
+    for subsystem in log.SUBSYSTEMS:
+        log.get_logger(subsystem).setLevel(logging.NOTSET)
+        log.get_logger(f"{subsystem}.{log.DEBUG_CHILD}").setLevel(logging.NOTSET)
+
+    logging.getLogger(log.LOGGER_NAME).setLevel(logging.NOTSET)
+
+
+# Tests - Subsystem loggers
+class TestDebugLogger:
+    def test_should_enable_debug_for_the_subsystem_only(self):
+        realtime = Realtime({
+            "api_key": "test-api-key",
+            "secret": "test-secret"
+        })
+
+        realtime.init({"opts": {"debug": True}})
+
+        assert realtime._Realtime__logger.isEnabledFor(logging.DEBUG)
+        assert not log.get_logger(log.KV).isEnabledFor(logging.DEBUG)
+
+    def test_should_not_leak_debug_to_other_clients(self):
+        debug = Realtime({"api_key": "test-api-key", "secret": "test-secret"})
+        debug.init({"opts": {"debug": True}})
+
+        quiet = Realtime({"api_key": "test-api-key", "secret": "test-secret"})
+        quiet.init({"opts": {"debug": False}})
+
+        assert not quiet._Realtime__logger.isEnabledFor(logging.DEBUG)
+        assert not log.get_logger(log.REALTIME).isEnabledFor(logging.DEBUG)
+
+        # Only the debug client's records are printed to stdout
+        assert log._debug_handler.filter(logging.makeLogRecord({"name": debug._Realtime__logger.name}))
+        assert not log._debug_handler.filter(logging.makeLogRecord({"name": quiet._Realtime__logger.name}))
+
+    def test_should_not_format_arguments_when_disabled(self):
+        value = CountingStr()
+
+        Logging(debug=False).log("Value => %s", value)
+
+        assert value.calls == 0
+
+    def test_should_format_arguments_when_enabled(self, caplog):
+        value = CountingStr()
+
+        with caplog.at_level(logging.DEBUG, logger="relayx_py.kv"):
+            Logging(debug=False).log("Value => %s", value)
+
+        assert caplog.records[0].getMessage() == "Value => counted"
+
+    @pytest.mark.asyncio
+    async def test_should_not_print_when_queue_is_offline(self, capsys):
+        queue = Queue({"api_key": "test-api-key", "debug": False})
+        queue.connected = False
+
+        assert await queue.publish("offline.topic", "message") is False
+
+        assert capsys.readouterr().out == ""
+
+
+# Tests - Queue handler setup
+class TestConfigureLogging:
+    def test_should_deliver_records_through_the_listener(self):
+        handler = ListHandler()
+
+        log.configure_logging(level=logging.WARNING, levels={"queue": "DEBUG"}, handler=handler)
+
+        log.get_logger(log.QUEUE).debug("queue %s", "debug")
+        log.get_logger(log.REALTIME).debug("realtime %s", "debug")
+        log.get_logger(log.REALTIME).warning("realtime %s", "warning")
+
+        # Stopping the listener flushes the queue
+        log.stop_logging()
+
+        assert [record.getMessage() for record in handler.records] == ["queue debug", "realtime warning"]
+
+    def test_should_reject_unknown_subsystems(self):
+        with pytest.raises(ValueError, match="Unknown logging subsystem"):
+            log.configure_logging(levels={"unknown": "DEBUG"})
@@ -0,0 +1,100 @@
+import pytest
+import asyncio
+import nats
+import nats.js.api as nats_config
+from nats.js.errors import KeyNotFoundError, NoKeysError
+from relayx_py import Realtime
+from relayx_py.memory_jetstream import MemoryJetStream, subject_matches, attach_realtime
+
+
+# Tests - Subject matching
+class TestSubjectMatches:
+    def test_should_match_nats_wildcards(self):
+        assert subject_matches("a.b", "a.b")
+        assert subject_matches("a.*", "a.b")
+        assert subject_matches("a.>", "a.b.c")
+
+        assert not subject_matches("a.*", "a.b.c")
+        assert not subject_matches("a.>", "a")
+        assert not subject_matches("a.b", "a.c")
+
+
+# Tests - In-memory JetStream
+class TestMemoryJetStream:
+    @pytest.mark.asyncio
+    async def test_should_resolve_async_publish_acks(self):
+        jetstream = MemoryJetStream()
+
+        future = await jetstream.publish_async("a.b", b"1")
+
+        assert not future.done()
+        assert (await future).seq == 1
+        assert len(jetstream) == 1
+
+    @pytest.mark.asyncio
+    async def test_should_share_durable_pull_consumers(self):
+        jetstream = MemoryJetStream()
+        config = nats_config.ConsumerConfig(durable_name="workers", deliver_policy=nats_config.DeliverPolicy.ALL)
+
+        for n in range(3):
+            await jetstream.publish("jobs.new", str(n).encode())
+
+        first = await jetstream.pull_subscribe("jobs.*", durable="workers", config=config)
+        second = await jetstream.pull_subscribe("jobs.*", durable="workers", config=config)
+
+        assert [m.data for m in await first.fetch(2, timeout=0.1)] == [b"0", b"1"]
+        assert [m.data for m in await second.fetch(2, timeout=0.1)] == [b"2"]
+
+        with pytest.raises(nats.errors.TimeoutError):
+            await first.fetch(1, timeout=0.01)
+
+    @pytest.mark.asyncio
+    async def test_should_wake_fetch_on_publish(self):
+        jetstream = MemoryJetStream()
+        consumer = await jetstream.pull_subscribe("jobs.>")
+
+        fetch = asyncio.create_task(consumer.fetch(1, timeout=1))
+        await asyncio.sleep(0)
+        await jetstream.publish("jobs.new", b"x")
+
+        assert [m.data for m in await fetch] == [b"x"]
+
+    @pytest.mark.asyncio
+    async def test_should_store_key_values(self):
+        kv = await MemoryJetStream().key_value("bucket")
+
+        with pytest.raises(NoKeysError):
+            await kv.keys()
+
+        await kv.put("a", b"1")
+
+        assert (await kv.get("a")).value == b"1"
+
+        await kv.purge("a")
+
+        with pytest.raises(KeyNotFoundError):
+            await kv.get("a")
+
+    @pytest.mark.asyncio
+    async def test_should_deliver_realtime_messages_end_to_end(self):
+        realtime = Realtime({"api_key": "test-api-key", "secret": "test-secret"})
+        realtime.init({"staging": True, "opts": {"debug": False}})
+
+        attach_realtime(realtime)
+
+        received = asyncio.Event()
+
+        async def handler(data):
+            received.data = data
+            received.set()
+
+        await realtime.on("memory.e2e", handler)
+        await realtime.publish("memory.e2e", {"hello": "world"})
+
+        await asyncio.wait_for(received.wait(), 1)
+
+        assert received.data["data"] == {"hello": "world"}
+
+        await realtime.off("memory.e2e")
+        await realtime.close()
+        await asyncio.sleep(0)
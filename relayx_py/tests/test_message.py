@@ -0,0 +1,70 @@
+import pickle
+import pytest
+import msgpack
+from datetime import datetime, timezone
+from relayx_py.codec import MessageCodec
+from relayx_py.models.message import RealtimeMessage
+
+
+class CountingCodec(MessageCodec):
+    def __init__(self):
+        super().__init__()
+        self.decodes = 0
+
+    def decode(self, data, headers=None):
+        self.decodes += 1
+        return super().decode(data, headers)
+
+
+def create_message(codec, headers=None):
+    raw = msgpack.packb({"id": "message-id", "room": "lazy.topic", "message": {"n": 1}, "start": 0})
+    timestamp = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    return RealtimeMessage("lazy.topic", 7, timestamp, raw, headers, codec)
+
+
+# Tests - Lazy realtime messages
+class TestRealtimeMessage:
+    def test_should_not_decode_for_topic_and_metadata(self):
+        codec = CountingCodec()
+        message = create_message(codec, headers={"Nats-Msg-Id": "message-id"})
+
+        assert message.topic == "lazy.topic"
+        assert message["topic"] == "lazy.topic"
+        assert message.sequence == 7
+        assert message.timestamp.year == 2026
+        assert message.id == "message-id"
+        assert codec.decodes == 0
+
+    def test_should_decode_once_on_data_access(self):
+        codec = CountingCodec()
+        message = create_message(codec)
+
+        assert message["data"] == {"n": 1}
+        assert message.data == {"n": 1}
+        assert message["id"] == "message-id"
+        assert codec.decodes == 1
+
+    def test_should_read_like_a_dict(self):
+        message = create_message(MessageCodec())
+
+        assert dict(message) == {"id": "message-id", "topic": "lazy.topic", "data": {"n": 1}}
+        assert message.get("missing") is None
+
+        with pytest.raises(KeyError):
+            message["missing"]
+
+    def test_should_be_immutable(self):
+        message = create_message(MessageCodec())
+
+        with pytest.raises(AttributeError):
+            message.topic = "other"
+
+        with pytest.raises(AttributeError):
+            message.extra = 1
+
+    def test_should_pickle_decoded(self):
+        message = pickle.loads(pickle.dumps(create_message(MessageCodec())))
+
+        assert message.decoded
+        assert dict(message) == {"id": "message-id", "topic": "lazy.topic", "data": {"n": 1}}
@@ -0,0 +1,113 @@
+import random
+import pytest
+from relayx_py.metrics import LatencyHistogram, ClientMetrics
+
+
+# Tests - Latency Histogram
+class TestLatencyHistogram:
+    def test_should_throw_error_for_invalid_layout(self):
+        with pytest.raises(ValueError, match="max_value_bits"):
+            LatencyHistogram(sub_bucket_bits=8, max_value_bits=8)
+
+    def test_should_be_empty(self):
+        histogram = LatencyHistogram()
+
+        assert histogram.count == 0
+        assert histogram.percentile(99) == 0
+        assert histogram.summary()["mean"] == 0
+
+    def test_should_keep_small_values_exact(self):
+        histogram = LatencyHistogram()
+
+        for value in range(1, 101):
+            histogram.record(value)
+
+        assert histogram.percentile(50) == 50
+        assert histogram.percentile(99) == 99
+        assert histogram.percentile(100) == 100
+        assert histogram.min == 1
+        assert histogram.max == 100
+
+    def test_should_stay_within_relative_error(self):
+        rng = random.Random(7)
+        histogram = LatencyHistogram()
+        values = sorted(rng.randint(1_000, 5_000_000_000) for _ in range(20000))
+
+        for value in values:
+            histogram.record(value)
+
+        for p in [50, 90, 99, 99.9]:
+            expected = values[int(p / 100 * len(values)) - 1]
+
+            assert abs(histogram.percentile(p) - expected) / expected < 0.02
+
+    def test_should_clamp_out_of_range_values(self):
+        histogram = LatencyHistogram(max_value_bits=20)
+
+        histogram.record(-5)
+        histogram.record(1 << 30)
+
+        assert histogram.min == 0
+        assert histogram.max == (1 << 20) - 1
+
+    def test_should_summarize_in_milliseconds_and_reset(self):
+        histogram = LatencyHistogram()
+
+        histogram.record(2_000_000)
+        histogram.record(4_000_000)
+
+        summary = histogram.summary()
+
+        assert summary["count"] == 2
+        assert summary["mean"] == 3
+        assert set(summary.keys()) == {"count", "min", "max", "mean", "p50", "p90", "p99", "p99_9"}
+
+        histogram.reset()
+
+        assert histogram.count == 0
+        assert histogram.percentile(50) == 0
+
+
+# Tests - Client Metrics
+class TestClientMetrics:
+    def test_should_track_outages_and_reconnects(self):
+        metrics = ClientMetrics()
+
+        metrics.outage_started()
+        assert metrics.snapshot()["connection"]["in_outage"] is True
+
+        metrics.outage_ended()
+
+        connection = metrics.snapshot()["connection"]
+
+        assert connection["reconnects"] == 1
+        assert connection["outages"] == 1
+        assert connection["outage_seconds"] >= 0
+        assert connection["in_outage"] is False
+
+    def test_should_include_gauges_in_snapshot(self):
+        metrics = ClientMetrics()
+        metrics.message_received("chat.>")
+        metrics.message_received("chat.>")
+
+        snapshot = metrics.snapshot({"outbox_size": 3})
+
+        assert snapshot["received"] == {"chat.>": 2}
+        assert snapshot["outbox_size"] == 3
+
+    def test_should_render_openmetrics(self):
+        metrics = ClientMetrics()
+        metrics.published = 2
+        metrics.publish_ack_latency.record(1_000_000)
+        metrics.message_received('room."a"')
+        metrics.kv_op("get", 2_000_000)
+
+        text = metrics.openmetrics({"dispatch_pending": 4})
+
+        assert "relayx_published_total 2" in text
+        assert 'relayx_publish_ack_latency_seconds{quantile="0.99"} 0.001' in text
+        assert "relayx_publish_ack_latency_seconds_count 1" in text
+        assert 'relayx_received_total{subscription="room.\\"a\\""} 1' in text
+        assert 'relayx_kv_latency_seconds_count{op="get"} 1' in text
+        assert "relayx_dispatch_pending 4" in text
+        assert text.endswith("# EOF\n")
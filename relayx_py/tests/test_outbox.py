@@ -0,0 +1,142 @@
+import pytest
+import asyncio
+from relayx_py.outbox import Outbox
+
+
+def record(n):
+    return {"topic": "outbox.topic", "message": n}
+
+
+# Tests - Outbox Constructor
+class TestOutboxConstructor:
+    def test_should_throw_error_for_invalid_limit(self):
+        with pytest.raises(ValueError, match="outbox_limit"):
+            Outbox(limit=0)
+
+    def test_should_throw_error_for_unknown_policy(self):
+        with pytest.raises(ValueError, match="Unknown outbox overflow policy"):
+            Outbox(overflow="ignore")
+
+    def test_should_require_directory_for_spill(self):
+        with pytest.raises(ValueError, match="outbox_dir is required"):
+            Outbox(overflow="spill")
+
+
+# Tests - Overflow Policies
+class TestOverflowPolicies:
+    @pytest.mark.asyncio
+    async def test_should_drop_oldest_records(self):
+        outbox = Outbox(limit=3, overflow="drop_oldest")
+
+        for n in range(5):
+            await outbox.put(record(n))
+
+        assert len(outbox) == 3
+        assert outbox.dropped == 2
+        assert [r["message"] for r in outbox.drain()] == [2, 3, 4]
+        assert len(outbox) == 0
+
+    @pytest.mark.asyncio
+    async def test_should_block_until_drained(self):
+        outbox = Outbox(limit=2, overflow="block")
+
+        await outbox.put(record(0))
+        await outbox.put(record(1))
+
+        blocked = asyncio.create_task(outbox.put(record(2)))
+        await asyncio.sleep(0.01)
+
+        assert not blocked.done()
+
+        assert [r["message"] for r in outbox.drain()] == [0, 1]
+        await asyncio.wait_for(blocked, 1)
+
+        assert [r["message"] for r in outbox.drain()] == [2]
+
+    @pytest.mark.asyncio
+    async def test_should_spill_to_disk(self, tmp_path):
+        outbox = Outbox(limit=2, overflow="spill", directory=str(tmp_path))
+
+        for n in range(5):
+            await outbox.put(record(n))
+
+        assert len(outbox) == 5
+        assert [r["message"] for r in outbox.drain()] == [0, 1, 2, 3, 4]
+
+        outbox.commit()
+        assert len(outbox) == 0
+
+
+# Tests - Durability
+class TestDurability:
+    @pytest.mark.asyncio
+    async def test_should_survive_restart(self, tmp_path):
+        outbox = Outbox(directory=str(tmp_path))
+
+        await outbox.put(record(0))
+        await outbox.put(record(1))
+
+        restarted = Outbox(directory=str(tmp_path))
+
+        assert [r["message"] for r in restarted.drain()] == [0, 1]
+
+    @pytest.mark.asyncio
+    async def test_should_keep_records_until_commit(self, tmp_path):
+        outbox = Outbox(limit=1, overflow="spill", directory=str(tmp_path))
+
+        await outbox.put(record(0))
+        await outbox.put(record(1))
+
+        outbox.drain()
+
+        # Crash before commit, everything is replayed again
+        assert len(Outbox(limit=1, overflow="spill", directory=str(tmp_path))) == 2
+
+        outbox.commit()
+
+        assert len(Outbox(limit=1, overflow="spill", directory=str(tmp_path))) == 0
+
+    @pytest.mark.asyncio
+    async def test_should_keep_records_buffered_during_replay(self, tmp_path):
+        outbox = Outbox(directory=str(tmp_path))
+
+        await outbox.put(record(0))
+        outbox.drain()
+
+        await outbox.put(record(1))
+        outbox.commit()
+
+        assert [r["message"] for r in Outbox(directory=str(tmp_path)).drain()] == [1]
+
+    @pytest.mark.asyncio
+    async def test_should_keep_failed_records_first(self, tmp_path):
+        outbox = Outbox(directory=str(tmp_path))
+
+        for n in range(3):
+            await outbox.put(record(n))
+
+        records = outbox.drain()
+
+        await outbox.put(record(3))
+        outbox.commit(failed=[records[0], records[2]])
+
+        assert [r["message"] for r in Outbox(directory=str(tmp_path)).drain()] == [0, 2, 3]
+
+    @pytest.mark.asyncio
+    async def test_should_ignore_torn_tail(self, tmp_path):
+        outbox = Outbox(directory=str(tmp_path))
+        await outbox.put(record(0))
+
+        with open(tmp_path / "outbox.log", "ab") as f:
+            f.write(b"\x82\xa5topic")
+
+        assert [r["message"] for r in Outbox(directory=str(tmp_path)).drain()] == [0]
+
+    @pytest.mark.asyncio
+    async def test_should_clear_disk_segments(self, tmp_path):
+        outbox = Outbox(directory=str(tmp_path))
+        await outbox.put(record(0))
+
+        outbox.clear()
+
+        assert len(Outbox(directory=str(tmp_path))) == 0
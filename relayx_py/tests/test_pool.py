@@ -0,0 +1,59 @@
+import pytest
+from relayx_py.pool import ConnectionPool, jump_hash, topic_key
+from relayx_py.memory_jetstream import MemoryJetStream, MemoryNatsClient
+
+
+# Tests - Jump consistent hash
+class TestJumpHash:
+    def test_should_stay_in_range(self):
+        for key in range(1000):
+            assert 0 <= jump_hash(key, 7) < 7
+
+    def test_should_spread_keys_evenly(self):
+        counts = [0] * 4
+
+        for n in range(4000):
+            counts[jump_hash(topic_key(f"room{n}"), 4)] += 1
+
+        assert all(800 < count < 1200 for count in counts)
+
+    def test_should_only_move_keys_to_the_new_bucket(self):
+        keys = [topic_key(f"room{n}") for n in range(2000)]
+
+        for key in keys:
+            before = jump_hash(key, 4)
+            after = jump_hash(key, 5)
+
+            assert after == before or after == 4
+
+    def test_should_reject_empty_pool(self):
+        with pytest.raises(ValueError):
+            jump_hash(1, 0)
+
+
+# Tests - Connection pool
+class TestConnectionPool:
+    def create_pool(self, size):
+        pool = ConnectionPool()
+
+        for _ in range(size):
+            client = MemoryNatsClient(MemoryJetStream())
+            pool.add(client, client.jetstream())
+
+        return pool
+
+    def test_should_map_a_topic_to_the_same_connection(self):
+        pool = self.create_pool(4)
+
+        assert pool.jetstream("orders.eu") is pool.jetstream("orders.eu")
+        assert len({pool.index(f"orders.{n}") for n in range(100)}) == 4
+
+    @pytest.mark.asyncio
+    async def test_should_close_every_connection(self):
+        pool = self.create_pool(3)
+        clients = pool.clients
+
+        await pool.close()
+
+        assert len(pool) == 0
+        assert not any(client.is_connected for client in clients)
@@ -0,0 +1,1611 @@
+import pytest
+import asyncio
+import itertools
+import time
+import msgpack
+import nats
+import nats.js.api as nats_config
+from datetime import datetime, timezone
+from unittest.mock import Mock, AsyncMock, create_autospec
+from nats.js.client import JetStreamContext
+from relayx_py import Realtime
+from relayx_py.dispatch import create_dispatcher
+from relayx_py.tracing import Tracer
+from relayx_py.pool import ConnectionPool
+from relayx_py.memory_jetstream import MemoryJetStream, MemoryNatsClient, attach_realtime
+from relayx_py.models.message import RealtimeMessage
+
+
+# Mock objects for JetStream
+@pytest.fixture
+def mock_jetstream():
+    mock = Mock()
+
+    # Mock publish
+    async def mock_publish(*args, **kwargs):
+        return Mock(seq=1, stream="test-namespace_stream", duplicate=False)
+
+    mock.publish = AsyncMock(side_effect=mock_publish)
+
+    # Mock publish_async, every call gets an already resolved ack future
+    async def mock_publish_async(*args, **kwargs):
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(Mock(seq=mock.publish_async.call_count, stream="test-namespace_stream", duplicate=False))
+        return future
+
+    mock.publish_async = AsyncMock(side_effect=mock_publish_async)
+
+    return mock
+
+
+@pytest.fixture
+def realtime():
+    realtime = Realtime({
+        "api_key": "test-api-key",
+        "secret": "test-secret"
+    })
+
+    realtime.init({
+        "staging": True,
+        "opts": {
+            "debug": False
+        }
+    })
+
+    return realtime
+
+
+@pytest.fixture
+def connected_realtime(realtime, mock_jetstream):
+    realtime._Realtime__jetstream = mock_jetstream
+    realtime._Realtime__topicHash = "test-hash"
+    realtime._Realtime__namespace = "test-namespace"
+    realtime._Realtime__connected = True
+
+    return realtime
+
+
+# Tests - Topic handles
+class TestTopicHandle:
+    def test_should_validate_topic_once(self, realtime):
+        with pytest.raises(ValueError, match="topic is not valid"):
+            realtime.topic("bad topic")
+
+        with pytest.raises(ValueError, match="topic cannot be None"):
+            realtime.topic(None)
+
+        assert realtime.topic("sensors.a").topic == "sensors.a"
+
+    @pytest.mark.asyncio
+    async def test_should_not_block_subscribing_to_the_topic(self, realtime):
+        realtime.topic("sensors.subscribed")
+
+        assert await realtime.on("sensors.subscribed", Mock()) is True
+
+        await realtime.off("sensors.subscribed")
+
+    @pytest.mark.asyncio
+    async def test_should_publish_to_the_stream_subject(self, connected_realtime, mock_jetstream):
+        topic = connected_realtime.topic("sensors.a")
+
+        assert await topic.publish({"value": 1}) is True
+        assert await (await topic.publish_async({"value": 2})) is not None
+
+        subject, payload = mock_jetstream.publish.call_args.args
+        assert subject == "test-hash.sensors.a"
+        assert msgpack.unpackb(payload)["room"] == "sensors.a"
+        assert mock_jetstream.publish_async.call_args.args[0] == "test-hash.sensors.a"
+
+        with pytest.raises(ValueError, match="msg cannot be None"):
+            await topic.publish(None)
+
+    @pytest.mark.asyncio
+    async def test_should_follow_the_namespace_after_connect(self, realtime, mock_jetstream):
+        topic = realtime.topic("sensors.a")
+
+        # Offline publishes are buffered by topic
+        assert await topic.publish(1) is False
+        assert realtime._Realtime__outbox.drain()[0]["topic"] == "sensors.a"
+        realtime._Realtime__outbox.clear()
+
+        realtime._Realtime__jetstream = mock_jetstream
+        realtime._Realtime__topicHash = "test-hash"
+        realtime._Realtime__connected = True
+
+        await topic.publish(2)
+
+        assert mock_jetstream.publish.call_args.args[0] == "test-hash.sensors.a"
+
+
+# Tests - Publish Many
+class TestPublishMany:
+    @pytest.mark.asyncio
+    async def test_should_throw_error_when_items_is_none(self, realtime):
+        with pytest.raises(ValueError, match="items cannot be None"):
+            await realtime.publish_many(None)
+
+    @pytest.mark.asyncio
+    async def test_should_throw_error_when_items_is_not_a_list(self, realtime):
+        with pytest.raises(ValueError, match="items must be a list"):
+            await realtime.publish_many("hello")
+
+    @pytest.mark.asyncio
+    async def test_should_throw_error_when_window_is_invalid(self, realtime):
+        with pytest.raises(ValueError, match="window must be a positive integer"):
+            await realtime.publish_many([], window=0)
+
+    @pytest.mark.asyncio
+    async def test_should_validate_every_item_before_sending(self, connected_realtime, mock_jetstream):
+        with pytest.raises(ValueError, match="topic is not valid"):
+            await connected_realtime.publish_many([
+                {"topic": "batch.valid", "message": "ok"},
+                {"topic": "batch invalid", "message": "not ok"}
+            ])
+
+        mock_jetstream.publish_async.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_should_return_one_result_per_item(self, connected_realtime, mock_jetstream):
+        result = await connected_realtime.publish_many([
+            {"topic": "batch.one", "message": "hello"},
+            {"topic": "batch.two", "message": 1234},
+            {"topic": "batch.three", "message": {"hello": "world"}}
+        ])
+
+        assert result == [True, True, True]
+        assert mock_jetstream.publish_async.call_count == 3
+
+        subject, payload = mock_jetstream.publish_async.call_args_list[1].args
+        assert subject == "test-hash.batch.two"
+        assert msgpack.unpackb(payload, raw=False)["message"] == 1234
+
+    @pytest.mark.asyncio
+    async def test_should_report_failed_acks_per_item(self, connected_realtime, mock_jetstream):
+        async def mock_publish_async(subject, payload, **kwargs):
+            future = asyncio.get_running_loop().create_future()
+
+            if subject.endswith("bad"):
+                future.set_exception(Exception("no response from stream"))
+            else:
+                future.set_result(Mock(seq=1))
+
+            return future
+
+        mock_jetstream.publish_async = AsyncMock(side_effect=mock_publish_async)
+
+        result = await connected_realtime.publish_many([
+            {"topic": "batch.good", "message": "hello"},
+            {"topic": "batch.bad", "message": "hello"},
+            {"topic": "batch.good", "message": "hello"}
+        ], window=2)
+
+        assert result == [True, False, True]
+
+    @pytest.mark.asyncio
+    async def test_should_buffer_batch_when_disconnected(self, realtime):
+        result = await realtime.publish_many([
+            {"topic": "batch.one", "message": "hello"},
+            {"topic": "batch.two", "message": "world"}
+        ])
+
+        assert result == [False, False]
+
+
+# Tests - Publish Async
+class TestPublishAsync:
+    @pytest.mark.asyncio
+    async def test_should_throw_error_when_topic_is_invalid(self, connected_realtime):
+        with pytest.raises(ValueError, match="topic is not valid"):
+            await connected_realtime.publish_async("invalid topic", "hello")
+
+    @pytest.mark.asyncio
+    async def test_should_return_future_resolving_to_pub_ack(self, connected_realtime, mock_jetstream):
+        future = await connected_realtime.publish_async("async.topic", {"hello": "world"})
+
+        ack = await future
+        assert ack.seq == 1
+        assert ack.duplicate is False
+
+        subject = mock_jetstream.publish_async.call_args.args[0]
+        assert subject == "test-hash.async.topic"
+
+    @pytest.mark.asyncio
+    async def test_should_fail_future_when_no_ack_arrives(self, connected_realtime, mock_jetstream):
+        async def mock_publish_async(*args, **kwargs):
+            return asyncio.get_running_loop().create_future()
+
+        mock_jetstream.publish_async = AsyncMock(side_effect=mock_publish_async)
+        connected_realtime._Realtime__ack_timeout = 0.01
+
+        future = await connected_realtime.publish_async("async.topic", "hello")
+
+        with pytest.raises(asyncio.TimeoutError):
+            await future
+
+    @pytest.mark.asyncio
+    async def test_should_cancel_ack_timer_on_ack(self, connected_realtime, monkeypatch):
+        loop = asyncio.get_running_loop()
+        timers = []
+        call_later = loop.call_later
+
+        def record_call_later(*args):
+            timers.append(call_later(*args))
+            return timers[-1]
+
+        monkeypatch.setattr(loop, "call_later", record_call_later)
+
+        futures = [await connected_realtime.publish_async("async.topic", n) for n in range(3)]
+        await asyncio.gather(*futures)
+        await asyncio.sleep(0)
+
+        assert len(timers) == 3
+        assert all(timer.cancelled() for timer in timers)
+
+    @pytest.mark.asyncio
+    async def test_should_resolve_to_none_when_disconnected(self, realtime):
+        future = await realtime.publish_async("async.topic", "hello")
+
+        assert await future is None
+
+
+# Tests - Connection pool
+class TestConnectionPool:
+    def test_should_throw_error_when_connections_is_invalid(self, realtime):
+        with pytest.raises(ValueError, match="connections must be a positive integer"):
+            realtime.init({
+                "opts": {
+                    "connections": 0
+                }
+            })
+
+    @pytest.mark.asyncio
+    async def test_should_publish_each_topic_on_its_connection(self, connected_realtime):
+        pool = ConnectionPool()
+
+        for _ in range(4):
+            client = MemoryNatsClient(MemoryJetStream())
+            pool.add(client, client.jetstream())
+
+        connected_realtime._Realtime__pool = pool
+
+        topics = [f"pool.room{n}" for n in range(20)]
+
+        for topic in topics:
+            await connected_realtime.publish(topic, "sync")
+            await (await connected_realtime.publish_async(topic, "async"))
+
+        await connected_realtime.publish_many([{"topic": topic, "message": "batch"} for topic in topics])
+
+        # Every message of a topic went to the connection the topic hashes to
+        for index, client in enumerate(pool.clients):
+            owned = [topic for topic in topics if pool.index(f"test-hash.{topic}") == index]
+
+            assert len(owned) > 0
+            assert len(client.jetstream()) == 3 * len(owned)
+
+    @pytest.mark.asyncio
+    async def test_should_give_each_connection_its_own_reconnect_handler(self, realtime, monkeypatch):
+        realtime.init({"staging": True, "opts": {"connections": 3}})
+        attach_realtime(realtime, MemoryJetStream())
+
+        connect = AsyncMock(side_effect=lambda **options: MemoryNatsClient(MemoryJetStream()))
+        monkeypatch.setattr(nats, "connect", connect)
+
+        await realtime._Realtime__open_pool({"servers": ["nats://localhost:4222"], "closed_cb": realtime._Realtime__on_closed})
+
+        options = [call.kwargs for call in connect.call_args_list]
+
+        assert len(options) == 2
+        assert all("closed_cb" not in option for option in options)
+        assert options[0]["reconnected_cb"] is not options[1]["reconnected_cb"]
+
+        await options[1]["disconnected_cb"]()
+
+        assert list(realtime._Realtime__pool_disconnect_times) == [2]
+
+        await options[1]["reconnected_cb"]()
+
+        assert realtime._Realtime__pool_disconnect_times == {}
+
+
+# Tests - Receive partitions
+class TestReceivePartitions:
+    def test_should_throw_error_when_receive_partitions_is_invalid(self, realtime):
+        with pytest.raises(ValueError, match="receive_partitions must be a positive integer"):
+            realtime.init({
+                "opts": {
+                    "receive_partitions": 0
+                }
+            })
+
+    async def subscribe(self, realtime, topics):
+        realtime.init({
+            "staging": True,
+            "opts": {
+                "receive_partitions": 4,
+                "filter_debounce": 0
+            }
+        })
+        attach_realtime(realtime, MemoryJetStream())
+
+        received = {topic: [] for topic in topics}
+
+        for topic in topics:
+            async def handler(data, topic=topic):
+                received[topic].append(data["data"])
+
+            await realtime.on(topic, handler)
+
+        return received
+
+    @pytest.mark.asyncio
+    async def test_should_deliver_each_topic_on_one_partition(self, realtime):
+        topics = [f"partition.room{n}" for n in range(8)]
+        received = await self.subscribe(realtime, topics)
+
+        filters = realtime._Realtime__partition_filters
+        subjects = [subject for partition in filters.values() for subject in partition]
+
+        assert len(filters) > 1
+        assert sorted(subjects) == sorted(f"memory_hash.{topic}" for topic in topics)
+
+        for n in range(5):
+            for topic in topics:
+                await realtime.publish(topic, n)
+
+        await asyncio.sleep(0.05)
+
+        assert all(received[topic] == [0, 1, 2, 3, 4] for topic in topics)
+
+        await realtime._Realtime__delete_consumer()
+
+    @pytest.mark.asyncio
+    async def test_should_update_partition_filters_on_off(self, realtime):
+        topics = [f"partition.room{n}" for n in range(8)]
+        await self.subscribe(realtime, topics)
+
+        consumers = dict(realtime._Realtime__consumers)
+
+        await realtime.off("partition.room0")
+
+        subjects = [subject for partition in realtime._Realtime__partition_filters.values() for subject in partition]
+        assert "memory_hash.partition.room0" not in subjects
+
+        # Partitions that kept filters were updated in place
+        for partition, consumer in realtime._Realtime__consumers.items():
+            assert consumers[partition] is consumer
+
+        for topic in topics[1:]:
+            await realtime.off(topic)
+
+        assert realtime._Realtime__consumers == {}
+
+    def attach_pool(self, realtime, jetstream, connections):
+        pool = ConnectionPool()
+
+        # One stream behind every connection, each connection gets its own
+        # JetStream context so the test can tell them apart
+        for _ in range(connections):
+            context = Mock(wraps=jetstream)
+            pool.add(MemoryNatsClient(context), context)
+
+        realtime._Realtime__pool = pool
+
+        return pool
+
+    @pytest.mark.asyncio
+    async def test_should_consume_partitions_on_pool_connections(self, realtime):
+        jetstream = MemoryJetStream()
+        pool = self.attach_pool(realtime, jetstream, 2)
+
+        topics = [f"partition.room{n}" for n in range(8)]
+        received = await self.subscribe(realtime, topics)
+
+        for index in range(2):
+            context = pool.jetstream_at(index)
+            subjects = [call.kwargs["config"].filter_subjects for call in context.subscribe.call_args_list]
+            expected = [filters for partition, filters in realtime._Realtime__partition_filters.items() if partition % 2 == index]
+
+            assert sorted(subjects) == sorted(expected)
+            assert len(subjects) > 0
+
+        for topic in topics:
+            await realtime.publish(topic, 1)
+
+        await asyncio.sleep(0.05)
+
+        assert all(received[topic] == [1] for topic in topics)
+
+        await realtime._Realtime__delete_consumer()
+
+    @pytest.mark.asyncio
+    async def test_should_only_recreate_partitions_of_a_reconnected_connection(self, realtime):
+        jetstream = MemoryJetStream()
+        self.attach_pool(realtime, jetstream, 2)
+
+        topics = [f"partition.room{n}" for n in range(8)]
+        received = await self.subscribe(realtime, topics)
+
+        consumers = dict(realtime._Realtime__consumers)
+
+        await realtime._Realtime__on_pool_reconnect(1)
+
+        for partition, consumer in realtime._Realtime__consumers.items():
+            assert (consumers[partition] is consumer) == (partition % 2 == 0)
+
+        assert sorted(realtime._Realtime__consumers) == sorted(consumers)
+
+        for partition, consumer in consumers.items():
+            if partition % 2 == 1:
+                await consumer.unsubscribe()
+
+        for topic in topics:
+            await realtime.publish(topic, 2)
+
+        await asyncio.sleep(0.05)
+
+        assert all(received[topic] == [2] for topic in topics)
+
+        await realtime._Realtime__delete_consumer()
+
+
+# Tests - Consumer filters
+class TestConsumerFilters:
+    def test_should_throw_error_when_filter_debounce_is_invalid(self, realtime):
+        with pytest.raises(ValueError, match="filter_debounce must be a non negative number"):
+            realtime.init({
+                "opts": {
+                    "filter_debounce": -1
+                }
+            })
+
+    @pytest.mark.asyncio
+    async def test_should_filter_subjects_on_the_server(self, realtime):
+        jetstream = attach_realtime(realtime, MemoryJetStream())
+        received = []
+
+        async def handler(data):
+            received.append(data["topic"])
+
+        await realtime.on("filters.orders.*", handler)
+
+        consumer = realtime._Realtime__consumers[0]
+        assert (await consumer.consumer_info()).config.filter_subjects == ["memory_hash.filters.orders.*"]
+
+        await realtime.publish("filters.orders.eu", 1)
+        await realtime.publish("filters.chat.room", 2)
+        await asyncio.sleep(0.01)
+
+        assert received == ["filters.orders.eu"]
+        assert jetstream.acks == 1
+
+        await realtime._Realtime__delete_consumer()
+
+    def test_should_throw_error_when_max_filters_is_invalid(self, realtime):
+        with pytest.raises(ValueError, match="max_filters must be a positive integer"):
+            realtime.init({
+                "opts": {
+                    "max_filters": 0
+                }
+            })
+
+    @pytest.mark.asyncio
+    async def test_should_filter_on_all_subjects_past_max_filters(self, realtime):
+        realtime.init({
+            "staging": True,
+            "opts": {
+                "max_filters": 2
+            }
+        })
+        attach_realtime(realtime, MemoryJetStream())
+        received = []
+
+        async def handler(data):
+            received.append(data["topic"])
+
+        for topic in ["filters.a", "filters.b", "filters.c"]:
+            await realtime.on(topic, handler)
+
+        assert realtime._Realtime__partition_filters == {0: ["memory_hash.>"]}
+
+        # Subjects nobody subscribed to are still dropped by the client
+        await realtime.publish("filters.c", 1)
+        await realtime.publish("filters.other", 2)
+        await asyncio.sleep(0.01)
+
+        assert received == ["filters.c"]
+
+        await realtime.off("filters.c")
+
+        assert realtime._Realtime__partition_filters == {0: ["memory_hash.filters.a", "memory_hash.filters.b"]}
+
+        await realtime._Realtime__delete_consumer()
+
+    @pytest.mark.asyncio
+    async def test_should_subscribe_thousands_of_topics(self, realtime):
+        attach_realtime(realtime, MemoryJetStream())
+
+        async def handler(data):
+            pass
+
+        start = time.perf_counter()
+
+        # Reducing every pattern pairwise on each on() took minutes here
+        for n in range(3000):
+            await realtime.on(f"filters.room{n}.*", handler)
+
+        assert time.perf_counter() - start < 10
+        assert realtime._Realtime__partition_filters == {0: ["memory_hash.>"]}
+
+        await realtime._Realtime__delete_consumer()
+
+    @pytest.mark.asyncio
+    async def test_should_debounce_filter_updates(self, realtime):
+        realtime.init({
+            "staging": True,
+            "opts": {
+                "filter_debounce": 0.05
+            }
+        })
+        jetstream = attach_realtime(realtime, MemoryJetStream())
+        jetstream.add_consumer = AsyncMock(wraps=jetstream.add_consumer)
+
+        async def handler(data):
+            pass
+
+        await realtime.on("filters.room0", handler)
+
+        for n in range(1, 5):
+            await realtime.on(f"filters.room{n}", handler)
+
+        await realtime.off("filters.room0")
+
+        assert jetstream.add_consumer.await_count == 0
+
+        await asyncio.sleep(0.1)
+
+        assert jetstream.add_consumer.await_count == 1
+        assert realtime._Realtime__partition_filters[0] == [f"memory_hash.filters.room{n}" for n in range(1, 5)]
+
+        await realtime._Realtime__delete_consumer()
+
+
+    @pytest.mark.asyncio
+    async def test_should_deliver_right_after_on(self, realtime):
+        attach_realtime(realtime, MemoryJetStream())
+        received = []
+
+        async def handler(data):
+            received.append(data["topic"])
+
+        await realtime.on("filters.first", handler)
+        await realtime.on("filters.second", handler)
+        await realtime.publish("filters.second", 1)
+        await asyncio.sleep(0.01)
+
+        assert received == ["filters.second"]
+
+        await realtime._Realtime__delete_consumer()
+
+    @pytest.mark.asyncio
+    async def test_should_not_replay_for_topics_subscribed_after_reconnect(self, realtime):
+        realtime.init({
+            "staging": True,
+            "opts": {
+                "receive_partitions": 4
+            }
+        })
+        jetstream = attach_realtime(realtime, MemoryJetStream())
+        received = []
+
+        async def handler(data):
+            received.append(data["data"])
+
+        await realtime.on("filters.before", handler)
+        await realtime._Realtime__on_disconnect()
+
+        dropped = list(realtime._Realtime__consumers.values())
+
+        for n in range(3):
+            await jetstream.publish("memory_hash.filters.after", msgpack.packb({"id": str(n), "room": "filters.after", "message": n, "start": 0}))
+
+        await realtime._Realtime__on_reconnect()
+
+        # Published before the subscription existed
+        await realtime.on("filters.after", handler)
+        await realtime.publish("filters.after", 3)
+        await asyncio.sleep(0.01)
+
+        assert received == [3]
+
+        for consumer in dropped:
+            await consumer.unsubscribe()
+
+        await realtime._Realtime__delete_consumer()
+
+
+# Tests - Resume after reconnect
+class TestResume:
+    @pytest.mark.asyncio
+    async def test_should_resume_after_last_received_sequence(self, realtime):
+        jetstream = attach_realtime(realtime, MemoryJetStream())
+        received = []
+
+        async def handler(data):
+            received.append(data["data"])
+
+        await realtime.on("resume.topic", handler)
+
+        for n in range(1, 4):
+            await realtime.publish("resume.topic", n)
+
+        await asyncio.sleep(0.01)
+
+        # Messages 4 and 5 are lost with the connection, 6 is published while offline
+        dropped = realtime._Realtime__consumers[0]
+        jetstream.remove_subscription(dropped)
+
+        for n in range(4, 6):
+            await jetstream.publish("memory_hash.resume.topic", msgpack.packb({"id": str(n), "room": "resume.topic", "message": n, "start": 0}))
+
+        await realtime._Realtime__on_disconnect()
+        await jetstream.publish("memory_hash.resume.topic", msgpack.packb({"id": "6", "room": "resume.topic", "message": 6, "start": 0}))
+        await realtime._Realtime__on_reconnect()
+        await asyncio.sleep(0.01)
+
+        config = (await realtime._Realtime__consumers[0].consumer_info()).config
+
+        assert config.deliver_policy == nats_config.DeliverPolicy.BY_START_SEQUENCE
+        assert config.opt_start_seq == 4
+        assert received == [1, 2, 3, 4, 5, 6]
+
+        await dropped.unsubscribe()
+        await realtime._Realtime__delete_consumer()
+
+    @pytest.mark.asyncio
+    async def test_should_skip_messages_delivered_again(self, subscribed_realtime):
+        received = []
+
+        async def handler(data):
+            received.append(data["data"])
+
+        await subscribed_realtime.on("resume.duplicate", handler)
+
+        msg = jetstream_message("resume.duplicate", 1)
+
+        await subscribed_realtime.subscription["cb"](msg)
+        await subscribed_realtime.subscription["cb"](msg)
+        await asyncio.sleep(0)
+
+        assert received == [1]
+        assert msg.ack.await_count == 2
+
+        await subscribed_realtime.off("resume.duplicate")
+        await subscribed_realtime._Realtime__delete_consumer()
+
+
+# Tests - Deduplication
+class TestDeduplication:
+    def test_should_throw_error_when_dedupe_is_invalid(self, realtime):
+        with pytest.raises(ValueError, match="dedupe must be True or a positive integer"):
+            realtime.init({
+                "opts": {
+                    "dedupe": 0
+                }
+            })
+
+    @pytest.mark.asyncio
+    async def test_should_send_message_id_header(self, connected_realtime, mock_jetstream):
+        await connected_realtime.publish("dedupe.topic", "hello")
+
+        subject, payload = mock_jetstream.publish.call_args.args
+
+        assert mock_jetstream.publish.call_args.kwargs["headers"]["Nats-Msg-Id"] == msgpack.unpackb(payload)["id"]
+
+    @pytest.mark.asyncio
+    async def test_should_replay_outbox_with_the_same_ids(self, realtime):
+        await realtime.publish("dedupe.offline", 1)
+        await realtime.publish("dedupe.offline", 1)
+
+        ids = [record["id"] for record in realtime._Realtime__outbox.drain()]
+        realtime._Realtime__outbox.clear()
+
+        jetstream = attach_realtime(realtime, MemoryJetStream())
+
+        # A replay that is cut short and retried stores every message once
+        assert await realtime.publish_many([{"id": ids[0], "topic": "dedupe.offline", "message": 1}]) == [True]
+        assert await realtime.publish_many([{"id": message_id, "topic": "dedupe.offline", "message": 1} for message_id in ids]) == [True, True]
+
+        assert len(ids) == len(set(ids)) == 2
+        assert len(jetstream) == 2
+
+    @pytest.mark.asyncio
+    async def test_should_skip_duplicate_ids_on_receive(self, subscribed_realtime):
+        subscribed_realtime.init({
+            "staging": True,
+            "opts": {
+                "dedupe": 100
+            }
+        })
+        received = []
+
+        async def handler(data):
+            received.append(data["data"])
+
+        await subscribed_realtime.on("dedupe.receive", handler)
+
+        # Same message id stored twice, e.g. republished after the duplicate window
+        msgs = [jetstream_message("dedupe.receive", 1), jetstream_message("dedupe.receive", 1)]
+
+        for msg in msgs:
+            await subscribed_realtime.subscription["cb"](msg)
+
+        await asyncio.sleep(0)
+
+        assert received == [1]
+        assert all(msg.ack.await_count == 1 for msg in msgs)
+        assert subscribed_realtime.stats()["duplicates_skipped"] == 1
+
+        await subscribed_realtime.off("dedupe.receive")
+        await subscribed_realtime._Realtime__delete_consumer()
+
+
+# Tests - Lazy messages
+class TestLazyMessages:
+    @pytest.mark.asyncio
+    async def test_should_share_one_lazy_message_between_handlers(self, realtime):
+        realtime.init({
+            "staging": True,
+            "opts": {
+                "lazy_messages": True,
+                "dispatch": "inline"
+            }
+        })
+        attach_realtime(realtime, MemoryJetStream())
+
+        received = []
+
+        async def by_topic(message):
+            received.append(message)
+
+        async def by_data(message):
+            received.append(message["data"])
+
+        await realtime.on("lazy.orders.eu", by_topic)
+        await realtime.on("lazy.orders.*", by_data)
+
+        await realtime.publish("lazy.orders.eu", {"n": 1})
+        await asyncio.sleep(0.01)
+
+        message = next(item for item in received if isinstance(item, RealtimeMessage))
+
+        assert {"n": 1} in received
+        assert message.topic == "lazy.orders.eu"
+        assert message.sequence == 1
+        assert message.timestamp is not None
+        assert realtime.stats()["received"] == {"lazy.orders.eu": 1, "lazy.orders.*": 1}
+
+        await realtime._Realtime__delete_consumer()
+
+    @pytest.mark.asyncio
+    async def test_should_not_decode_for_topic_routing(self, realtime):
+        realtime.init({
+            "staging": True,
+            "opts": {
+                "lazy_messages": True,
+                "dispatch": "inline"
+            }
+        })
+        attach_realtime(realtime, MemoryJetStream())
+
+        received = []
+
+        async def handler(message):
+            received.append(message)
+
+        await realtime.on("lazy.routing", handler)
+        await realtime.publish("lazy.routing", "payload")
+        await asyncio.sleep(0.01)
+
+        assert received[0].topic == "lazy.routing"
+        assert not received[0].decoded
+
+        await realtime._Realtime__delete_consumer()
+
+
+# Tests - Codec Selection
+class TestCodecSelection:
+    def test_should_throw_error_for_unknown_codec(self, realtime):
+        with pytest.raises(ValueError, match="Unknown codec"):
+            realtime.init({
+                "opts": {
+                    "codec": "does-not-exist"
+                }
+            })
+
+    @pytest.mark.asyncio
+    async def test_should_publish_with_topic_codec(self, connected_realtime, mock_jetstream):
+        connected_realtime.init({
+            "staging": True,
+            "opts": {
+                "topic_codecs": {
+                    "blobs.>": "raw"
+                }
+            }
+        })
+
+        await connected_realtime.publish_async("blobs.image", b"\x89PNG")
+
+        subject, payload = mock_jetstream.publish_async.call_args.args
+        assert payload == b"\x89PNG"
+        assert mock_jetstream.publish_async.call_args.kwargs["headers"]["Relayx-Codec"] == "raw"
+
+
+# Helper to push a message through the subscription callback
+# Stream sequences of mocked messages keep increasing like on a stream
+stream_sequence = itertools.count(1)
+
+
+def jetstream_message(topic, message, headers=None, client_id="test-client", start=0):
+    msg = Mock()
+    msg.subject = f"test-hash.{topic}"
+    msg.headers = headers
+    msg.data = msgpack.packb({
+        "id": "message-id",
+        "room": topic,
+        "message": message,
+        "start": start,
+        # Same id as the mocked client so latency logging is skipped
+        "client_id": client_id
+    })
+    msg.ack = AsyncMock()
+    msg.metadata.sequence.stream = next(stream_sequence)
+
+    return msg
+
+
+@pytest.fixture
+def subscribed_realtime(connected_realtime, mock_jetstream):
+    subscription = {}
+
+    async def mock_subscribe(*args, **kwargs):
+        subscription["cb"] = kwargs.get("cb")
+        subscription["config"] = kwargs.get("config")
+        return Mock(unsubscribe=AsyncMock())
+
+    mock_jetstream.subscribe = AsyncMock(side_effect=mock_subscribe)
+    connected_realtime._Realtime__natsClient = Mock(client_id="test-client")
+    connected_realtime.subscription = subscription
+
+    return connected_realtime
+
+
+# Tests - Message Dispatch
+class TestMessageDispatch:
+    @pytest.mark.asyncio
+    async def test_should_deliver_messages_in_order_with_serial_dispatch(self, subscribed_realtime):
+        subscribed_realtime._Realtime__dispatcher = create_dispatcher("serial")
+        received = []
+
+        async def handler(data):
+            await asyncio.sleep(0.001 * (5 - data["data"]))
+            received.append(data["data"])
+
+        await subscribed_realtime.on("dispatch.serial", handler)
+
+        for n in range(5):
+            await subscribed_realtime.subscription["cb"](jetstream_message("dispatch.serial", n))
+
+        await asyncio.sleep(0.05)
+        await subscribed_realtime.off("dispatch.serial")
+
+        assert received == [0, 1, 2, 3, 4]
+
+    @pytest.mark.asyncio
+    async def test_should_keep_subscriptions_per_client(self, realtime):
+        other = Realtime({
+            "api_key": "test-api-key",
+            "secret": "test-secret"
+        })
+
+        async def handler(data):
+            pass
+
+        assert await realtime.on("dispatch.per_client", handler)
+        assert await other.on("dispatch.per_client", handler)
+
+        await other.off("dispatch.per_client")
+
+        assert list(realtime._Realtime__topic_map) == ["dispatch.per_client"]
+
+        await realtime.off("dispatch.per_client")
+
+    def test_should_throw_error_for_unknown_dispatch_mode(self, realtime):
+        with pytest.raises(ValueError, match="Unknown dispatch mode"):
+            realtime.init({
+                "opts": {
+                    "dispatch": "unknown"
+                }
+            })
+
+
+# Tests - Pull Consumer Flow Control
+class TestPullConsumer:
+    def test_should_throw_error_for_invalid_flow_control_options(self, realtime):
+        with pytest.raises(ValueError, match="consumer_mode"):
+            realtime.init({"opts": {"consumer_mode": "poll"}})
+
+        with pytest.raises(ValueError, match="fetch_batch"):
+            realtime.init({"opts": {"consumer_mode": "pull", "fetch_batch": 0}})
+
+        with pytest.raises(ValueError, match="low_watermark must be lower"):
+            realtime.init({"opts": {"consumer_mode": "pull", "high_watermark": 10, "low_watermark": 10}})
+
+    @pytest.mark.asyncio
+    async def test_should_pause_fetching_at_high_watermark(self, connected_realtime, mock_jetstream):
+        connected_realtime.init({
+            "staging": True,
+            "opts": {
+                "consumer_mode": "pull",
+                "dispatch": "bounded",
+                "fetch_batch": 10,
+                "high_watermark": 4,
+                "low_watermark": 2,
+                "max_ack_pending": 50
+            }
+        })
+        connected_realtime._Realtime__natsClient = Mock(client_id="test-client")
+
+        batches = []
+        gate = asyncio.Event()
+
+        async def fetch(batch, timeout=None):
+            batches.append(batch)
+
+            if len(batches) > 2:
+                await asyncio.sleep(0.01)
+                raise nats.errors.TimeoutError
+
+            return [jetstream_message("pull.topic", n) for n in range(batch)]
+
+        subscription = Mock(fetch=AsyncMock(side_effect=fetch), unsubscribe=AsyncMock())
+        mock_jetstream.pull_subscribe = AsyncMock(return_value=subscription)
+
+        async def handler(data):
+            await gate.wait()
+
+        await connected_realtime.on("pull.topic", handler)
+        await asyncio.sleep(0.05)
+
+        # Only the room below the high watermark was requested, then fetching stopped
+        assert batches == [4]
+        assert mock_jetstream.pull_subscribe.call_args.kwargs["config"].max_ack_pending == 50
+
+        gate.set()
+        await asyncio.sleep(0.05)
+
+        assert batches[1] == 4
+
+        await connected_realtime.off("pull.topic")
+        await connected_realtime._Realtime__delete_consumer()
+
+
+    @pytest.mark.asyncio
+    async def test_should_keep_fetching_after_a_malformed_message(self, realtime):
+        realtime.init({
+            "staging": True,
+            "opts": {
+                "consumer_mode": "pull",
+                "dispatch": "inline"
+            }
+        })
+        jetstream = attach_realtime(realtime, MemoryJetStream())
+        received = []
+
+        async def handler(data):
+            received.append(data["data"])
+
+        await realtime.on("pull.malformed", handler)
+
+        # Not msgpack, decoding it raises
+        await jetstream.publish("memory_hash.pull.malformed", b"\xc1")
+        await realtime.publish("pull.malformed", "after")
+        await asyncio.sleep(0.05)
+
+        assert received == ["after"]
+        assert realtime._Realtime__pull_tasks[0].done() is False
+
+        await realtime._Realtime__delete_consumer()
+
+
+# Tests - Ack Modes
+class TestAckModes:
+    def test_should_throw_error_for_invalid_ack_options(self, realtime):
+        with pytest.raises(ValueError, match="ack_mode"):
+            realtime.init({"opts": {"ack_mode": "some"}})
+
+        with pytest.raises(ValueError, match="ack_interval"):
+            realtime.init({"opts": {"ack_mode": "all", "ack_interval": 0}})
+
+        with pytest.raises(ValueError, match="ack_batch"):
+            realtime.init({"opts": {"ack_mode": "all", "ack_batch": 0}})
+
+    async def subscribe(self, realtime, topic, mode, **opts):
+        realtime.init({
+            "staging": True,
+            "opts": {
+                "ack_mode": mode,
+                **opts
+            }
+        })
+
+        async def handler(data):
+            pass
+
+        await realtime.on(topic, handler)
+
+    @pytest.mark.asyncio
+    async def test_should_ack_every_message_in_explicit_mode(self, subscribed_realtime):
+        await self.subscribe(subscribed_realtime, "ack.explicit", "explicit")
+
+        assert subscribed_realtime.subscription["config"].ack_policy == nats_config.AckPolicy.EXPLICIT
+
+        msgs = [jetstream_message("ack.explicit", n) for n in range(3)]
+
+        for msg in msgs:
+            await subscribed_realtime.subscription["cb"](msg)
+
+        await subscribed_realtime.off("ack.explicit")
+
+        assert all(msg.ack.await_count == 1 for msg in msgs)
+
+    @pytest.mark.asyncio
+    async def test_should_not_ack_in_none_mode(self, subscribed_realtime):
+        await self.subscribe(subscribed_realtime, "ack.none", "none")
+
+        assert subscribed_realtime.subscription["config"].ack_policy == nats_config.AckPolicy.NONE
+
+        msg = jetstream_message("ack.none", 1)
+        await subscribed_realtime.subscription["cb"](msg)
+
+        await subscribed_realtime.off("ack.none")
+
+        msg.ack.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_should_coalesce_acks_in_all_mode(self, subscribed_realtime):
+        await self.subscribe(subscribed_realtime, "ack.all", "all", ack_interval=10, ack_batch=100)
+
+        assert subscribed_realtime.subscription["config"].ack_policy == nats_config.AckPolicy.ALL
+
+        msgs = [jetstream_message("ack.all", n) for n in range(5)]
+
+        for msg in msgs:
+            await subscribed_realtime.subscription["cb"](msg)
+
+        await asyncio.sleep(0.05)
+        await subscribed_realtime.off("ack.all")
+
+        # Only the newest message is acked, which acks the rest under AckPolicy.ALL
+        assert [msg.ack.await_count for msg in msgs] == [0, 0, 0, 0, 1]
+
+    @pytest.mark.asyncio
+    async def test_should_flush_acks_when_batch_is_full(self, subscribed_realtime):
+        await self.subscribe(subscribed_realtime, "ack.batch", "all", ack_interval=10000, ack_batch=2)
+
+        msgs = [jetstream_message("ack.batch", n) for n in range(4)]
+
+        for msg in msgs:
+            await subscribed_realtime.subscription["cb"](msg)
+
+        await subscribed_realtime.off("ack.batch")
+        await subscribed_realtime._Realtime__delete_consumer()
+
+        assert [msg.ack.await_count for msg in msgs] == [0, 1, 0, 1]
+
+    @pytest.mark.asyncio
+    async def test_should_subscribe_with_manual_ack(self, connected_realtime):
+        # Autospec checks the call against the real nats-py signature
+        jetstream = create_autospec(JetStreamContext, instance=True)
+        jetstream.subscribe.return_value = Mock(unsubscribe=AsyncMock())
+
+        connected_realtime._Realtime__jetstream = jetstream
+        connected_realtime._Realtime__natsClient = Mock(client_id="test-client")
+
+        await self.subscribe(connected_realtime, "ack.manual", "all")
+
+        assert jetstream.subscribe.call_args.kwargs["manual_ack"] is True
+
+        await connected_realtime.off("ack.manual")
+        await connected_realtime._Realtime__delete_consumer()
+
+    @pytest.mark.asyncio
+    async def test_should_not_let_the_client_auto_ack(self, realtime):
+        jetstream = attach_realtime(realtime, MemoryJetStream())
+        await self.subscribe(realtime, "ack.coalesced", "all", ack_interval=10, ack_batch=100)
+
+        for n in range(5):
+            await realtime.publish("ack.coalesced", n)
+
+        await asyncio.sleep(0.01)
+
+        assert jetstream.acks == 0
+
+        await realtime._Realtime__delete_consumer()
+
+        # Only the newest message was acked when the consumer was removed
+        assert jetstream.acks == 1
+
+
+# Tests - Offline Outbox
+class TestOfflineOutbox:
+    def test_should_throw_error_for_invalid_outbox_options(self, realtime):
+        with pytest.raises(ValueError, match="outbox_limit"):
+            realtime.init({"opts": {"outbox_limit": -1}})
+
+        with pytest.raises(ValueError, match="outbox_dir is required"):
+            realtime.init({"opts": {"outbox_overflow": "spill"}})
+
+    @pytest.mark.asyncio
+    async def test_should_bound_offline_buffer(self, realtime):
+        realtime.init({"opts": {"outbox_limit": 2}})
+
+        for n in range(5):
+            assert await realtime.publish("outbox.topic", n) is False
+
+        assert len(realtime._Realtime__outbox) == 2
+
+    @pytest.mark.asyncio
+    async def test_should_replay_buffered_messages_pipelined(self, realtime, mock_jetstream):
+        realtime.init({"opts": {}})
+
+        for n in range(3):
+            await realtime.publish("outbox.replay", n)
+
+        realtime._Realtime__jetstream = mock_jetstream
+        realtime._Realtime__topicHash = "test-hash"
+        realtime._Realtime__connected = True
+
+        await realtime._Realtime__publish_messages_on_reconnect()
+
+        payloads = [msgpack.unpackb(call.args[1], raw=False)["message"] for call in mock_jetstream.publish_async.call_args_list]
+
+        assert payloads == [0, 1, 2]
+        assert len(realtime._Realtime__outbox) == 0
+
+    @pytest.mark.asyncio
+    async def test_should_keep_records_whose_replay_failed(self, realtime, mock_jetstream, tmp_path):
+        realtime.init({"opts": {"outbox_dir": str(tmp_path)}})
+
+        for n in range(3):
+            await realtime.publish("outbox.partial", n)
+
+        async def publish_async(subject, payload, **kwargs):
+            future = asyncio.get_running_loop().create_future()
+
+            if msgpack.unpackb(payload)["message"] == 1:
+                future.set_exception(nats.errors.TimeoutError())
+            else:
+                future.set_result(Mock(seq=1, stream="test-namespace_stream", duplicate=False))
+
+            return future
+
+        mock_jetstream.publish_async = AsyncMock(side_effect=publish_async)
+
+        realtime._Realtime__jetstream = mock_jetstream
+        realtime._Realtime__topicHash = "test-hash"
+        realtime._Realtime__connected = True
+
+        await realtime._Realtime__publish_messages_on_reconnect()
+
+        assert [record["message"] for record in realtime._Realtime__outbox.drain()] == [1]
+
+        # Still on disk for the next process
+        realtime.init({"opts": {"outbox_dir": str(tmp_path)}})
+
+        assert [record["message"] for record in realtime._Realtime__outbox.drain()] == [1]
+
+    @pytest.mark.asyncio
+    async def test_should_keep_records_when_replay_raises(self, realtime, mock_jetstream):
+        realtime.init({"opts": {}})
+
+        for n in range(5):
+            await realtime.publish("outbox.raises", n)
+
+        publish_async = mock_jetstream.publish_async.side_effect
+
+        async def failing_publish_async(subject, payload, **kwargs):
+            if msgpack.unpackb(payload)["message"] == 2:
+                raise nats.errors.OutboundBufferLimitError()
+
+            return await publish_async(subject, payload, **kwargs)
+
+        mock_jetstream.publish_async.side_effect = failing_publish_async
+
+        realtime._Realtime__jetstream = mock_jetstream
+        realtime._Realtime__topicHash = "test-hash"
+        realtime._Realtime__connected = True
+
+        await realtime._Realtime__publish_messages_on_reconnect()
+
+        assert [record["message"] for record in realtime._Realtime__outbox.drain()] == [0, 1, 2, 3, 4]
+
+    @pytest.mark.asyncio
+    async def test_should_keep_durable_outbox_on_close(self, realtime, tmp_path):
+        realtime.init({"opts": {"outbox_dir": str(tmp_path)}})
+
+        await realtime.publish("outbox.durable", "hello")
+        await realtime._Realtime__on_closed()
+
+        realtime.init({"opts": {"outbox_dir": str(tmp_path)}})
+
+        assert len(realtime._Realtime__outbox) == 1
+
+
+def history_message(topic, message, seconds, num_pending, sequence=1):
+    msg = jetstream_message(topic, message)
+    msg.metadata = Mock(
+        timestamp=datetime.fromtimestamp(seconds, tz=timezone.utc),
+        num_pending=num_pending,
+        sequence=Mock(stream=sequence)
+    )
+
+    return msg
+
+
+@pytest.fixture
+def history_realtime(connected_realtime, mock_jetstream):
+    def pull_subscribe(batches):
+        consumer = Mock()
+        consumer.fetch = AsyncMock(side_effect=batches)
+        consumer.unsubscribe = AsyncMock()
+
+        mock_jetstream.pull_subscribe = AsyncMock(return_value=consumer)
+
+        return consumer
+
+    connected_realtime.pull_subscribe = pull_subscribe
+
+    return connected_realtime
+
+
+# Tests - Streaming history
+class TestHistoryIter:
+    def test_should_validate_arguments_eagerly(self, realtime):
+        with pytest.raises(ValueError, match="start cannot be None"):
+            realtime.history_iter("chat")
+
+        with pytest.raises(ValueError, match="batch_size must be a positive integer"):
+            realtime.history_iter("chat", datetime.now(), batch_size=0)
+
+        with pytest.raises(ValueError, match="max_messages must be a positive integer"):
+            realtime.history_iter("chat", datetime.now(), max_messages=-1)
+
+    @pytest.mark.asyncio
+    async def test_should_yield_messages_across_batches(self, history_realtime, mock_jetstream):
+        consumer = history_realtime.pull_subscribe([
+            [history_message("chat", "a", 100, 2), history_message("chat", "b", 101, 1)],
+            [history_message("chat", "c", 102, 0)]
+        ])
+
+        start = datetime.fromtimestamp(0, tz=timezone.utc)
+        messages = [m async for m in history_realtime.history_iter("chat", start, batch_size=2)]
+
+        assert [m["message"] for m in messages] == ["a", "b", "c"]
+        assert messages[0]["topic"] == "chat"
+        assert consumer.fetch.call_count == 2
+        assert consumer.fetch.call_args.args[0] == 2
+        consumer.unsubscribe.assert_awaited_once()
+
+        config = mock_jetstream.pull_subscribe.call_args.kwargs["config"]
+        assert config.ack_policy == nats_config.AckPolicy.NONE
+        assert config.deliver_policy == nats_config.DeliverPolicy.BY_START_TIME
+
+    @pytest.mark.asyncio
+    async def test_should_stop_after_end(self, history_realtime):
+        history_realtime.pull_subscribe([
+            [history_message("chat", "a", 100, 5), history_message("chat", "b", 200, 4)]
+        ])
+
+        start = datetime.fromtimestamp(0, tz=timezone.utc)
+        end = datetime.fromtimestamp(150, tz=timezone.utc)
+
+        messages = [m async for m in history_realtime.history_iter("chat", start, end)]
+
+        assert [m["message"] for m in messages] == ["a"]
+
+    @pytest.mark.asyncio
+    async def test_should_stop_at_max_messages(self, history_realtime):
+        consumer = history_realtime.pull_subscribe([
+            [history_message("chat", str(i), 100 + i, 10 - i) for i in range(3)]
+        ])
+
+        start = datetime.fromtimestamp(0, tz=timezone.utc)
+        messages = [m async for m in history_realtime.history_iter("chat", start, max_messages=2)]
+
+        assert len(messages) == 2
+        consumer.unsubscribe.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_should_stop_when_fetch_times_out(self, history_realtime):
+        history_realtime.pull_subscribe([
+            [history_message("chat", "a", 100, 3)],
+            nats.errors.TimeoutError()
+        ])
+
+        start = datetime.fromtimestamp(0, tz=timezone.utc)
+
+        assert [m["message"] for m in await history_realtime.history("chat", start)] == ["a"]
+
+
+@pytest.fixture
+def stored_stream(connected_realtime, mock_jetstream):
+    # One message per second from t=100 to t=199, sequence 1..100
+    stored = [(100 + i, i + 1) for i in range(100)]
+
+    async def pull_subscribe(subject, stream=None, config=None):
+        start = datetime.fromisoformat(config.opt_start_time).timestamp()
+        selected = [(seconds, seq) for seconds, seq in stored if seconds >= start]
+
+        consumer = Mock()
+        consumer.fetch = AsyncMock(side_effect=[
+            [history_message("chat", seq, seconds, len(selected) - i - 1, seq) for i, (seconds, seq) in enumerate(selected)],
+            nats.errors.TimeoutError()
+        ])
+        consumer.unsubscribe = AsyncMock()
+
+        return consumer
+
+    mock_jetstream.pull_subscribe = AsyncMock(side_effect=pull_subscribe)
+
+    return connected_realtime
+
+
+# Tests - Sharded history
+class TestShardedHistory:
+    def test_should_throw_error_when_shards_is_invalid(self, realtime):
+        with pytest.raises(ValueError, match="shards must be a positive integer"):
+            realtime.history_iter("chat", datetime.now(), shards=0)
+
+    @pytest.mark.asyncio
+    async def test_should_fetch_every_shard_with_its_own_consumer(self, stored_stream, mock_jetstream):
+        start = datetime.fromtimestamp(100, tz=timezone.utc)
+        end = datetime.fromtimestamp(199, tz=timezone.utc)
+
+        messages = await stored_stream.history("chat", start, end, shards=4)
+
+        assert mock_jetstream.pull_subscribe.call_count == 4
+        assert [m["sequence"] for m in messages] == list(range(1, 101))
+
+    @pytest.mark.asyncio
+    async def test_should_stream_shards_in_sequence_order(self, stored_stream):
+        start = datetime.fromtimestamp(100, tz=timezone.utc)
+        end = datetime.fromtimestamp(199, tz=timezone.utc)
+
+        sequences = [m["sequence"] async for m in stored_stream.history_iter("chat", start, end, batch_size=8, shards=3)]
+
+        assert sequences == list(range(1, 101))
+
+    @pytest.mark.asyncio
+    async def test_should_stop_every_shard_at_max_messages(self, stored_stream):
+        start = datetime.fromtimestamp(100, tz=timezone.utc)
+        end = datetime.fromtimestamp(199, tz=timezone.utc)
+
+        sequences = [m["sequence"] async for m in stored_stream.history_iter("chat", start, end, batch_size=4, max_messages=10, shards=5)]
+
+        assert sequences == list(range(1, 11))
+
+
+# Tests - History cache
+class TestHistoryCache:
+    @pytest.mark.asyncio
+    async def test_should_only_fetch_the_uncovered_delta(self, stored_stream, mock_jetstream, tmp_path):
+        stored_stream.init({"staging": True, "opts": {"debug": False, "history_cache": str(tmp_path)}})
+
+        start = datetime.fromtimestamp(150, tz=timezone.utc)
+
+        first = await stored_stream.history("chat", start)
+        second = await stored_stream.history("chat", start)
+
+        assert [m["sequence"] for m in first] == list(range(51, 101))
+        assert [m["sequence"] for m in second] == list(range(51, 101))
+        assert second[0]["timestamp"] == first[0]["timestamp"]
+
+        # The repeat query only asks for what lies past the cached range
+        delta_start = mock_jetstream.pull_subscribe.call_args.kwargs["config"].opt_start_time
+        assert datetime.fromisoformat(delta_start) == datetime.fromtimestamp(199, tz=timezone.utc)
+
+    @pytest.mark.asyncio
+    async def test_should_serve_covered_ranges_locally(self, stored_stream, mock_jetstream, tmp_path):
+        stored_stream.init({"staging": True, "opts": {"debug": False, "history_cache": str(tmp_path)}})
+
+        await stored_stream.history("chat", datetime.fromtimestamp(100, tz=timezone.utc))
+        calls = mock_jetstream.pull_subscribe.call_count
+
+        messages = await stored_stream.history("chat",
+                                                datetime.fromtimestamp(120, tz=timezone.utc),
+                                                datetime.fromtimestamp(129, tz=timezone.utc))
+
+        assert [m["sequence"] for m in messages] == list(range(21, 31))
+        assert mock_jetstream.pull_subscribe.call_count == calls
+
+    @pytest.mark.asyncio
+    async def test_should_serve_concurrent_reads_of_a_topic(self, stored_stream, mock_jetstream, tmp_path):
+        stored_stream.init({"staging": True, "opts": {"debug": False, "history_cache": str(tmp_path)}})
+
+        pull_subscribe = mock_jetstream.pull_subscribe.side_effect
+
+        async def slow_pull_subscribe(*args, **kwargs):
+            await asyncio.sleep(0.01)
+            return await pull_subscribe(*args, **kwargs)
+
+        mock_jetstream.pull_subscribe.side_effect = slow_pull_subscribe
+
+        start = datetime.fromtimestamp(100, tz=timezone.utc)
+
+        first, second = await asyncio.gather(stored_stream.history("chat", start), stored_stream.history("chat", start))
+
+        assert [m["sequence"] for m in first] == list(range(1, 101))
+        assert [m["sequence"] for m in second] == list(range(1, 101))
+
+    @pytest.mark.asyncio
+    async def test_should_release_the_topic_after_a_partial_read(self, stored_stream, tmp_path):
+        stored_stream.init({"staging": True, "opts": {"debug": False, "history_cache": str(tmp_path)}})
+
+        start = datetime.fromtimestamp(100, tz=timezone.utc)
+
+        partial = [m async for m in stored_stream.history_iter("chat", start, max_messages=5)]
+        messages = await asyncio.wait_for(stored_stream.history("chat", start), 1)
+
+        assert [m["sequence"] for m in partial] == list(range(1, 6))
+        assert [m["sequence"] for m in messages] == list(range(1, 101))
+
+
+# Tests - Latency telemetry
+class TestLatency:
+    def test_should_throw_error_for_invalid_sample_rate(self, realtime):
+        with pytest.raises(ValueError, match="latency_sample_rate"):
+            realtime.init({"opts": {"latency_sample_rate": 2}})
+
+    @pytest.mark.asyncio
+    async def test_should_record_latency_without_pushing_inline(self, subscribed_realtime):
+        subscribed_realtime._Realtime__natsClient.request = AsyncMock()
+        await subscribed_realtime.on("latency.topic", Mock())
+
+        start = time.time_ns() // 1_000_000 - 25
+
+        for _ in range(150):
+            await subscribed_realtime.subscription["cb"](jetstream_message("latency.topic", 1, client_id="other", start=start))
+
+        histogram = subscribed_realtime._Realtime__latency_histogram
+
+        assert histogram.count == 150
+        assert 25 <= histogram.percentile(50) / 1_000_000 < 1000
+        subscribed_realtime._Realtime__natsClient.request.assert_not_called()
+
+        subscribed_realtime._Realtime__latency_task.cancel()
+
+    @pytest.mark.asyncio
+    async def test_should_accept_start_in_seconds_from_older_clients(self, subscribed_realtime):
+        await subscribed_realtime.on("latency.seconds", Mock())
+        await subscribed_realtime.subscription["cb"](jetstream_message("latency.seconds", 1, client_id="other", start=int(time.time()) - 2))
+
+        latency_ms = subscribed_realtime._Realtime__latency_histogram.max / 1_000_000
+
+        assert 1000 <= latency_ms < 4000
+
+        subscribed_realtime._Realtime__latency_task.cancel()
+
+    @pytest.mark.asyncio
+    async def test_should_skip_unsampled_messages(self, subscribed_realtime):
+        subscribed_realtime._Realtime__latency_sample_rate = 0
+
+        await subscribed_realtime.on("latency.sampled", Mock())
+        await subscribed_realtime.subscription["cb"](jetstream_message("latency.sampled", 1, client_id="other", start=1))
+
+        assert subscribed_realtime._Realtime__latency_histogram.count == 0
+
+
+# Tests - Client stats
+class TestStats:
+    @pytest.mark.asyncio
+    async def test_should_count_publishes_and_received_messages(self, subscribed_realtime):
+        await subscribed_realtime.publish_many([{"topic": "stats.topic", "message": n} for n in range(3)])
+        # The mocked acks resolve before their callbacks are scheduled
+        await asyncio.sleep(0)
+
+        await subscribed_realtime.publish("stats.topic", "one more")
+
+        await subscribed_realtime.on("stats.>", Mock())
+        await subscribed_realtime.subscription["cb"](jetstream_message("stats.topic", 1))
+
+        stats = subscribed_realtime.stats()
+
+        assert stats["publish"]["count"] == 4
+        assert stats["publish"]["errors"] == 0
+        assert stats["publish"]["ack_latency"]["count"] == 4
+        assert stats["received"] == {"stats.>": 1}
+        assert stats["outbox_size"] == 0
+        assert "relayx_published_total 4" in subscribed_realtime.openmetrics()
+
+    @pytest.mark.asyncio
+    async def test_should_report_offline_buffer_size(self, realtime):
+        await realtime.publish("stats.offline", "queued")
+
+        assert realtime.stats()["outbox_size"] == 1
+
+
+class RecordingTracer(Tracer):
+    def __init__(self):
+        self.spans = []
+
+    def start_span(self, name, attributes=None, headers=None):
+        span = {"name": name, "attributes": attributes, "headers": headers, "events": [], "ended": False, "error": None}
+        self.spans.append(span)
+
+        return span
+
+    def add_event(self, span, name, attributes=None):
+        span["events"].append(name)
+
+    def end_span(self, span, error=None):
+        span["ended"] = True
+        span["error"] = error
+
+    def inject(self, span, headers):
+        return {**(headers or {}), "traceparent": f"trace-{len(self.spans)}"}
+
+
+# Tests - Tracing hooks
+class TestTracing:
+    def test_should_throw_error_for_invalid_tracer(self, realtime):
+        with pytest.raises(ValueError, match="tracer must be"):
+            realtime.init({"opts": {"tracer": object()}})
+
+    @pytest.mark.asyncio
+    async def test_should_inject_trace_context_on_publish(self, connected_realtime, mock_jetstream):
+        tracer = RecordingTracer()
+        connected_realtime._Realtime__tracer = tracer
+
+        await connected_realtime.publish("trace.topic", "hello")
+
+        headers = mock_jetstream.publish.call_args.kwargs["headers"]
+
+        assert headers["traceparent"] == "trace-1"
+        assert "Nats-Msg-Id" in headers
+        assert tracer.spans[0]["name"] == "relayx.publish"
+        assert tracer.spans[0]["events"] == ["ack"]
+        assert tracer.spans[0]["ended"] is True
+
+    @pytest.mark.asyncio
+    async def test_should_end_async_publish_span_on_ack(self, connected_realtime, mock_jetstream):
+        tracer = RecordingTracer()
+        connected_realtime._Realtime__tracer = tracer
+
+        await (await connected_realtime.publish_async("trace.topic", "hello"))
+        await asyncio.sleep(0)
+
+        assert "traceparent" in mock_jetstream.publish_async.call_args.kwargs["headers"]
+        assert tracer.spans[0]["events"] == ["ack"]
+        assert tracer.spans[0]["ended"] is True
+
+    @pytest.mark.asyncio
+    async def test_should_continue_trace_on_receive(self, subscribed_realtime):
+        tracer = RecordingTracer()
+        subscribed_realtime._Realtime__tracer = tracer
+
+        await subscribed_realtime.on("trace.receive", Mock())
+        await subscribed_realtime.subscription["cb"](jetstream_message("trace.receive", 1, headers={"traceparent": "upstream"}))
+
+        span = tracer.spans[0]
+
+        assert span["name"] == "relayx.receive"
+        assert span["headers"] == {"traceparent": "upstream"}
+        assert span["events"] == ["decoded", "dispatch"]
+        assert span["ended"] is True
+
+    @pytest.mark.asyncio
+    async def test_should_not_touch_headers_without_tracer(self, connected_realtime, mock_jetstream):
+        await connected_realtime.publish("trace.topic", "hello")
+
+        assert list(mock_jetstream.publish.call_args.kwargs["headers"]) == ["Nats-Msg-Id"]
@@ -0,0 +1,148 @@
+import pytest
+import random
+import itertools
+from relayx_py import Realtime
+from relayx_py.topic_index import TopicIndex
+
+
+@pytest.fixture
+def matcher():
+    realtime = Realtime({
+        "api_key": "test-api-key",
+        "secret": "test-secret"
+    })
+
+    return realtime.topic_pattern_matcher
+
+
+def random_pattern(rng):
+    tokens = [rng.choice(["a", "b", "c", "*"]) for _ in range(rng.randint(1, 4))]
+
+    if rng.random() < 0.3:
+        tokens[-1] = ">"
+
+    return ".".join(tokens)
+
+
+def random_subject(rng):
+    return ".".join(rng.choice(["a", "b", "c"]) for _ in range(rng.randint(1, 5)))
+
+
+SUBJECTS = [".".join(tokens) for length in range(1, 5) for tokens in itertools.product("abc", repeat=length)]
+
+
+# Tests - Topic Index
+class TestTopicIndex:
+    def test_should_match_literal_and_wildcard_patterns(self):
+        index = TopicIndex()
+
+        for pattern in ["sensors.a", "sensors.*", "sensors.>", ">", "other.*"]:
+            index.add(pattern)
+
+        assert index.match("sensors.a") == ["sensors.a", "sensors.*", "sensors.>", ">"]
+        assert index.match("sensors.a.b") == ["sensors.>", ">"]
+        assert index.match("sensors") == [">"]
+
+    def test_should_return_false_when_adding_twice(self):
+        index = TopicIndex()
+
+        assert index.add("foo.bar") is True
+        assert index.add("foo.bar") is False
+        assert len(index) == 1
+
+    def test_should_remove_patterns_and_invalidate_cache(self):
+        index = TopicIndex()
+        index.add("foo.*")
+        index.add("foo.bar")
+
+        assert index.match("foo.bar") == ["foo.*", "foo.bar"]
+
+        assert index.remove("foo.*") is True
+        assert index.remove("foo.*") is False
+        assert index.match("foo.bar") == ["foo.bar"]
+
+        index.remove("foo.bar")
+        assert index.match("foo.bar") == []
+        assert index.patterns() == []
+
+    def test_should_treat_star_inside_token_as_literal(self):
+        index = TopicIndex()
+        index.add("foo-bar_*")
+
+        assert index.match("foo-bar_123") == []
+        assert index.match("foo-bar_*") == ["foo-bar_*"]
+
+    def test_should_evict_least_recently_used_subjects(self):
+        index = TopicIndex(cache_size=2)
+        index.add("*")
+
+        for subject in ["a", "b", "c", "a"]:
+            assert index.match(subject) == ["*"]
+
+    def test_should_agree_with_pattern_matcher(self, matcher):
+        rng = random.Random(1234)
+
+        for _ in range(200):
+            patterns = list(dict.fromkeys(random_pattern(rng) for _ in range(rng.randint(1, 20))))
+
+            index = TopicIndex()
+
+            for pattern in patterns:
+                index.add(pattern)
+
+            for _ in range(20):
+                subject = random_subject(rng)
+                expected = [pattern for pattern in patterns if matcher(pattern, subject)]
+
+                assert index.match(subject) == expected, subject
+
+    def test_should_find_overlapping_patterns(self):
+        rng = random.Random(4321)
+
+        for _ in range(200):
+            patterns = list(dict.fromkeys(random_pattern(rng) for _ in range(rng.randint(1, 20))))
+
+            index = TopicIndex()
+
+            for pattern in patterns:
+                index.add(pattern)
+
+            for _ in range(20):
+                pattern = random_pattern(rng)
+                query = TopicIndex()
+                query.add(pattern)
+
+                # Patterns here never need more than 4 tokens to share a subject
+                expected = set()
+
+                for subject in SUBJECTS:
+                    if query.match(subject):
+                        expected.update(index.match(subject))
+
+                assert sorted(index.overlapping(pattern)) == sorted(expected), pattern
+
+
+# Tests - Callback topics use the index
+class TestCallbackTopics:
+    @pytest.mark.asyncio
+    async def test_should_resolve_callback_topics_through_index(self):
+        realtime = Realtime({
+            "api_key": "test-api-key",
+            "secret": "test-secret"
+        })
+
+        realtime.init({"opts": {}})
+
+        async def handler(data):
+            pass
+
+        await realtime.on("index.*", handler)
+        await realtime.on("index.>", handler)
+
+        assert realtime.get_callback_topics("index.a") == ["index.*", "index.>"]
+        assert realtime.get_callback_topics("index.a.b") == ["index.>"]
+
+        await realtime.off("index.*")
+        await realtime.off("index.>")
+
+        assert realtime.get_callback_topics("index.a") == []
@@ -0,0 +1,35 @@
+import pytest
+from relayx_py.tracing import Tracer, OpenTelemetryTracer, otel_trace
+
+
+# Tests - Tracer interface
+class TestTracer:
+    def test_base_tracer_is_a_no_op(self):
+        tracer = Tracer()
+
+        span = tracer.start_span("relayx.publish", {"topic": "chat"})
+
+        tracer.add_event(span, "ack")
+        tracer.end_span(span)
+
+        assert span is None
+        assert tracer.inject(span, None) is None
+        assert tracer.inject(span, {"a": "b"}) == {"a": "b"}
+
+    @pytest.mark.skipif(otel_trace is not None, reason="opentelemetry-api is installed")
+    def test_otel_adapter_requires_opentelemetry(self):
+        with pytest.raises(ValueError, match="opentelemetry-api is not installed"):
+            OpenTelemetryTracer()
+
+    @pytest.mark.skipif(otel_trace is None, reason="opentelemetry-api is not installed")
+    def test_otel_adapter_propagates_context(self):
+        tracer = OpenTelemetryTracer()
+
+        span = tracer.start_span("relayx.publish")
+        headers = tracer.inject(span, None)
+        tracer.end_span(span)
+
+        child = tracer.start_span("relayx.receive", headers=headers)
+        tracer.end_span(child)
+
+        assert isinstance(headers, dict)
@@ -0,0 +1,42 @@
+class TopicHandle:
+    """
+    Publisher for a single topic, returned by Realtime.topic(). The topic
+    is validated once when the handle is created and its stream subject is
+    kept until the namespace changes, so each publish only encodes and
+    sends the message.
+    """
+
+    __slots__ = ("topic", "subject", "topic_hash", "__publish", "__publish_async")
+
+    def __init__(self, topic, publish, publish_async):
+        self.topic = topic
+
+        # Stream subject and the namespace hash it was built with,
+        # filled in by the client on first publish
+        self.subject = None
+        self.topic_hash = None
+
+        self.__publish = publish
+        self.__publish_async = publish_async
+
+    def __repr__(self):
+        return f"TopicHandle({self.topic!r})"
+
+    async def publish(self, data):
+        """
+        Publishes data to the topic, see Realtime.publish().
+
+        Returns:
+            bool: True if JetStream acknowledged the message.
+        """
+        return await self.__publish(self, data)
+
+    async def publish_async(self, data):
+        """
+        Enqueues data for the topic without waiting for the server, see
+        Realtime.publish_async().
+
+        Returns:
+            asyncio.Future: Resolves to the PubAck.
+        """
+        return await self.__publish_async(self, data)
@@ -0,0 +1,208 @@
+from collections import OrderedDict
+
+
+class _Node:
+    __slots__ = ("children", "pattern", "full_wildcard")
+
+    def __init__(self):
+        # token => _Node, '*' is stored as a regular child
+        self.children = {}
+        # Pattern ending at this node
+        self.pattern = None
+        # Pattern ending with '>' right after this node
+        self.full_wildcard = None
+
+
+class TopicIndex:
+    """
+    Token trie of subscription patterns.
+
+    ``match(subject)`` walks only the literal, '*' and '>' branches that
+    can match the subject instead of testing every registered pattern.
+    Results for concrete subjects are kept in an LRU cache which is reset
+    whenever a pattern is added or removed.
+    """
+
+    def __init__(self, cache_size=4096):
+        self.__root = _Node()
+        # pattern => registration order, used to keep results stable
+        self.__order = {}
+        self.__counter = 0
+
+        self.__cache = OrderedDict()
+        self.__cache_size = cache_size
+
+    def __len__(self):
+        return len(self.__order)
+
+    def __contains__(self, pattern):
+        return pattern in self.__order
+
+    def patterns(self):
+        return list(self.__order.keys())
+
+    def add(self, pattern):
+        """
+        Adds a pattern to the index.
+
+        Returns:
+            bool: False if the pattern was already indexed.
+        """
+        if pattern in self.__order:
+            return False
+
+        tokens = pattern.split(".")
+
+        # '>' is only a wildcard as the final token, such patterns never match
+        if ">" in tokens[:-1]:
+            return False
+
+        node = self.__root
+
+        for token in tokens[:-1]:
+            node = node.children.setdefault(token, _Node())
+
+        if tokens[-1] == ">":
+            node.full_wildcard = pattern
+        else:
+            node = node.children.setdefault(tokens[-1], _Node())
+            node.pattern = pattern
+
+        self.__order[pattern] = self.__counter
+        self.__counter += 1
+        self.__cache.clear()
+
+        return True
+
+    def remove(self, pattern):
+        """
+        Removes a pattern from the index.
+
+        Returns:
+            bool: False if the pattern was not indexed.
+        """
+        if pattern not in self.__order:
+            return False
+
+        tokens = pattern.split(".")
+        path = [self.__root]
+
+        for token in tokens[:-1]:
+            path.append(path[-1].children[token])
+
+        if tokens[-1] == ">":
+            path[-1].full_wildcard = None
+        else:
+            path.append(path[-1].children[tokens[-1]])
+            path[-1].pattern = None
+
+        # Prune nodes that no longer lead to any pattern
+        for depth in range(len(path) - 1, 0, -1):
+            node = path[depth]
+
+            if node.children or node.pattern is not None or node.full_wildcard is not None:
+                break
+
+            del path[depth - 1].children[tokens[depth - 1]]
+
+        del self.__order[pattern]
+        self.__cache.clear()
+
+        return True
+
+    def match(self, subject):
+        """
+        Returns every indexed pattern matching the concrete subject, in
+        the order the patterns were added.
+        """
+        cached = self.__cache.get(subject)
+
+        if cached is not None:
+            self.__cache.move_to_end(subject)
+            return list(cached)
+
+        matches = []
+        self.__collect(self.__root, subject.split("."), 0, matches)
+
+        if len(matches) > 1:
+            matches.sort(key=self.__order.__getitem__)
+
+        self.__cache[subject] = tuple(matches)
+
+        if len(self.__cache) > self.__cache_size:
+            self.__cache.popitem(last=False)
+
+        return matches
+
+    def overlapping(self, pattern):
+        """
+        Returns every indexed pattern that matches at least one subject
+        the pattern matches. Only the branches the pattern's tokens can
+        reach are walked, a literal pattern costs one path per wildcard.
+        """
+        found = []
+        self.__overlap(self.__root, pattern.split("."), 0, found)
+
+        return found
+
+    def __overlap(self, node, tokens, i, found):
+        if i == len(tokens):
+            if node.pattern is not None:
+                found.append(node.pattern)
+
+            return
+
+        # An indexed '>' absorbs the rest of the pattern (at least one token)
+        if node.full_wildcard is not None:
+            found.append(node.full_wildcard)
+
+        token = tokens[i]
+
+        if token == ">":
+            for child in node.children.values():
+                self.__subtree(child, found)
+        elif token == "*":
+            for child in node.children.values():
+                self.__overlap(child, tokens, i + 1, found)
+        else:
+            child = node.children.get(token)
+
+            if child is not None:
+                self.__overlap(child, tokens, i + 1, found)
+
+            child = node.children.get("*")
+
+            if child is not None:
+                self.__overlap(child, tokens, i + 1, found)
+
+    def __subtree(self, node, found):
+        if node.pattern is not None:
+            found.append(node.pattern)
+
+        if node.full_wildcard is not None:
+            found.append(node.full_wildcard)
+
+        for child in node.children.values():
+            self.__subtree(child, found)
+
+    def __collect(self, node, tokens, i, matches):
+        if i == len(tokens):
+            if node.pattern is not None:
+                matches.append(node.pattern)
+
+            return
+
+        # '>' absorbs the rest of the subject (at least one token)
+        if node.full_wildcard is not None:
+            matches.append(node.full_wildcard)
+
+        child = node.children.get(tokens[i])
+
+        if child is not None:
+            self.__collect(child, tokens, i + 1, matches)
+
+        if tokens[i] != "*":
+            child = node.children.get("*")
+
+            if child is not None:
+                self.__collect(child, tokens, i + 1, matches)
@@ -0,0 +1,69 @@
+try:
+    from opentelemetry import trace as otel_trace
+    from opentelemetry import propagate as otel_propagate
+    from opentelemetry.trace import Status, StatusCode
+except ImportError:
+    otel_trace = None
+
+
+class Tracer:
+    """
+    Hook interface for tracing. Pass an instance as opts "tracer".
+
+    The client calls ``start_span`` where an operation begins and
+    ``end_span`` once it finished, ``add_event`` marks points in between
+    (e.g. the PubAck). ``inject`` writes the trace context of a span into
+    outgoing NATS headers and ``start_span`` receives the headers of an
+    incoming message so receivers can continue the trace.
+
+    Every method is a no-op here, subclasses override what they need.
+    """
+
+    def start_span(self, name, attributes=None, headers=None):
+        return None
+
+    def add_event(self, span, name, attributes=None):
+        pass
+
+    def end_span(self, span, error=None):
+        pass
+
+    def inject(self, span, headers):
+        """Returns the headers to send, None when there is nothing to add."""
+        return headers
+
+
+class OpenTelemetryTracer(Tracer):
+    """
+    Adapter emitting OpenTelemetry spans. Trace context travels in the
+    NATS headers through the globally configured propagator (W3C
+    traceparent by default).
+    """
+
+    def __init__(self, tracer=None):
+        if otel_trace is None:
+            raise ValueError("OpenTelemetry tracer selected but opentelemetry-api is not installed. pip install relayx_py[otel]")
+
+        self.__tracer = tracer or otel_trace.get_tracer("relayx_py")
+
+    def start_span(self, name, attributes=None, headers=None):
+        context = otel_propagate.extract(headers) if headers else None
+
+        return self.__tracer.start_span(name, context=context, attributes=attributes)
+
+    def add_event(self, span, name, attributes=None):
+        span.add_event(name, attributes or {})
+
+    def end_span(self, span, error=None):
+        if error is not None:
+            span.record_exception(error)
+            span.set_status(Status(StatusCode.ERROR, str(error)))
+
+        span.end()
+
+    def inject(self, span, headers):
+        headers = dict(headers) if headers else {}
+
+        otel_propagate.inject(headers, context=otel_trace.set_span_in_context(span))
+
+        return headers
@@ -1,6 +1,7 @@
 import tabulate
 import re
 from nats.js.errors import ServiceUnavailableError
+from relayx_py.log import debug_logger, KV
 
 class ErrorLogging:
 
@@ -116,12 +117,14 @@ class ErrorLogging:
 
 
 class Logging:
-    def __init__(self, debug=False):
+    def __init__(self, debug=False, subsystem=KV):
         if isinstance(debug, bool):
             self._debug = debug
         else:
             self._debug = False
 
-    def log(self, *msg):
-        if self._debug:
-            print(*msg)
\ No newline at end of file
+        self._logger = debug_logger(subsystem, self._debug)
+
+    def log(self, msg, *args):
+        # %-style args are only formatted if the record is emitted
+        self._logger.debug(msg, *args)
\ No newline at end of file
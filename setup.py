@@ -7,8 +7,14 @@ long_description = (this_directory / "README.md").read_text()
 setup(
     name="relayx_py",
     version="1.1.0",
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks", "benchmarks.*"]),
     install_requires=["nats-py==2.12.0", "pytest-asyncio==1.0.0", "nkeys==0.2.1", "msgpack==1.1.1", "tzlocal==5.3.1", "tabulate==0.9.0"],
+    extras_require={
+        "orjson": ["orjson>=3.9"],
+        "lz4": ["lz4>=4.0"],
+        "zstd": ["zstandard>=0.22"],
+        "otel": ["opentelemetry-api>=1.20"],
+    },
     author="Relay",
     description="A powerful library for integrating real-time communication into your software stack, powered by the Relay Network.",
     license="Apache 2.0",